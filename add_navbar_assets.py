@@ -7,6 +7,8 @@ import os
 import glob
 import re
 
+from sitebuild.snapshots import write_text
+
 def add_navbar_assets_to_file(filepath):
     """Add navbar CSS and JS to a service file"""
     print(f"Processing {filepath}...")
@@ -46,8 +48,7 @@ def add_navbar_assets_to_file(filepath):
         return
     
     # Write updated content back to file
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(content)
+    write_text(filepath, content, label=__file__)
     
     print(f"  ✅ Successfully updated {filepath}")
 
@@ -7,6 +7,8 @@ import os
 import glob
 import re
 
+from sitebuild.snapshots import write_text
+
 def get_navbar_html():
     """Get the complete navbar HTML structure"""
     return '''    <!-- Skip to Content (Accessibility) -->
@@ -219,8 +221,7 @@ def update_service_file(filepath):
         content = add_js_if_missing(content)
         
         # Write updated content
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+        write_text(filepath, content, label=__file__)
         
         print(f"  ✅ Successfully updated {filepath}")
         
@@ -7,6 +7,8 @@ import os
 import re
 from pathlib import Path
 
+from sitebuild.snapshots import write_text
+
 def fix_service_links():
     """Fix service links in all service pages"""
     
@@ -44,8 +46,7 @@ def fix_service_links():
         
         # Write back if content changed
         if content != old_content:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            write_text(file_path, content, label=__file__)
             fixed_count += 1
             print(f"✅ Fixed: {file_path}")
         else:
@@ -1,6 +1,8 @@
 import os
 import re
 
+from sitebuild.snapshots import write_text
+
 def fix_theme_flash_in_file(filepath):
     """Fix theme flash issue in an HTML file"""
     with open(filepath, 'r', encoding='utf-8') as f:
@@ -72,8 +74,7 @@ def fix_theme_flash_in_file(filepath):
         content = content[:insert_position] + script + content[insert_position:]
         
         # Write the updated content
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+        write_text(filepath, content, label=__file__)
         
         print(f"  ✓ Fixed: {filepath}")
         return True
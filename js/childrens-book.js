@@ -6,31 +6,31 @@ class ChildrensBookPrinting {
         this.totalSlides = 3;
         this.autoPlayInterval = null;
         this.currentTab = 'paper';
+        this.priceSheet = null;
+        // Rates from data/pricing.json; the build and "python -m sitebuild price --export" keep this copy in sync
         this.priceData = {
-            basePrices: {
-                '8.5x11': { perfect: 15, saddle: 12, spiral: 14, hardcover: 25 },
-                '6x9': { perfect: 12, saddle: 10, spiral: 11, hardcover: 22 },
-                '5.5x8.5': { perfect: 10, saddle: 8, spiral: 9, hardcover: 20 },
-                '8x10': { perfect: 14, saddle: 11, spiral: 13, hardcover: 24 }
+            "axes": {
+                "type": {
+                    "kind": "base",
+                    "default": "hardcover",
+                    "prices": {"hardcover": 25, "softcover": 12, "saddle": 8, "board": 30}
+                },
+                "size": {
+                    "kind": "multiplier",
+                    "default": "8.5x11",
+                    "prices": {"8.5x11": 1.2, "6x9": 1.0, "5.5x8.5": 0.9, "8x10": 1.1}
+                },
+                "cover": {
+                    "kind": "adder",
+                    "default": "digital",
+                    "prices": {"digital": 0, "offset": 3, "leather": 8}
+                },
+                "lamination": {"kind": "adder", "default": "matte", "prices": {"matte": 0, "gloss": 1, "soft": 2}},
+                "thickness": {"kind": "adder", "default": "2mm", "prices": {"2mm": 0, "2.5mm": 1, "3mm": 2}}
             },
-            coverPrices: {
-                matte: 2,
-                gloss: 3,
-                uncoated: 1
-            },
-            interiorPrices: {
-                '70gsm': 0,
-                '80gsm': 1,
-                '100gsm': 2
-            },
-            quantityDiscounts: {
-                100: 0,
-                250: 0.05,
-                500: 0.10,
-                1000: 0.15,
-                2500: 0.20,
-                5000: 0.25
-            }
+            "pages": {"default": 24, "step": 4, "price": 0.8, "sheet": [8, 16, 24, 32, 48, 64]},
+            "quantity": {"default": 100, "sheet": [100, 250, 500, 1000, 2500, 5000]},
+            "discounts": [[100, 0], [250, 0.05], [500, 0.1], [1000, 0.15], [2500, 0.2], [5000, 0.25]]
         };
         this.init();
     }
@@ -106,6 +106,7 @@ class ChildrensBookPrinting {
 
     // ===== PRICE CALCULATOR =====
     initPriceCalculator() {
+        this.loadPriceSheet();
         this.calculatePrice();
         this.initPageSlider();
     }
@@ -132,58 +133,18 @@ class ChildrensBookPrinting {
         const lamination = document.querySelector('.lamination-option.active')?.dataset.lamination || 'matte';
         const thickness = document.querySelector('.thickness-option.active')?.dataset.thickness || '2mm';
 
-        // Calculate base price based on book type
-        let basePrice = 15;
-        switch (bookType) {
-            case 'hardcover':
-                basePrice = 25;
-                break;
-            case 'softcover':
-                basePrice = 12;
-                break;
-            case 'saddle':
-                basePrice = 8;
-                break;
-            case 'board':
-                basePrice = 30;
-                break;
-        }
+        const rates = this.priceData;
+        const options = { type: bookType, size, cover, lamination, thickness };
 
-        // Add size multiplier
-        const sizeMultipliers = {
-            '8.5x11': 1.2,
-            '6x9': 1.0,
-            '5.5x8.5': 0.9,
-            '8x10': 1.1
-        };
-        basePrice *= sizeMultipliers[size] || 1.0;
-
-        // Add page cost
-        const pageMultiplier = Math.ceil(pages / 4) * 0.8;
-        
-        // Add premium options cost
-        let optionsCost = 0;
-        if (cover === 'offset') optionsCost += 3;
-        if (cover === 'leather') optionsCost += 8;
-        if (lamination === 'gloss') optionsCost += 1;
-        if (lamination === 'soft') optionsCost += 2;
-        if (thickness === '2.5mm') optionsCost += 1;
-        if (thickness === '3mm') optionsCost += 2;
-
-        // Calculate per unit price
-        const unitPrice = basePrice + pageMultiplier + optionsCost;
+        // The published price sheet has the common configurations; compute the rest
+        const unitPrice = this.lookupUnitPrice({ ...options, pages }) ?? this.computeUnitPrice(options, pages);
         const subtotal = unitPrice * quantity;
 
-        // Apply quantity discount
+        // Apply quantity discount: the highest tier the quantity reaches
         let discount = 0;
-        const discountTiers = Object.keys(this.priceData.quantityDiscounts)
-            .map(Number)
-            .sort((a, b) => b - a);
-
-        for (const tier of discountTiers) {
-            if (quantity >= tier) {
-                discount = this.priceData.quantityDiscounts[tier];
-                break;
+        for (const [minimum, rate] of rates.discounts) {
+            if (quantity >= minimum) {
+                discount = rate;
             }
         }
 
@@ -253,6 +214,55 @@ class ChildrensBookPrinting {
         });
     }
 
+    computeUnitPrice(options, pages) {
+        const rates = this.priceData;
+        const price = (axis) => {
+            const prices = rates.axes[axis].prices;
+            return prices[options[axis]] ?? prices[rates.axes[axis].default];
+        };
+
+        // Base price by book type, scaled by the size multipliers
+        let basePrice = 1;
+        let optionsCost = 0;
+        for (const axis of Object.keys(rates.axes)) {
+            if (rates.axes[axis].kind === 'adder') {
+                optionsCost += price(axis);
+            } else {
+                basePrice *= price(axis);
+            }
+        }
+
+        // Add page cost
+        const pageMultiplier = Math.ceil(pages / rates.pages.step) * rates.pages.price;
+
+        return basePrice + pageMultiplier + optionsCost;
+    }
+
+    // ===== PRICE SHEET =====
+    loadPriceSheet() {
+        // Unit prices published by the build (data/prices/); prices are computed until it loads
+        fetch('../data/prices/childrens-book.json')
+            .then(response => (response.ok ? response.json() : null))
+            .then(sheet => {
+                this.priceSheet = sheet;
+            })
+            .catch(() => {});
+    }
+
+    lookupUnitPrice(values) {
+        const sheet = this.priceSheet;
+        if (!sheet) return null;
+
+        let index = 0;
+        for (let i = 0; i < sheet.keys.length; i++) {
+            const [name, options] = sheet.keys[i];
+            const code = options.indexOf(values[name]);
+            if (code < 0) return null;
+            index += code * sheet.strides[i];
+        }
+        return sheet.unit[index];
+    }
+
     // ===== QUANTITY CONTROLS =====
     updateQuantity(change) {
         const quantityInput = document.getElementById('quantity');
@@ -1150,13 +1160,13 @@ function initFileUpload() {
         // Filter files by type and size
         const validFiles = newFiles.filter(file => {
             const isValidType = isValidFileType(file);
-            const isValidSize = file.size <= 100 * 1024 * 1024; // 100MB limit
+            const isValidSize = file.size <= 1024 * 1024 * 1024; // 1GB limit, as the intake service
             
             if (!isValidType) {
                 showNotification(`File type not supported: ${file.name}`, 'error');
             }
             if (!isValidSize) {
-                showNotification(`File too large: ${file.name} (max 100MB)`, 'error');
+                showNotification(`File too large: ${file.name} (max 1GB)`, 'error');
             }
             
             return isValidType && isValidSize;
@@ -1266,10 +1276,42 @@ function initFileUpload() {
             </div>
         `;
         
-        // Simulate upload process
-        setTimeout(() => {
-            showNotification('Files uploaded successfully! Redirecting to quote...', 'success');
-            
+        // Each file goes to the intake service ("python -m sitebuild intake"), which preflights it
+        const meta = document.querySelector('meta[name="intake-url"]');
+        const endpoint = `${meta ? meta.content : '/api'}/uploads`;
+        const size = document.getElementById('size')?.value || '8.5x11';
+        const uploads = files.map(file => {
+            const query = new URLSearchParams({ name: file.name, line: 'childrens-book', size });
+            return fetch(`${endpoint}?${query}`, {
+                method: 'POST',
+                headers: { 'Content-Type': file.type || 'application/octet-stream' },
+                body: file
+            })
+                .then(response => response.json())
+                .then(result => {
+                    if (!result.ok) throw new Error(result.error);
+                    return result.preflight;
+                });
+        });
+
+        Promise.allSettled(uploads).then(results => {
+            results.forEach((outcome, index) => {
+                const name = files[index].name;
+                if (outcome.status === 'rejected') {
+                    showNotification(`${name} was not uploaded: ${outcome.reason.message}`, 'error');
+                    return;
+                }
+                const report = outcome.value;
+                const problem = report.findings.find(f => f.level === 'error') ||
+                                report.findings.find(f => f.level === 'warning');
+                if (report.status === 'pass') {
+                    showNotification(`${name} uploaded and passed preflight`, 'success');
+                } else {
+                    showNotification(`${name} uploaded. Preflight: ${problem ? problem.message : 'not finished, we will check it by hand'}`,
+                                     report.status === 'fail' ? 'error' : 'info');
+                }
+            });
+
             // Reset button
             setTimeout(() => {
                 uploadBtn.disabled = false;
@@ -1288,7 +1330,7 @@ function initFileUpload() {
                     tabsSection.scrollIntoView({ behavior: 'smooth' });
                 }
             }, 2000);
-        }, 2000);
+        });
     });
 }
 
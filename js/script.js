@@ -36,6 +36,20 @@ const throttle = (func, limit) => {
   }
 };
 
+// Forms post to the intake service ("python -m sitebuild intake") under /api on this
+// origin, or wherever <meta name="intake-url" content="..."> points
+const submitIntake = (path, payload) => {
+  const meta = document.querySelector('meta[name="intake-url"]');
+  return fetch(`${meta ? meta.content : '/api'}${path}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(payload)
+  }).then(response => response.json().catch(() => ({})).then(data => {
+    if (!response.ok) throw new Error(data.error || `${response.status} ${response.statusText}`);
+    return data;
+  }));
+};
+
 // ===== THEME MANAGEMENT =====
 class ThemeManager {
   constructor() {
@@ -1419,8 +1433,7 @@ class FormValidator {
       submitButton.textContent = 'Subscribing...';
       submitButton.disabled = true;
 
-      // Simulate API call
-      await new Promise(resolve => setTimeout(resolve, 1000));
+      await submitIntake('/contact', { topic: 'newsletter', email });
 
       this.showSuccessMessage();
       this.showNewsletterModal();
@@ -1763,41 +1776,46 @@ class ErrorHandler {
 // ===== PRICE CALCULATOR MANAGER =====
 class PriceCalculatorManager {
   constructor() {
-    this.pricingData = {
-      'business-cards': { base: 0.15, category: 'cards' },
-      'brochures': { base: 0.85, category: 'print' },
-      'folders': { base: 1.25, category: 'print' },
-      'reports': { base: 2.50, category: 'binding' },
-      'posters': { base: 3.75, category: 'large' },
-      'banners': { base: 8.50, category: 'large' }
-    };
-
-    this.multipliers = {
-      paper: {
-        'standard': 1.0,
-        'premium': 1.3,
-        'luxury': 1.6,
-        'recycled': 1.1
-      },
-      finish: {
-        'matte': 1.0,
-        'gloss': 1.1,
-        'satin': 1.15,
-        'velvet': 1.25,
-        'uv': 1.4
-      },
-      color: {
-        'bw': 1.0,
-        'color': 1.5,
-        'spot': 1.8,
-        'metallic': 2.2
+    this.priceSheet = null;
+
+    // Rates from data/pricing.json; the build and "python -m sitebuild price --export" keep this copy in sync
+    this.rates = {
+      "axes": {
+        "product": {
+          "kind": "base",
+          "default": "business-cards",
+          "prices": {
+            "business-cards": 0.15,
+            "brochures": 0.85,
+            "folders": 1.25,
+            "reports": 2.5,
+            "posters": 3.75,
+            "banners": 8.5
+          }
+        },
+        "paper": {
+          "kind": "multiplier",
+          "default": "standard",
+          "prices": {"standard": 1.0, "premium": 1.3, "luxury": 1.6, "recycled": 1.1}
+        },
+        "finish": {
+          "kind": "multiplier",
+          "default": "matte",
+          "prices": {"matte": 1.0, "gloss": 1.1, "satin": 1.15, "velvet": 1.25, "uv": 1.4}
+        },
+        "color": {
+          "kind": "multiplier",
+          "default": "bw",
+          "prices": {"bw": 1.0, "color": 1.5, "spot": 1.8, "metallic": 2.2}
+        },
+        "turnaround": {
+          "kind": "multiplier",
+          "default": "standard",
+          "prices": {"rush": 2.5, "fast": 1.5, "standard": 1.0, "economy": 0.8}
+        }
       },
-      turnaround: {
-        'rush': 2.5,
-        'fast': 1.5,
-        'standard': 1.0,
-        'economy': 0.8
-      }
+      "quantity": {"default": 100, "sheet": [100, 250, 500, 1000, 2500, 5000, 10000]},
+      "discounts": []
     };
 
     this.init();
@@ -1806,6 +1824,33 @@ class PriceCalculatorManager {
   init() {
     this.bindEvents();
     this.generateQuoteNumber();
+    this.loadPriceSheet();
+  }
+
+  loadPriceSheet() {
+    // Unit prices published by the build (data/prices/); prices are computed until it loads
+    if (!$('#product-type')) return;
+    const root = location.pathname.includes('/services/') ? '../' : '';
+    fetch(`${root}data/prices/print.json`)
+      .then(response => (response.ok ? response.json() : null))
+      .then(sheet => {
+        this.priceSheet = sheet;
+      })
+      .catch(() => {});
+  }
+
+  lookupUnitPrice(values) {
+    const sheet = this.priceSheet;
+    if (!sheet) return null;
+
+    let index = 0;
+    for (let i = 0; i < sheet.keys.length; i++) {
+      const [name, options] = sheet.keys[i];
+      const code = options.indexOf(values[name]);
+      if (code < 0) return null;
+      index += code * sheet.strides[i];
+    }
+    return sheet.unit[index];
   }
 
   bindEvents() {
@@ -1846,13 +1891,15 @@ class PriceCalculatorManager {
     const turnaroundType = $('#turnaround').value;
 
     // Get base pricing
-    const basePrice = this.pricingData[productType].base * quantity;
+    const axes = this.rates.axes;
+    const rate = (axis, value) => axes[axis].prices[value] ?? axes[axis].prices[axes[axis].default];
+    const basePrice = rate('product', productType) * quantity;
 
     // Calculate multipliers
-    const paperMultiplier = this.multipliers.paper[paperType];
-    const finishMultiplier = this.multipliers.finish[finishType];
-    const colorMultiplier = this.multipliers.color[colorType];
-    const turnaroundMultiplier = this.multipliers.turnaround[turnaroundType];
+    const paperMultiplier = rate('paper', paperType);
+    const finishMultiplier = rate('finish', finishType);
+    const colorMultiplier = rate('color', colorType);
+    const turnaroundMultiplier = rate('turnaround', turnaroundType);
 
     // Calculate costs
     const paperCost = basePrice * (paperMultiplier - 1);
@@ -1860,8 +1907,20 @@ class PriceCalculatorManager {
     const colorCost = basePrice * (colorMultiplier - 1);
     const rushCost = basePrice * (turnaroundMultiplier - 1);
 
-    const totalPrice = basePrice * paperMultiplier * finishMultiplier * colorMultiplier * turnaroundMultiplier;
-    const unitPrice = totalPrice / quantity;
+    // The published price sheet has every option combination; compute when it has not loaded
+    const options = { product: productType, paper: paperType, finish: finishType, color: colorType, turnaround: turnaroundType };
+    const unitPrice = this.lookupUnitPrice(options)
+      ?? rate('product', productType) * paperMultiplier * finishMultiplier * colorMultiplier * turnaroundMultiplier;
+    const subtotal = unitPrice * quantity;
+
+    // Quantity discount: the highest tier the quantity reaches
+    let discount = 0;
+    for (const [minimum, tierRate] of this.rates.discounts) {
+      if (quantity >= minimum) {
+        discount = tierRate;
+      }
+    }
+    const totalPrice = subtotal - subtotal * discount;
 
     // Update UI
     this.updatePriceDisplay({
@@ -1996,7 +2055,7 @@ class PriceCalculatorManager {
     }
   }
 
-  requestOfficialQuote() {
+  async requestOfficialQuote() {
     const formData = {
       productType: $('#product-type').value,
       quantity: $('#quantity').value,
@@ -2008,28 +2067,53 @@ class PriceCalculatorManager {
       quoteNumber: $('#quote-number').textContent
     };
 
-    // Simulate quote request
+    // The intake service prices the request again and stores it
+    let result = null;
+    try {
+      result = await submitIntake('/quotes', {
+        line: 'print',
+        options: {
+          product: formData.productType,
+          paper: formData.paperType,
+          finish: formData.finishType,
+          color: formData.colorType,
+          turnaround: formData.turnaroundType
+        },
+        quantity: formData.quantity,
+        total: parseFloat(formData.totalPrice.replace(/[^0-9.]/g, '')),
+        quote_number: formData.quoteNumber
+      });
+    } catch (error) {
+      console.warn('Quote request not sent:', error);
+    }
+
     const modal = $('#quoteModal');
     const modalText = $('#quoteModalText');
 
     if (modal && modalText) {
-      modalText.innerHTML = `
+      const fmt = new Intl.NumberFormat('en-IN', { style: 'currency', currency: 'INR', maximumFractionDigits: 2 });
+      modalText.innerHTML = result ? `
         <div style="text-align: center;">
           <h3 style="margin-bottom: 16px;">📋 Quote Request Submitted!</h3>
-          <p><strong>Quote #:</strong> ${formData.quoteNumber}</p>
+          <p><strong>Quote #:</strong> ${formData.quoteNumber} (ref. ${result.ref})</p>
           <p><strong>Product:</strong> ${formData.productType.replace('-', ' ')}</p>
           <p><strong>Quantity:</strong> ${formData.quantity} pieces</p>
-          <p><strong>Estimated Total:</strong> ${formData.totalPrice}</p>
+          <p><strong>Estimated Total:</strong> ${fmt.format(result.total)}</p>
           <br>
           <p style="color: #059669;">✅ Our team will contact you within 2 hours with your official quote!</p>
         </div>
+      ` : `
+        <div style="text-align: center;">
+          <h3 style="margin-bottom: 16px;">⚠️ Quote Request Not Sent</h3>
+          <p>We could not reach our quote desk just now. Please try again, or call us with quote #${formData.quoteNumber}.</p>
+        </div>
       `;
       modal.classList.add('active');
     }
 
     // Animate success
     const btn = $('#request-quote');
-    if (btn) {
+    if (btn && result) {
       const originalText = btn.innerHTML;
       btn.innerHTML = '✅ Quote Requested!';
       btn.style.background = 'var(--success-color)';
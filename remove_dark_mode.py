@@ -7,6 +7,8 @@ import os
 import re
 from pathlib import Path
 
+from sitebuild.snapshots import write_text
+
 def remove_dark_mode_from_html(file_path):
     """Remove dark mode related code from HTML files"""
     try:
@@ -36,8 +38,7 @@ def remove_dark_mode_from_html(file_path):
         content = re.sub(r' class="[^"]*dark[^"]*"', lambda m: m.group(0).replace('dark', '').replace('  ', ' ').rstrip(' "') + '"' if m.group(0).replace('dark', '').strip(' "') else '', content)
         
         if content != original_content:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            write_text(file_path, content, label=__file__)
             print(f"✅ Cleaned: {file_path}")
             return True
         else:
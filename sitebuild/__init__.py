@@ -0,0 +1,24 @@
+"""
+Site build tools for the Shristi Press website
+
+The rewrite scripts in the repository root each read, patch and write the
+pages on their own. This package runs the same rewrites as registered
+transforms over a single in-memory load of the site, and writes an
+optimised copy of it to dist/ through registered build stages.
+"""
+
+from .build import Site
+from .catalogue import Catalogue, CatalogueError
+from .engine import IOStats, Page, discover_pages, refresh
+from .fragments import FRAGMENTS, BuildContext, FragmentMissing, fragment
+from .manifest import Manifest
+from .snapshots import SnapshotStore, Transaction, atomic_write
+from .stages import STAGES, stage
+from .transforms import TRANSFORMS, Transform, resolve_transforms, transform
+
+__all__ = [
+    'BuildContext', 'Catalogue', 'CatalogueError', 'FRAGMENTS', 'FragmentMissing', 'IOStats',
+    'Manifest', 'Page', 'STAGES', 'Site', 'SnapshotStore', 'TRANSFORMS', 'Transaction', 'Transform',
+    'atomic_write', 'discover_pages', 'fragment', 'refresh', 'resolve_transforms', 'stage',
+    'transform',
+]
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Command line entry point for the site build tools
+
+    python -m sitebuild refresh [--full] [--jobs N] [--dry-run [--diff stat|unified|structural]] [TRANSFORM ...]
+    python -m sitebuild list
+    python -m sitebuild render [SLUG ...]
+    python -m sitebuild extract [--force]
+    python -m sitebuild rollback [--list] [--force] [RUN]
+    python -m sitebuild images [--jobs N] [--force]
+    python -m sitebuild build [--out DIR] [STAGE ...]
+    python -m sitebuild serve [--host HOST] [--port PORT] [TRANSFORM ...]
+    python -m sitebuild intake [--host HOST] [--port PORT] [--db FILE] [--batch N] [--origin ORIGIN]
+    python -m sitebuild preflight [--line LINE] [--size SIZE] [--budget SECONDS] [--jobs N] [--format text|json] FILE ...
+    python -m sitebuild artwork [--line LINE] [--size SIZE] [--quantity N] [--option NAME=VALUE ...] [--jobs N] [--format text|json] FILE ...
+    python -m sitebuild links [--jobs N]
+    python -m sitebuild lint [--jobs N] [--format text|json|junit] [RULE|GROUP ...]
+    python -m sitebuild budget [--dir DIR] [--jobs N] [--format text|json] [PAGE ...]
+    python -m sitebuild price [--export] [LINE [CSV]]
+    python -m sitebuild price-sheets [--out DIR] [--format csv|parquet] [LINE ...]
+    python -m sitebuild bench refresh|incremental|parallel|tokenizer|templates|snapshots|intake|preflight|artwork
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from . import artwork, bench, budget, build, diff, engine, images, intake, links, lint, preflight, pricesheets, pricing, serve, templates
+from .catalogue import CatalogueError
+from .manifest import Manifest
+from .snapshots import SnapshotStore, Transaction
+from .transforms import TRANSFORMS
+
+
+def cmd_refresh(args):
+    manifest = Manifest.for_root(args.root)
+    if args.full:
+        manifest.reset()
+    report = engine.refresh(args.root, args.transforms, manifest=manifest, jobs=args.jobs,
+                            dry_run=args.dry_run, diff_format=args.diff)
+    return 1 if report.errors else 0
+
+
+def cmd_list(args):
+    for t in TRANSFORMS.values():
+        source = f" (was {t.script})" if t.script else ''
+        default = ' ' if t.default else '*'
+        print(f"{t.name:24}{default} v{t.version}  {t.description}{source}")
+    print("\n* only runs when named explicitly")
+    return 0
+
+
+def cmd_render(args):
+    templates.render_services(args.root, args.slugs)
+    return 0
+
+
+def cmd_extract(args):
+    templates.extract_services(args.root, force=args.force)
+    return 0
+
+
+def cmd_rollback(args):
+    store = SnapshotStore(args.root)
+    if args.list:
+        for run_id in store.runs():
+            journal = store.load_run(run_id)
+            print(f"{run_id}  {len(journal['files']):>4} files  {journal['label']}")
+        print(f"Snapshot store: {store.disk_usage() / 1024:.1f} KB")
+        return 0
+
+    restored = store.rollback(args.run, force=args.force)
+    if restored is None:
+        print("⚠ No snapshot runs to roll back")
+        return 1
+    print(f"Restored {len(restored)} file(s)")
+    return 0
+
+
+def cmd_images(args):
+    report = images.optimise_images(args.root, jobs=args.jobs, force=args.force)
+    return 1 if report.errors else 0
+
+
+def cmd_build(args):
+    build.build(args.root, args.stages, out=args.out)
+    return 0
+
+
+def cmd_serve(args):
+    return serve.serve(args.root, args.host, args.port, args.transforms)
+
+
+def cmd_intake(args):
+    return intake.serve(args.root, args.host, args.port, db=args.db, batch=args.batch, origin=args.origin)
+
+
+def cmd_links(args):
+    report = links.check_links(args.root, jobs=args.jobs)
+    return 1 if report.problems else 0
+
+
+def cmd_lint(args):
+    report = lint.lint(args.root, args.rules, jobs=args.jobs, fmt=args.format)
+    return 1 if report.problems else 0
+
+
+def cmd_budget(args):
+    report = budget.check_budgets(args.root, args.dir, args.pages, jobs=args.jobs, fmt=args.format)
+    return 1 if report.failed else 0
+
+
+def cmd_price(args):
+    table = pricing.load(args.root)
+    if args.export:
+        root = Path(args.root)
+        with Transaction(root, 'price --export') as txn:
+            changed = pricing.export_scripts(
+                table, lambda rel: (root / rel).read_text(encoding='utf-8') if (root / rel).exists() else None,
+                lambda rel, text: txn.write(root / rel, text.encode('utf-8')))
+        for rel in changed:
+            print(f"✅ Updated: {rel}")
+        if not changed:
+            print(f"Calculator scripts already match {pricing.PRICING_PATH}")
+        return 0
+    if not args.line:
+        for line in table.lines.values():
+            print(f"{line.name:20}{line.title}")
+            for axis in line.axes:
+                print(f"    {axis.name:16}{axis.kind:12}{', '.join(axis.options)}")
+        return 0
+    infile = open(args.csv, newline='', encoding='utf-8') if args.csv else sys.stdin
+    with infile:
+        count, elapsed = pricing.price_csv(table, args.line, infile, sys.stdout)
+    print(f"Priced {count} configuration(s) in {elapsed * 1000:.2f} ms", file=sys.stderr)
+    return 0
+
+
+def cmd_price_sheets(args):
+    pricesheets.write_sheets(args.root, args.lines, out=args.out, fmt=args.format)
+    return 0
+
+
+def cmd_preflight(args):
+    reports = preflight.preflight_files(args.root, args.files, line=args.line, size=args.size,
+                                        budget=args.budget, jobs=args.jobs, fmt=args.format)
+    return 1 if any(r.status == 'fail' for r in reports) else 0
+
+
+def cmd_artwork(args):
+    choices = dict(option.partition('=')[::2] for option in args.option)
+    report = artwork.analyse_files(args.root, args.files, line=args.line, size=args.size, quantity=args.quantity,
+                                   choices=choices, jobs=args.jobs, fmt=args.format)
+    return 1 if report.failed else 0
+
+
+def cmd_bench(args):
+    BENCHMARKS[args.name](args.root)
+    return 0
+
+
+BENCHMARKS = {
+    'refresh': bench.bench_refresh,
+    'incremental': bench.bench_incremental,
+    'parallel': bench.bench_parallel,
+    'tokenizer': bench.bench_tokenizer,
+    'templates': bench.bench_templates,
+    'snapshots': bench.bench_snapshots,
+    'intake': bench.bench_intake,
+    'preflight': bench.bench_preflight,
+    'artwork': bench.bench_artwork,
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='sitebuild', description="Shristi Press site build tools")
+    parser.add_argument('--root', default='.', help="site root (default: current directory)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('refresh', help="run page transforms over the site")
+    p.add_argument('transforms', nargs='*', help="transforms to run (default: all)")
+    p.add_argument('--full', action='store_true', help="ignore the build manifest and rebuild every page")
+    p.add_argument('--jobs', '-j', type=int, default=1, help="transform pages in N worker processes")
+    p.add_argument('--dry-run', '-n', action='store_true', help="show what would change without writing")
+    p.add_argument('--diff', choices=diff.DIFF_FORMATS, default='stat',
+                   help="how --dry-run shows each changed page (default: stat)")
+    p.set_defaults(func=cmd_refresh)
+
+    p = sub.add_parser('list', help="list registered transforms")
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser('render', help="render services/*.html from content/services/")
+    p.add_argument('slugs', nargs='*', help="services to render (default: all)")
+    p.set_defaults(func=cmd_render)
+
+    p = sub.add_parser('extract', help="create content/services/ files from the existing pages")
+    p.add_argument('--force', action='store_true', help="overwrite existing content files")
+    p.set_defaults(func=cmd_extract)
+
+    p = sub.add_parser('rollback', help="undo the last page-rewriting run from its snapshot")
+    p.add_argument('run', nargs='?', help="run to roll back (default: the latest)")
+    p.add_argument('--list', action='store_true', help="list the runs that can be rolled back")
+    p.add_argument('--force', action='store_true', help="also restore pages edited since the run")
+    p.set_defaults(func=cmd_rollback)
+
+    p = sub.add_parser('images', help="write resized WebP/AVIF variants of assets/images")
+    p.add_argument('--jobs', '-j', type=int, help="worker processes (default: one per CPU)")
+    p.add_argument('--force', action='store_true', help="re-encode images even if unchanged")
+    p.set_defaults(func=cmd_images)
+
+    p = sub.add_parser('build', help="write an optimised copy of the site to dist/")
+    p.add_argument('stages', nargs='*', help="build stages to run (default: all)")
+    p.add_argument('--out', default=build.DIST_DIR, help="output directory (default: dist)")
+    p.set_defaults(func=cmd_build)
+
+    p = sub.add_parser('serve', help="serve the rendered site locally, rebuilding pages as their sources change")
+    p.add_argument('transforms', nargs='*', help="transforms to apply (default: all)")
+    p.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    p.add_argument('--port', type=int, default=8000, help="port to listen on (default: 8000)")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser('intake', help="accept quote and contact submissions into a SQLite database")
+    p.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    p.add_argument('--port', type=int, default=8001, help="port to listen on (default: 8001)")
+    p.add_argument('--db', default=intake.DB_PATH, help=f"database file (default: {intake.DB_PATH})")
+    p.add_argument('--batch', type=int, default=intake.BATCH_MAX,
+                   help=f"most submissions per commit (default: {intake.BATCH_MAX})")
+    p.add_argument('--origin', default='*', help="Access-Control-Allow-Origin to send (default: *)")
+    p.set_defaults(func=cmd_intake)
+
+    p = sub.add_parser('preflight', help="check print artwork (PDF, JPEG, PNG) before it goes to press")
+    p.add_argument('files', nargs='+', help="files to check")
+    p.add_argument('--line', help="product line the artwork is for, e.g. childrens-book")
+    p.add_argument('--size', help="ordered trim size in inches, e.g. 6x9")
+    p.add_argument('--budget', type=float, default=preflight.BUDGET,
+                   help=f"seconds before the report is due (default: {preflight.BUDGET:g})")
+    p.add_argument('--jobs', '-j', type=int, help="worker processes (default: up to 4)")
+    p.add_argument('--format', choices=('text', 'json'), default='text', help="report format (default: text)")
+    p.set_defaults(func=cmd_preflight)
+
+    p = sub.add_parser('artwork', help="measure resolution, ink coverage and bleed of raster artwork and price its ink")
+    p.add_argument('files', nargs='+', help="pages of one job (JPEG, PNG, TIFF; every TIFF frame is a page)")
+    p.add_argument('--line', help="product line to price the job on, e.g. childrens-book")
+    p.add_argument('--size', help="ordered trim size in inches, e.g. 6x9")
+    p.add_argument('--quantity', type=int, help="copies to quote for (default: the line's default)")
+    p.add_argument('--option', action='append', default=[], metavar='NAME=VALUE',
+                   help="an option of the line to quote with, e.g. product=posters (repeatable)")
+    p.add_argument('--jobs', '-j', type=int, help="worker processes (default: one per page, up to the CPU count)")
+    p.add_argument('--format', choices=('text', 'json'), default='text', help="report format (default: text)")
+    p.set_defaults(func=cmd_artwork)
+
+    p = sub.add_parser('links', help="report broken links, missing anchors and missing assets")
+    p.add_argument('--jobs', '-j', type=int, default=1, help="index pages in N worker processes")
+    p.set_defaults(func=cmd_links)
+
+    p = sub.add_parser('lint', help="check page structure against the lint rules")
+    p.add_argument('rules', nargs='*', help="rules or rule groups to run (default: all)")
+    p.add_argument('--jobs', '-j', type=int, default=1, help="lint pages in N worker processes")
+    p.add_argument('--format', choices=('text', 'json', 'junit'), default='text', help="report format")
+    p.set_defaults(func=cmd_lint)
+
+    p = sub.add_parser('budget', help="weigh each page with everything it loads and check the budgets")
+    p.add_argument('pages', nargs='*', help="pages to list file by file")
+    p.add_argument('--dir', help="built site to check (default: dist/ when built, else the source tree)")
+    p.add_argument('--jobs', '-j', type=int, help="compress new files in N worker processes (default: all CPUs)")
+    p.add_argument('--format', choices=('text', 'json'), default='text', help="report format")
+    p.set_defaults(func=cmd_budget)
+
+    p = sub.add_parser('price', help="price configurations in bulk from data/pricing.json")
+    p.add_argument('line', nargs='?', help="product line to price (default: list the lines)")
+    p.add_argument('csv', nargs='?', help="CSV of configurations, one column per option (default: stdin)")
+    p.add_argument('--export', action='store_true', help="copy the rates into the calculator scripts")
+    p.set_defaults(func=cmd_price)
+
+    p = sub.add_parser('price-sheets', help="write the full price grid of each product line")
+    p.add_argument('lines', nargs='*', help="product lines to write (default: all)")
+    p.add_argument('--out', default=pricesheets.SHEET_DIR, help="output directory (default: price-sheets)")
+    p.add_argument('--format', choices=pricesheets.FORMATS, default='csv', help="file format (default: csv)")
+    p.set_defaults(func=cmd_price_sheets)
+
+    p = sub.add_parser('bench', help="run a benchmark against a copy of the site")
+    p.add_argument('name', choices=sorted(BENCHMARKS))
+    p.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        return 2
+    except (CatalogueError, images.PillowMissing, pricing.PricingError) as e:
+        print(f"❌ {e}")
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""
+Artwork analysis for raster print jobs
+
+"python -m sitebuild artwork" decodes the pages of a job (JPEG, PNG or
+TIFF files; each frame of a multi-page TIFF is a page) into NumPy arrays
+and measures each page against the trim size ordered:
+
+- resolution: the artwork should cover the trim plus 3 mm of bleed on
+  each side; its effective dpi is its pixels over that area,
+- ink coverage: ink per pixel (CMYK files as they are, RGB and greyscale
+  converted with full black generation); the page's mean over
+  the trim, which is what ink is charged on, and its total area coverage
+  (TAC): the 99.9th percentile and the share of the page above TAC_LIMIT,
+- bleed: on each side, the share of the edge that is inked at the trim
+  line but blank out in the bleed, where a white sliver can show after
+  cutting,
+- safe zone: sharp detail (text, rules) within SAFE_MARGIN of the trim,
+  found from the ink gradient, which the cut may clip.
+
+All of it is whole-array NumPy arithmetic on integers. Ink is counted in
+255ths of a solid colour, the steps of an 8-bit channel, so a pixel holds
+0 to 1020 and CMYK ink is the plain sum of its channels; RGB goes through
+a table indexed by the brightest channel and the channel sum. The page is
+converted STRIP_ROWS rows at a time so large pages stay within memory,
+and each strip is added to a histogram of ink levels (np.bincount): the
+mean, the TAC percentile and the share over the limit are all read off
+it exactly. The pages of a job are analysed in a process pool.
+
+Mean coverages feed the pricing engine: a line with an "ink" entry in
+data/pricing.json ({"included": percent, "price": per point per page})
+adds PriceLine.ink_cost(coverages) to the unit price of a copy.
+
+NumPy and Pillow are needed: pip install numpy pillow.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from . import preflight, pricing
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+STRIP_ROWS = 256
+SOLID = 255              # ink units in one solid colour
+LEVELS = 4 * SOLID + 1
+TAC_LIMIT = 300          # percent
+WHITE = 5                # ink units that still count as blank paper (2%)
+SAFE_MARGIN = 5 / 25.4 * preflight.POINTS_PER_INCH   # 5 mm
+EDGE_STEP = 64           # ink units between neighbouring pixels that make an edge (25%)
+BLEED_SHARE = 0.05       # of an edge stopping at the trim before it is reported
+DETAIL_SHARE = 0.005     # of a margin being sharp detail before it is reported
+ASPECT_TOLERANCE = 0.02
+
+_rgb_table = None
+
+
+def require():
+    if np is None or Image is None:
+        raise pricing.PricingError("Artwork analysis needs NumPy and Pillow: pip install numpy pillow")
+
+
+def rgb_table():
+    """Ink of an RGB pixel by brightest channel m and channel sum s, at index m * 766 + s
+
+    With full black generation K = 1 - m and C + M + Y = (3m - s) / m,
+    all in fractions of a solid; black (m = 0) is solid K.
+    """
+    global _rgb_table
+    if _rgb_table is None:
+        m = np.arange(256, dtype=np.float64)[:, None]
+        s = np.arange(766, dtype=np.float64)[None, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cmy = np.where(m > 0, (3 * m - s) / np.maximum(m, 1), 0).clip(0, 3)
+        _rgb_table = np.rint((SOLID - m) + cmy * SOLID).astype(np.uint16).ravel()
+    return _rgb_table
+
+
+def ink(pixels, mode):
+    """Ink per pixel in 255ths of a solid colour (0-1020) for pixels in mode CMYK, L or RGB"""
+    if mode == 'CMYK':
+        total = pixels[..., 0].astype(np.uint16)
+        for channel in range(1, 4):
+            total += pixels[..., channel]
+        return total
+    if mode == 'L':
+        return SOLID - pixels.astype(np.uint16)
+    r, g, b = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+    index = np.maximum(np.maximum(r, g), b).astype(np.uint32) * 766
+    index += r
+    index += g
+    index += b
+    return rgb_table()[index]
+
+
+def load_page(path, frame=0):
+    """(pixels, mode) of one page, in CMYK, L or RGB; transparency is flattened onto white"""
+    with Image.open(path) as img:
+        img.seek(frame)
+        if img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info):
+            rgba = img.convert('RGBA')
+            img = Image.alpha_composite(Image.new('RGBA', rgba.size, 'white'), rgba).convert('RGB')
+        elif img.mode not in ('CMYK', 'L', 'RGB'):
+            img = img.convert('RGB')
+        return np.asarray(img), img.mode
+
+
+def geometry(width, height, trim, bleed=preflight.BLEED_MIN):
+    """How the artwork maps onto the trim: scale (pixels per point), bleed in pixels and aspect error
+
+    Artwork turned the other way from the trim is measured against the
+    turned trim. Artwork whose shape is closer to the bare trim than to the
+    trim with bleed is taken to have no bleed.
+    """
+    tw, th = trim
+    if (width > height) != (tw > th) and width != height:
+        tw, th = th, tw
+    aspect = width / height
+    has_bleed = abs(aspect - (tw + 2 * bleed) / (th + 2 * bleed)) <= abs(aspect - tw / th)
+    area_w, area_h = (tw + 2 * bleed, th + 2 * bleed) if has_bleed else (tw, th)
+    scale = min(width / area_w, height / area_h)
+    error = abs(aspect / (area_w / area_h) - 1)
+    return scale, (bleed * scale if has_bleed else 0.0), error
+
+
+def _edges(pixels, mode, depth):
+    """Ink of the band depth pixels deep along each side, oriented from the outer edge inwards"""
+    bands = {
+        'left': pixels[:, :depth],
+        'right': pixels[:, ::-1][:, :depth],
+        'top': pixels[:depth].swapaxes(0, 1),
+        'bottom': pixels[::-1][:depth].swapaxes(0, 1),
+    }
+    return {side: ink(band, mode) for side, band in bands.items()}
+
+
+def _bleed_share(band, bleed_px):
+    """Share of an edge inked just inside the trim but blank across the outer half of the bleed"""
+    if not len(band):
+        return 0.0
+    outer = max(1, bleed_px // 2)
+    inked = band[:, min(bleed_px + 1, band.shape[1] - 1)] > WHITE
+    blank = band[:, :outer].max(axis=1) <= WHITE
+    return float(np.mean(inked & blank))
+
+
+def _detail_share(band, start, stop):
+    """Share of a margin strip that is sharp detail: a large ink step to a neighbouring pixel"""
+    margin = band[:, start:stop].astype(np.int16)
+    if margin.shape[0] < 2 or margin.shape[1] < 2:
+        return 0.0
+    across = np.abs(np.diff(margin, axis=1))[:-1]
+    along = np.abs(np.diff(margin, axis=0))[:, :-1]
+    return float(np.mean(np.maximum(across, along) > EDGE_STEP))
+
+
+def analyse_pixels(pixels, mode, options=None):
+    """Measurements and findings for one decoded page"""
+    options = options or {}
+    height, width = pixels.shape[:2]
+    result = {'width': width, 'height': height, 'mode': mode, 'megapixels': width * height / 1e6,
+              'dpi': None, 'bleed': {}, 'safe': {}, 'findings': []}
+    findings = result['findings']
+    trim = options.get('trim')
+    bleed_px = safe_px = 0
+    x0, y0, x1, y1 = 0, 0, width, height
+    if trim:
+        scale, bleed, error = geometry(width, height, trim)
+        bleed_px = int(round(bleed))
+        safe_px = int(round(SAFE_MARGIN * scale))
+        x0, y0, x1, y1 = bleed_px, bleed_px, width - bleed_px, height - bleed_px
+        dpi = scale * preflight.POINTS_PER_INCH
+        result['dpi'] = round(dpi, 1)
+        where = options.get('size') or 'the trim size'
+        if dpi < preflight.LOW_DPI:
+            findings.append(('error', f"{dpi:.0f} dpi at {where}: too low for print"))
+        elif dpi < preflight.MIN_DPI:
+            findings.append(('warning', f"{dpi:.0f} dpi at {where}: {preflight.MIN_DPI} or more is recommended"))
+        if not bleed_px:
+            findings.append(('warning', "No bleed: supply the artwork 3 mm larger than the trim on each side"))
+        if error > ASPECT_TOLERANCE:
+            findings.append(('warning', f"Artwork shape is {error:.0%} off {where}: it will be cropped or scaled"))
+
+    # Coverage over the trim, one strip of rows at a time
+    histogram = np.zeros(LEVELS, dtype=np.int64)
+    for top in range(y0, y1, STRIP_ROWS):
+        strip = ink(pixels[top:min(top + STRIP_ROWS, y1), x0:x1], mode)
+        histogram += np.bincount(strip.ravel(), minlength=LEVELS)
+    count = int(histogram.sum())
+    limit = TAC_LIMIT * SOLID // 100
+    percent = 100 / SOLID
+    result['coverage'] = round(float(histogram @ np.arange(LEVELS)) / count * percent, 2) if count else 0.0
+    result['tac'] = round(int(np.searchsorted(np.cumsum(histogram), 0.999 * count)) * percent) if count else 0
+    result['over_tac'] = round(float(histogram[limit + 1:].sum()) / count * 100, 3) if count else 0.0
+    if result['over_tac'] > 0.1:
+        findings.append(('warning', f"{result['over_tac']:.1f}% of the page has more than {TAC_LIMIT}% total ink"))
+
+    if trim:
+        depth = min(bleed_px + safe_px + 2, width // 2, height // 2)
+        for side, band in _edges(pixels, mode, depth).items():
+            # Leave out the corners, which belong to the neighbouring sides
+            band = band[bleed_px:band.shape[0] - bleed_px]
+            if bleed_px:
+                result['bleed'][side] = round(_bleed_share(band, bleed_px), 4)
+            result['safe'][side] = round(_detail_share(band, bleed_px + 2, bleed_px + safe_px), 4)
+        stopped = [side for side, share in result['bleed'].items() if share > BLEED_SHARE]
+        if stopped:
+            findings.append(('warning', f"Artwork stops at the trim on the {', '.join(stopped)} edge(s): "
+                                        f"extend the background into the bleed"))
+        crowded = [side for side, share in result['safe'].items() if share > DETAIL_SHARE]
+        if crowded:
+            findings.append(('warning', f"Text or fine detail within 5 mm of the trim on the "
+                                        f"{', '.join(crowded)} edge(s)"))
+    return result
+
+
+def analyse_page(item):
+    """Load and analyse one page (in a worker process)"""
+    path, frame, options = item
+    start = time.perf_counter()
+    try:
+        pixels, mode = load_page(path, frame)
+        result = analyse_pixels(pixels, mode, options)
+    except (OSError, ValueError, MemoryError, Image.DecompressionBombError) as e:
+        result = {'megapixels': 0.0, 'findings': [('error', f"Could not decode: {e}")]}
+    result.update({'file': path, 'frame': frame, 'seconds': time.perf_counter() - start})
+    return result
+
+
+def pages_of(paths):
+    """(path, frame) for every page of the files of a job"""
+    for path in paths:
+        try:
+            with Image.open(path) as img:
+                frames = getattr(img, 'n_frames', 1)
+        except (OSError, Image.DecompressionBombError):
+            # analyse_page() reports the file
+            frames = 1
+        for frame in range(frames):
+            yield str(path), frame
+
+
+class ArtworkReport:
+    """Outcome of analysing the pages of one job"""
+
+    def __init__(self, pages, options):
+        self.pages = pages
+        self.options = options
+        self.elapsed = 0.0
+        self.quote = None
+        self.quote_without_ink = None
+        self.ink_cost = None
+        self.unpriced = None
+
+    @property
+    def megapixels(self):
+        return sum(page['megapixels'] for page in self.pages)
+
+    @property
+    def coverages(self):
+        return [page['coverage'] for page in self.pages if 'coverage' in page]
+
+    @property
+    def failed(self):
+        return any(level == 'error' for page in self.pages for level, _ in page['findings'])
+
+    def price(self, line, quantity=None, choices=None):
+        """Quote the job on a product line (options as in choices), with and without its ink charge"""
+        options = dict(choices or {})
+        if self.options.get('size') and any(axis.name == 'size' for axis in line.axes):
+            options['size'] = self.options['size']
+        pages = len(self.pages) if line.pages else None
+        self.ink_cost = line.ink_cost(self.coverages)
+        self.quote = line.quote(quantity, pages, ink=self.ink_cost, **options)
+        self.quote_without_ink = line.quote(quantity, pages, **options)
+
+    def print_summary(self):
+        print(f"{'page':>5}  {'file':24}{'pixels':>13}{'mode':>6}{'dpi':>7}{'ink %':>8}{'TAC':>6}"
+              f"{'>' + str(TAC_LIMIT) + '%':>7}{'ms':>8}")
+        for number, page in enumerate(self.pages, 1):
+            name = Path(page['file']).name + (f"[{page['frame']}]" if page['frame'] else '')
+            if 'coverage' not in page:
+                print(f"{number:>5}  {name[:23]:24}{'-':>13}")
+            else:
+                pixels = f"{page['width']}x{page['height']}"
+                print(f"{number:>5}  {name[:23]:24}{pixels:>13}{page['mode']:>6}"
+                      f"{page['dpi'] if page['dpi'] is not None else '-':>7}{page['coverage']:>8.1f}"
+                      f"{page['tac']:>6}{page['over_tac']:>7.2f}{page['seconds'] * 1000:>8.1f}")
+            for level, message in page['findings']:
+                print(f"         {preflight.ICONS[level]} {message}")
+        rate = self.megapixels / self.elapsed if self.elapsed else 0.0
+        print(f"Pages: {len(self.pages)}, {self.megapixels:.1f} MP in {self.elapsed * 1000:.1f} ms ({rate:.1f} MP/s)")
+        if self.unpriced:
+            print(f"⚠ {self.unpriced}")
+        if self.quote is not None:
+            mean = sum(self.coverages) / len(self.coverages) if self.coverages else 0.0
+            print(f"Ink: {mean:.1f}% mean coverage, ₹{self.ink_cost:.2f} per copy; "
+                  f"total ₹{self.quote['total']:,.2f} (₹{self.quote_without_ink['total']:,.2f} without ink)")
+
+    def to_dict(self):
+        return {
+            'pages': [{key: value for key, value in page.items() if key != 'findings'} |
+                      {'findings': [{'level': level, 'message': message} for level, message in page['findings']]}
+                      for page in self.pages],
+            'megapixels': round(self.megapixels, 3),
+            'elapsed_ms': round(self.elapsed * 1000, 3),
+            'ink_cost': self.ink_cost,
+            'quote': self.quote,
+            'unpriced': self.unpriced,
+        }
+
+
+def analyse_job(paths, options=None, jobs=None):
+    """Analyse every page of a job, in a process pool when it has more than one page"""
+    require()
+    start = time.perf_counter()
+    options = options or {}
+    items = [(path, frame, options) for path, frame in pages_of(paths)]
+    jobs = jobs or min(len(items), os.cpu_count() or 1)
+    if jobs > 1 and len(items) > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            pages = list(pool.map(analyse_page, items))
+    else:
+        pages = [analyse_page(item) for item in items]
+    report = ArtworkReport(pages, options)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def analyse_files(root='.', paths=(), line=None, size=None, quantity=None, choices=None, jobs=None, fmt='text'):
+    """Analyse the files of one job, price it on line when given, and print the report"""
+    options = preflight.options_for(root, line, size)
+    report = analyse_job(paths, options, jobs)
+    if line and report.failed:
+        # A quote for pages that cannot be printed as they are would be wrong
+        report.unpriced = "Not priced: fix the errors above first"
+    elif line:
+        report.price(pricing.load(root).line(line), quantity, choices)
+    if fmt == 'json':
+        print(json.dumps(report.to_dict(), indent=2))
+    else:
+        report.print_summary()
+    return report
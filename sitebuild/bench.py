@@ -0,0 +1,583 @@
+"""
+Benchmarks comparing the rewrite engine with the legacy scripts
+
+Every benchmark runs against a throwaway copy of the site so the working
+tree is never modified.
+"""
+
+import asyncio
+import builtins
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import runpy
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+from . import artwork, engine, intake, preflight, pricing, templates
+from .catalogue import CATALOGUE_PATH
+from .manifest import Manifest
+from .snapshots import SnapshotStore, Transaction
+from .tokenizer import apply_edits, comment_pairs, scan
+from .transforms import NAV_CONTAINER_TAGS, _is_nav_container, resolve_transforms
+
+
+class _CountingFile:
+    """File wrapper that adds the bytes it moves to an IOStats"""
+
+    def __init__(self, f, stats):
+        self._f = f
+        self._stats = stats
+
+    def read(self, *args):
+        data = self._f.read(*args)
+        self._stats.bytes_read += len(data.encode('utf-8') if isinstance(data, str) else data)
+        return data
+
+    def write(self, data):
+        self._stats.bytes_written += len(data.encode('utf-8') if isinstance(data, str) else data)
+        return self._f.write(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return self._f.__exit__(*exc)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+@contextlib.contextmanager
+def count_open_calls(stats):
+    """Count every builtins.open() call made inside the block"""
+    real_open = builtins.open
+
+    def counting_open(file, mode='r', *args, **kwargs):
+        if any(flag in mode for flag in 'wax+'):
+            stats.writes += 1
+        else:
+            stats.reads += 1
+        return _CountingFile(real_open(file, mode, *args, **kwargs), stats)
+
+    builtins.open = counting_open
+    try:
+        yield stats
+    finally:
+        builtins.open = real_open
+
+
+def copy_site(src, dst):
+    """Copy the pages, fragments and scripts a refresh needs"""
+    shutil.copytree(src, dst, ignore=shutil.ignore_patterns(
+        '.git', '__pycache__', '*.backup', 'assets', '*.jsonl'))
+    ensure_footer_templates(dst)
+
+
+def ensure_footer_templates(root):
+    """Create the services/ footer templates from index.html if they are missing"""
+    root = Path(root)
+    content = (root / 'index.html').read_text(encoding='utf-8')
+    match = re.search(r'<footer.*?</footer>', content, re.DOTALL)
+    if not match:
+        return
+    for name in ('footer-template.html', 'footer-template-slim.html'):
+        path = root / 'services' / name
+        if not path.exists():
+            path.write_text(match.group(0), encoding='utf-8')
+
+
+def run_legacy_scripts(root, scripts):
+    """Run each legacy script in sequence from the site root"""
+    stats = engine.IOStats()
+    failures = []
+    cwd = os.getcwd()
+    os.chdir(root)
+    start = time.perf_counter()
+    try:
+        with count_open_calls(stats), contextlib.redirect_stdout(io.StringIO()):
+            for script in scripts:
+                try:
+                    runpy.run_path(script, run_name='__main__')
+                except Exception as e:
+                    failures.append((script, e))
+    finally:
+        os.chdir(cwd)
+    return stats, time.perf_counter() - start, failures
+
+
+def bench_refresh(root='.'):
+    """Compare a full refresh with the engine against the legacy scripts"""
+    scripts = [t.script for t in resolve_transforms() if t.script]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_root = Path(tmp) / 'legacy'
+        engine_root = Path(tmp) / 'engine'
+        copy_site(root, legacy_root)
+        copy_site(root, engine_root)
+
+        legacy_io, legacy_time, failures = run_legacy_scripts(legacy_root, scripts)
+        report = engine.refresh(engine_root, verbose=False)
+
+    print("Full refresh: legacy scripts vs rewrite engine")
+    print("=" * 60)
+    print(f"{'':18}{'opens':>8}{'KB read':>12}{'KB written':>12}{'ms':>10}")
+    for label, stats, elapsed in (('legacy scripts', legacy_io, legacy_time),
+                                  ('engine', report.io, report.elapsed)):
+        print(f"{label:18}{stats.reads + stats.writes:>8}"
+              f"{stats.bytes_read / 1024:>12.1f}{stats.bytes_written / 1024:>12.1f}"
+              f"{elapsed * 1000:>10.1f}")
+    for script, error in failures:
+        print(f"⚠ {script} failed: {error}")
+    for name, reason in report.skipped_transforms:
+        print(f"⚠ engine skipped {name}: {reason}")
+
+    return legacy_io, legacy_time, report
+
+
+def bench_incremental(root='.'):
+    """Time a full build, a no-change rerun and a rerun after one page edit"""
+    with tempfile.TemporaryDirectory() as tmp:
+        site = Path(tmp) / 'site'
+        copy_site(root, site)
+
+        runs = [('full build', engine.refresh(site, verbose=False, manifest=Manifest.for_root(site)))]
+        # The first build rewrites index.html, which changes its fragments once
+        engine.refresh(site, verbose=False, manifest=Manifest.for_root(site))
+        runs.append(('no changes', engine.refresh(site, verbose=False, manifest=Manifest.for_root(site))))
+
+        edited = engine.discover_pages(site)[-1]
+        with open(edited, 'a', encoding='utf-8') as f:
+            f.write('\n<!-- edited -->\n')
+        runs.append((f'edit {edited.name}',
+                     engine.refresh(site, verbose=False, manifest=Manifest.for_root(site))))
+
+    print("Incremental refresh with the build manifest")
+    print("=" * 70)
+    print(f"{'':34}{'fresh':>7}{'loaded':>8}{'written':>9}{'ms':>10}")
+    for label, report in runs:
+        print(f"{label:34}{len(report.fresh):>7}{len(report.pages):>8}"
+              f"{len(report.written):>9}{report.elapsed * 1000:>10.1f}")
+
+    return runs
+
+
+def generate_service_pages(root, count):
+    """Pad services/ with copies of the existing service pages up to count pages"""
+    services = Path(root) / 'services'
+    originals = engine.discover_pages(root)
+    originals = [p for p in originals if p.parent == services]
+    for i in range(max(0, count - len(originals))):
+        source = originals[i % len(originals)]
+        shutil.copyfile(source, services / f'generated-{i:05d}-{source.name}')
+
+
+def bench_parallel(root='.', sizes=(30, 300, 3000), jobs=None):
+    """Time the navbar/footer propagation serially and in a process pool"""
+    cpus = os.cpu_count() or 1
+    jobs = jobs or sorted({1, 2, 4, cpus})
+    names = ['navbar-footer-complete']
+    results = []
+
+    print(f"navbar-footer-complete with --jobs N ({cpus} CPUs available)")
+    print("=" * 60)
+    print(f"{'pages':>8}" + ''.join(f"{f'j={n} ms':>12}" for n in jobs))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            base = Path(tmp) / f'base-{size}'
+            copy_site(root, base)
+            generate_service_pages(base, size)
+
+            row = []
+            for n in jobs:
+                site = Path(tmp) / f'run-{size}-{n}'
+                shutil.copytree(base, site)
+                report = engine.refresh(site, names, verbose=False, jobs=n)
+                row.append(report.elapsed)
+                results.append((size, n, len(report.pages), report.elapsed))
+                shutil.rmtree(site)
+
+            print(f"{size:>8}" + ''.join(f"{t * 1000:>12.1f}" for t in row))
+            shutil.rmtree(base)
+
+    return results
+
+
+# The removal passes of update_navbar_footer_correctly.py, kept as the baseline
+LEGACY_STRIP_PATTERNS = [
+    r'<header[^>]*>.*?</header>',
+    r'<nav[^>]*>.*?</nav>',
+    r'<!--.*?Navigation.*?-->.*?<!--.*?Navigation.*?-->',
+    r'<!--.*?Main.*?Navigation.*?-->.*?<!--.*?Main.*?Navigation.*?-->',
+    r'<div[^>]*class="[^"]*nav[^"]*"[^>]*>.*?</div>',
+    r'<ul[^>]*class="[^"]*nav[^"]*"[^>]*>.*?</ul>',
+    r'<footer[^>]*>.*?</footer>',
+    r'<!--.*?Footer.*?-->.*?<!--.*?Footer.*?-->',
+    r'<style[^>]*>.*?</style>',
+    r'<script[^>]*>.*?</script>',
+]
+
+
+def strip_with_regex(content):
+    for pattern in LEGACY_STRIP_PATTERNS:
+        content = re.sub(pattern, '', content, flags=re.DOTALL | re.IGNORECASE)
+    return content
+
+
+def strip_with_tokenizer(content):
+    page_map = scan(content, predicate=_is_nav_container, predicate_tags=NAV_CONTAINER_TAGS)
+    removals = [(r.start, r.end) for r in page_map.regions]
+    removals += comment_pairs(page_map.comments, 'navigation')
+    removals += comment_pairs(page_map.comments, 'footer')
+    return apply_edits(content, removals)
+
+
+def synthetic_page(template, size):
+    """A page of roughly size bytes made by repeating the body of template"""
+    body_start = template.find('<body')
+    body_end = template.rfind('</body>')
+    head, body, tail = template[:body_start], template[body_start:body_end], template[body_end:]
+    body = body[body.find('>') + 1:]
+    repeats = max(1, (size - len(head) - len(tail)) // len(body))
+    return head + '<body>' + body * repeats + tail
+
+
+def adversarial_page(size):
+    """Unpaired comments and unclosed nav divs: the regexes' quadratic case"""
+    block = '<!-- product block -->\n<div class="nav-item"><p>Business cards, brochures and flyers</p>\n'
+    return ('<html><head></head><body>' + block * (size // len(block)) +
+            '<!-- Navigation -->\n</body></html>')
+
+
+def bench_tokenizer(root='.', sizes_mb=(1, 2, 5, 10), adversarial_kb=(16, 32, 64, 128)):
+    """Compare the DOTALL regex strip passes with the streaming tokenizer"""
+    template = (Path(root) / 'index.html').read_text(encoding='utf-8')
+    cases = [('index.html', template)]
+    cases += [(f'synthetic {mb} MB', synthetic_page(template, mb * 1024 * 1024)) for mb in sizes_mb]
+    cases += [(f'adversarial {kb} KB', adversarial_page(kb * 1024)) for kb in adversarial_kb]
+    results = []
+
+    print("Stripping header/nav/footer/style/script: regex vs tokenizer")
+    print("=" * 70)
+    print(f"{'page':22}{'KB':>10}{'regex ms':>12}{'tokenizer ms':>14}{'speedup':>10}")
+    for label, content in cases:
+        start = time.perf_counter()
+        strip_with_regex(content)
+        regex_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        strip_with_tokenizer(content)
+        token_time = time.perf_counter() - start
+
+        results.append((label, len(content), regex_time, token_time))
+        print(f"{label:22}{len(content) / 1024:>10.0f}{regex_time * 1000:>12.1f}"
+              f"{token_time * 1000:>14.1f}{regex_time / token_time:>9.1f}x")
+
+    return results
+
+
+def bench_templates(root='.', sizes=(30, 300, 3000)):
+    """Render the service pages from templates at growing site sizes"""
+    root = Path(root)
+    results = []
+
+    print("Rendering services/*.html from templates")
+    print("=" * 60)
+    print(f"{'pages':>8}{'compiled':>10}{'cached':>8}{'total ms':>12}{'ms/page':>10}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            site = Path(tmp) / f'site-{size}'
+            shutil.copytree(root / templates.TEMPLATE_DIR, site / templates.TEMPLATE_DIR)
+            shutil.copytree(root / templates.CONTENT_DIR, site / templates.CONTENT_DIR)
+            content_dir = site / templates.CONTENT_DIR
+            data = json.loads((root / CATALOGUE_PATH).read_text(encoding='utf-8'))
+            originals = list(data['services'])
+            for i in range(max(0, size - len(originals))):
+                source = originals[i % len(originals)]
+                slug = f"generated-{i:05d}-{source['slug']}"
+                shutil.copyfile(content_dir / f"{source['slug']}.html", content_dir / f'{slug}.html')
+                data['services'].append(dict(source, slug=slug, menu=False))
+            (site / CATALOGUE_PATH).parent.mkdir(parents=True)
+            (site / CATALOGUE_PATH).write_text(json.dumps(data), encoding='utf-8')
+
+            # Share one bytecode cache so only the first size pays for compiling
+            if (Path(tmp) / 'cache').exists():
+                shutil.copytree(Path(tmp) / 'cache', site / templates.CACHE_DIR)
+            report = templates.render_services(site, verbose=False)
+            shutil.copytree(site / templates.CACHE_DIR, Path(tmp) / 'cache', dirs_exist_ok=True)
+
+            per_page = report.elapsed / len(report.pages)
+            results.append((size, report.elapsed, per_page))
+            print(f"{len(report.pages):>8}{report.loader.compiled:>10}{report.loader.cache_hits:>8}"
+                  f"{report.elapsed * 1000:>12.1f}{per_page * 1000:>10.3f}")
+            shutil.rmtree(site)
+
+    return results
+
+
+def bench_snapshots(root='.', runs=10, share=3):
+    """Disk and time cost of .backup copies vs the snapshot store over repeated runs
+
+    Each run rewrites a rotating 1/share of the pages. The .backup workflow
+    copies every page before a run, as the hand-made backups in services/
+    did; the snapshot store only keeps what a run actually replaced.
+    """
+    root = Path(root)
+    print(f"{runs} runs each rewriting 1/{share} of the pages: .backup copies vs snapshot store")
+    print("=" * 60)
+    print(f"{'':18}{'ms':>10}{'KB on disk':>14}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('.backup copies', 'snapshot store'):
+            site = Path(tmp) / mode.strip('.').replace(' ', '-')
+            copy_site(root, site)
+            pages = [site / rel for rel in engine.discover_pages(site)]
+            start = time.perf_counter()
+            for i in range(runs):
+                marker = f'\n<!-- run {i} -->\n'.encode('utf-8')
+                targets = pages[i % share::share]
+                if mode == '.backup copies':
+                    for page in pages:
+                        shutil.copyfile(page, page.with_name(f'{page.name}.{i}.backup'))
+                    for page in targets:
+                        data = page.read_bytes()
+                        with open(page, 'wb') as f:
+                            f.write(data.split(b'\n<!-- run ')[0] + marker)
+                else:
+                    with Transaction(site, f'bench {i}') as txn:
+                        for page in targets:
+                            data = page.read_bytes()
+                            txn.write(page, data.split(b'\n<!-- run ')[0] + marker, previous=data)
+            elapsed = time.perf_counter() - start
+            if mode == '.backup copies':
+                used = sum(p.stat().st_size for p in site.rglob('*.backup'))
+            else:
+                used = SnapshotStore(site).disk_usage()
+            results[mode] = (elapsed, used)
+            print(f"{mode:18}{elapsed * 1000:>10.1f}{used / 1024:>14.1f}")
+
+    return results
+
+
+def _serve_intake(root, db, conn, cpu):
+    """Child process of bench_intake: the intake server pinned to one CPU"""
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+
+    async def main():
+        server = intake.IntakeServer(root, db)
+        conn.send(await server.start(port=0))
+        await asyncio.get_running_loop().run_in_executor(None, conn.recv)
+        await server.close()
+
+    asyncio.run(main())
+
+
+def bench_intake(root='.', rates=(1000, 2000, 4000, 8000, 12000), seconds=3, target=intake.TARGET_RATE):
+    """Throughput and latency of the intake server on one core at rising request rates
+
+    The server runs in its own process pinned to one CPU, with a throwaway
+    database; the load generator runs in this one, on another CPU when
+    there is one. Each step sends rate * seconds requests (four quotes to
+    one contact) at a fixed rate, see intake.load_test().
+    """
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+    server_cpu = cpus[0] if cpus else None
+    if len(cpus) > 1:
+        os.sched_setaffinity(0, set(cpus[1:]))
+    table = pricing.load(root)
+    print(f"Intake server on one core ({len(cpus) or '?'} CPUs available"
+          f"{', load generator shares it' if len(cpus) == 1 else ''})")
+    print("=" * 72)
+    print(f"{'target/s':>9}{'sent':>8}{'done/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'rows/commit':>13}{'errors':>8}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        parent, child = multiprocessing.Pipe()
+        server = multiprocessing.Process(target=_serve_intake,
+                                         args=(root, str(Path(tmp) / 'intake.sqlite3'), child, server_cpu))
+        server.start()
+        try:
+            port = parent.recv()
+            for rate in rates:
+                requests = intake.sample_requests(table, int(rate * seconds), seed=rate)
+                r = asyncio.run(intake.load_test('127.0.0.1', port, requests, rate))
+                results.append(r)
+                print(f"{rate:>9,}{r.sent:>8,}{r.achieved:>9,.0f}{r.percentile(50) * 1000:>9.1f}"
+                      f"{r.percentile(99) * 1000:>9.1f}{r.rows / max(r.commits, 1):>13.1f}{r.errors:>8}")
+        finally:
+            parent.send('stop')
+            server.join(10)
+
+    held = [r.rate for r in results if not r.errors and r.achieved >= 0.95 * r.rate
+            and r.percentile(99) <= intake.TARGET_P99]
+    best = max(held, default=0)
+    print(f"{'✅' if best >= target else '❌'} Highest rate held with p99 under {intake.TARGET_P99 * 1000:.0f} ms: "
+          f"{best:,}/s (target {target:,}/s)")
+    return results
+
+
+def synthetic_pdf(path, size, pages=500, xref_stream=False):
+    """Write a PDF of about size bytes: pages of 6x9 in artwork with bleed, one embedded font
+
+    Each page carries an image XObject of size / pages bytes. With
+    xref_stream the page objects go into an object stream and the
+    cross-reference table is a compressed xref stream, as PDF 1.5 writers do.
+    """
+    image = b'\x80' * max(1, size // pages)
+    box = '/MediaBox [0 0 450 666] /BleedBox [0 0 450 666] /TrimBox [9 9 441 657]'
+    first_page = 6
+    offsets = {}
+    with open(path, 'wb') as f:
+        def obj(num, body, stream=None):
+            offsets[num] = f.tell()
+            f.write(f"{num} 0 obj\n".encode('latin-1') + body)
+            if stream is not None:
+                f.write(b"\nstream\n" + stream + b"\nendstream")
+            f.write(b"\nendobj\n")
+
+        f.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        kids = ' '.join(f"{first_page + 3 * i} 0 R" for i in range(pages))
+        obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        obj(2, f"<< /Type /Pages /Count {pages} /Kids [{kids}] >>".encode('latin-1'))
+        obj(3, b"<< /Type /Font /Subtype /TrueType /BaseFont /ABCDEF+Bench /FontDescriptor 4 0 R >>")
+        obj(4, b"<< /Type /FontDescriptor /FontName /ABCDEF+Bench /FontFile2 5 0 R >>")
+        obj(5, b"<< /Length 4 >>", b"\x00\x01\x00\x00")
+        page_dicts = {}
+        for i in range(pages):
+            num = first_page + 3 * i
+            page_dicts[num] = (f"<< /Type /Page /Parent 2 0 R {box} /Contents {num + 1} 0 R /Resources "
+                               f"<< /Font << /F1 3 0 R >> /XObject << /Im1 {num + 2} 0 R >> >> >>").encode('latin-1')
+            content = b"q 450 0 0 666 0 0 cm /Im1 Do Q BT /F1 12 Tf 20 20 Td (Page) Tj ET"
+            obj(num + 1, f"<< /Length {len(content)} >>".encode('latin-1'), content)
+            obj(num + 2, (f"<< /Type /XObject /Subtype /Image /Width {len(image)} /Height 1 /ColorSpace "
+                          f"/DeviceGray /BitsPerComponent 8 /Length {len(image)} >>").encode('latin-1'), image)
+            if not xref_stream:
+                obj(num, page_dicts[num])
+        count = first_page + 3 * pages
+        if not xref_stream:
+            start = f.tell()
+            f.write(f"xref\n0 {count}\n0000000000 65535 f\r\n".encode('latin-1'))
+            for num in range(1, count):
+                f.write(f"{offsets[num]:010d} 00000 n\r\n".encode('latin-1'))
+            f.write(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{start}\n%%EOF\n".encode('latin-1'))
+            return
+        stm = count
+        header = b''
+        body = b''
+        for num, data in page_dicts.items():
+            header += f"{num} {len(body)} ".encode('latin-1')
+            body += data + b"\n"
+        obj(stm, f"<< /Type /ObjStm /N {len(page_dicts)} /First {len(header)} /Length {len(header + body)} >>"
+            .encode('latin-1'), header + body)
+        index = {num: i for i, num in enumerate(page_dicts)}
+        rows = []
+        for num in range(count + 2):
+            if num in index:
+                entry = (2, stm, index[num])
+            elif num in offsets:
+                entry = (1, offsets[num], 0)
+            elif num == count + 1:
+                entry = (1, f.tell(), 0)
+            else:
+                entry = (0, 0, 0)
+            rows.append(struct.pack('>BIH', *entry))
+        # PNG "Up" predictor rows, as writers compress xref streams
+        previous = bytes(7)
+        encoded = b''
+        for row in rows:
+            encoded += b'\x02' + bytes((a - b) & 0xFF for a, b in zip(row, previous))
+            previous = row
+        data = zlib.compress(encoded)
+        start = f.tell()
+        obj(count + 1, (f"<< /Type /XRef /Size {count + 2} /W [1 4 2] /Root 1 0 R /Filter /FlateDecode "
+                        f"/DecodeParms << /Predictor 12 /Columns 7 >> /Length {len(data)} >>").encode('latin-1'), data)
+        f.write(f"startxref\n{start}\n%%EOF\n".encode('latin-1'))
+
+
+def bench_preflight(root='.', sizes_mb=(5, 50, 500), budget=preflight.BUDGET):
+    """Preflight time of 6x9 in book PDFs from 5 to 500 MB, with both kinds of cross-reference"""
+    print(f"Preflight of synthetic 500-page PDFs (budget {budget:g} s)")
+    print("=" * 60)
+    print(f"{'MB':>6}{'xref':>8}{'status':>10}{'ms':>10}{'slowest check':>22}")
+    options = preflight.options_for(root, 'childrens-book', '6x9')
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, preflight.Preflight(budget=budget) as runner:
+        # Start the pool before timing, as a running server would have it
+        runner.run(Path(root) / 'assets/images/book-types/ticket.pdf', options)
+        for size in sizes_mb:
+            for kind in ('table', 'stream'):
+                path = Path(tmp) / f'book-{size}-{kind}.pdf'
+                synthetic_pdf(path, size * 1024 * 1024, xref_stream=kind == 'stream')
+                report = runner.run(path, options)
+                slowest = max(report.results.items(), key=lambda item: item[1][2])
+                results.append((size, kind, report))
+                print(f"{size:>6}{kind:>8}{report.status:>10}{report.elapsed * 1000:>10.1f}"
+                      f"{f'{slowest[0]} {slowest[1][2] * 1000:.1f} ms':>22}")
+                path.unlink()
+    return results
+
+
+def synthetic_artwork(path, size, dpi=300, mode='RGB', seed=0):
+    """A full-bleed page of artwork for a trim size in inches: a gradient, colour blocks and a rule near the edge"""
+    np = artwork.np
+    w, h = preflight.parse_size(size)
+    bleed = preflight.BLEED_MIN
+    width = int(round((w + 2 * bleed) / preflight.POINTS_PER_INCH * dpi))
+    height = int(round((h + 2 * bleed) / preflight.POINTS_PER_INCH * dpi))
+    rng = np.random.default_rng(seed)
+    channels = 4 if mode == 'CMYK' else 3
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None, None]
+    pixels = np.broadcast_to(y * rng.uniform(60, 200, channels).astype(np.float32), (height, width, channels)).copy()
+    for _ in range(12):
+        x0, y0 = rng.integers(0, width // 2), rng.integers(0, height // 2)
+        pixels[y0:y0 + height // 4, x0:x0 + width // 4] = rng.uniform(0, 255, channels)
+    inset = int(round(bleed / preflight.POINTS_PER_INCH * dpi)) + dpi // 20
+    pixels[inset:inset + 4, width // 4:width * 3 // 4] = 255 if mode == 'CMYK' else 0
+    pixels = pixels.astype(np.uint8)
+    artwork.Image.fromarray(pixels, mode).save(path, dpi=(dpi, dpi))
+    return width * height / 1e6
+
+
+def bench_artwork(root='.', pages=16, size='8.5x11', dpi=300, jobs=None):
+    """Artwork analysis throughput in megapixels per second, analysis alone and with decoding, 1 to N workers"""
+    artwork.require()
+    jobs = jobs or os.cpu_count() or 1
+    options = preflight.options_for(root, 'childrens-book', size)
+    print(f"Artwork analysis of {pages} pages at {size} in, {dpi} dpi (RGB PNG and CMYK TIFF)")
+    print("=" * 60)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(pages):
+            mode, suffix = ('RGB', 'png') if i % 2 == 0 else ('CMYK', 'tif')
+            paths.append(Path(tmp) / f'page-{i:03}.{suffix}')
+            synthetic_artwork(paths[-1], size, dpi, mode, seed=i)
+
+        decoded = [artwork.load_page(path) for path in paths]
+        megapixels = sum(pixels.shape[0] * pixels.shape[1] for pixels, _ in decoded) / 1e6
+        start = time.perf_counter()
+        for pixels, mode in decoded:
+            artwork.analyse_pixels(pixels, mode, options)
+        results['analyse'] = megapixels / (time.perf_counter() - start)
+        del decoded
+
+        print(f"{'':28}{'MP':>8}{'ms':>10}{'MP/s':>10}")
+        print(f"{'analyse (decoded, 1 process)':28}{megapixels:>8.1f}{megapixels / results['analyse'] * 1000:>10.1f}"
+              f"{results['analyse']:>10.1f}")
+        for n in sorted({1, jobs}):
+            report = artwork.analyse_job(paths, options, jobs=n)
+            results[n] = report.megapixels / report.elapsed
+            print(f"{f'decode + analyse, {n} process(es)':28}{report.megapixels:>8.1f}"
+                  f"{report.elapsed * 1000:>10.1f}{results[n]:>10.1f}")
+    return results
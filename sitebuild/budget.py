@@ -0,0 +1,354 @@
+"""
+Page-weight and request budgets
+
+"python -m sitebuild budget" works out everything a first visit to each
+page downloads:
+
+- the page, its stylesheets, scripts, icons, web manifest and preloads,
+- images: the first <source> of a <picture> (the one current browsers
+  pick), otherwise the <img> src, and video posters,
+- url()s and @imports in <style> blocks, style attributes and linked
+  stylesheets, followed recursively, so background images and fonts count,
+- the string URLs scripts pass to fetch(), resolved against the page.
+
+Every file is counted raw, gzipped and, with the brotli package, brotli
+compressed. Images and fonts are already compressed, so they count at their
+raw size. Background images count even when no element on the page uses
+them, so the totals are an upper bound. External URLs (CDNs, Google Fonts)
+add a request but no bytes, because nothing is fetched over the network.
+
+Budgets are registered below with budget() and are checked against gzip
+sizes, which every server can send. The run exits with 1 when a page
+breaks one. Compressed sizes are cached in .sitebuild/budget.json by
+content hash, so only new or changed files are compressed again.
+
+By default dist/ is checked when it has been built, and the source tree
+otherwise.
+"""
+
+import fnmatch
+import json
+import posixpath
+import re
+import time
+from pathlib import Path
+
+from . import compress
+from .build import DIST_DIR, Site
+from .dom import parse_dom
+from .manifest import sha256
+from .snapshots import atomic_write
+
+CACHE_PATH = '.sitebuild/budget.json'
+BUDGET_VERSION = 1
+BUDGETS = []
+
+KINDS = {'.html': 'html', '.css': 'css', '.js': 'js', '.json': 'data', '.webmanifest': 'data',
+         '.woff2': 'font', '.woff': 'font', '.ttf': 'font', '.otf': 'font', '.eot': 'font',
+         '.png': 'image', '.jpg': 'image', '.jpeg': 'image', '.gif': 'image', '.webp': 'image',
+         '.avif': 'image', '.svg': 'image', '.ico': 'image',
+         '.mp4': 'media', '.webm': 'media', '.mp3': 'media'}
+LINK_RELS = ('stylesheet', 'preload', 'modulepreload', 'manifest')
+
+_CSS_REF = re.compile(r'''url\(\s*(['"]?)([^'")]*)\1\s*\)|@import\s+(['"])([^'"]+)\3''')
+_STYLE_BLOCK = re.compile(r'<style\b[^>]*>(.*?)</style\s*>', re.IGNORECASE | re.DOTALL)
+_FETCH = re.compile(r'''\bfetch\(\s*(['"`])([^'"`$]+)\1''')
+
+
+def kind(rel):
+    return KINDS.get(posixpath.splitext(rel)[1].lower(), 'other')
+
+
+class Budget:
+    """Limits for the pages matching a pattern; sizes in gzip bytes"""
+
+    def __init__(self, pattern, requests, transfer, kinds):
+        self.pattern = pattern
+        self.requests = requests
+        self.transfer = transfer
+        self.kinds = kinds
+
+    def applies_to(self, rel):
+        return fnmatch.fnmatch(rel, self.pattern)
+
+    def check(self, weight):
+        """Messages for each limit weight breaks"""
+        problems = []
+        if self.requests is not None and weight.requests > self.requests:
+            problems.append(f"{weight.requests} requests, budget {self.requests}")
+        if self.transfer is not None and weight.gz > self.transfer:
+            problems.append(f"{_kb(weight.gz)} transferred, budget {_kb(self.transfer)}")
+        for name, limit in self.kinds.items():
+            size = weight.kinds.get(name, (0, 0, 0, 0))[2]
+            if size > limit:
+                problems.append(f"{_kb(size)} of {name}, budget {_kb(limit)}")
+        return problems
+
+
+def budget(pattern, requests=None, transfer=None, **kinds):
+    """Register limits for the pages matching pattern: requests, gzip bytes in total and per kind"""
+    BUDGETS.append(Budget(pattern, requests, transfer, kinds))
+    return BUDGETS[-1]
+
+
+budget('*.html', requests=50, transfer=1024 * 1024, css=60 * 1024, js=60 * 1024)
+budget('services/*.html', html=80 * 1024, image=512 * 1024)
+
+
+class DependencyGraph:
+    """The files each page loads, with stylesheets and scripts followed"""
+
+    def __init__(self, site):
+        self.site = site
+        self._refs = {}
+
+    def page(self, rel):
+        """(files, external, missing): output paths, external URLs and (url, target) not found"""
+        html = self.site.read_text(rel)
+        files = {rel: None}
+        external = {}
+        missing = {}
+        refs = []
+        icon = False
+        for el in parse_dom(html).elements:
+            attrs = el.attrs
+            if el.tag == 'link':
+                rels = (attrs.get('rel') or '').lower().split()
+                if any(name in rels for name in LINK_RELS) or ('icon' in rels and not icon):
+                    icon = icon or 'icon' in rels
+                    refs.append(attrs.get('href'))
+            elif el.tag == 'script':
+                refs.append(attrs.get('src'))
+            elif el.tag == 'img':
+                refs.append(_image(el))
+            elif el.tag == 'video':
+                refs.append(attrs.get('poster'))
+            if attrs.get('style'):
+                refs += [m.group(2) for m in _CSS_REF.finditer(attrs['style']) if m.group(2)]
+        for block in _STYLE_BLOCK.finditer(html):
+            refs += [m.group(2) or m.group(4) for m in _CSS_REF.finditer(block.group(1))]
+
+        pending = [(rel, url) for url in refs if url]
+        while pending:
+            base, url = pending.pop(0)
+            if url.startswith(('http:', 'https:', '//')):
+                external[url] = None
+                continue
+            target = self.site.resolve(base, url)
+            if target is None or target in files:
+                continue
+            if not self.site.exists(target):
+                missing[(url, target)] = None
+                continue
+            files[target] = None
+            # Stylesheet URLs resolve against the stylesheet, fetch() URLs against the page
+            pending += [(target if target.endswith('.css') else rel, ref) for ref in self.refs(target)]
+        return list(files), list(external), list(missing)
+
+    def refs(self, rel):
+        """URLs a stylesheet or script loads, read once per file"""
+        if rel not in self._refs:
+            if rel.endswith('.css'):
+                text = self.site.read_text(rel)
+                self._refs[rel] = [m.group(2) or m.group(4) for m in _CSS_REF.finditer(text)
+                                   if m.group(2) or m.group(4)]
+            elif rel.endswith('.js'):
+                self._refs[rel] = [m.group(2) for m in _FETCH.finditer(self.site.read_text(rel))]
+            else:
+                self._refs[rel] = []
+        return self._refs[rel]
+
+
+def _image(el):
+    """The image URL a current browser loads for an <img>"""
+    if el.parent is not None and el.parent.tag == 'picture':
+        for source in el.parent.children:
+            if source.tag == 'source' and source.attrs.get('srcset'):
+                return source.attrs['srcset'].split(',')[0].split()[0]
+    if el.attrs.get('src'):
+        return el.attrs['src']
+    srcset = (el.attrs.get('srcset') or '').strip()
+    return srcset.split(',')[0].split()[0] if srcset else None
+
+
+class SizeCache:
+    """Compressed sizes from previous runs, by content hash, in .sitebuild/budget.json
+
+    Entries are a few bytes each and are kept, so checking dist/ and the
+    source tree in turn does not compress the same files again.
+    """
+
+    def __init__(self, root):
+        self.path = Path(root) / CACHE_PATH
+        self.data = {}
+        self.hits = 0
+        self.added = 0
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+            except ValueError:
+                data = {}
+            if data.get('version') == BUDGET_VERSION:
+                self.data = data.get('entries', {})
+
+    def get(self, digest, encodings):
+        entry = self.data.get(digest)
+        if entry is None or any(name not in entry for name in encodings):
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, digest, entry):
+        self.data[digest] = entry
+        self.added += 1
+
+    def save(self):
+        if not self.added:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        text = json.dumps({'version': BUDGET_VERSION, 'entries': self.data}, indent=1, sort_keys=True)
+        atomic_write(self.path, text.encode('utf-8'))
+
+
+def measure(site, rels, cache, jobs=None):
+    """{rel: (raw, gzip, brotli)}; brotli is None without the brotli package"""
+    encodings = compress.encodings()
+    sizes = {}
+    work = {}
+    for rel in rels:
+        data = site.read_bytes(rel) if rel not in site.pages else site.pages[rel].encode('utf-8')
+        if not rel.endswith(compress.SUFFIXES):
+            sizes[rel] = (len(data), len(data), len(data) if 'br' in encodings else None)
+            continue
+        digest = sha256(data)
+        entry = cache.get(digest, encodings)
+        if entry is None:
+            work.setdefault(digest, (data, []))[1].append(rel)
+            continue
+        sizes[rel] = (len(data), entry['gz'], entry.get('br'))
+
+    batch = [(data, encodings) for data, _ in work.values()]
+    for (digest, (data, waiting)), results in zip(work.items(), compress.compress_all(batch, jobs)):
+        entry = {name: len(result) for name, result in zip(encodings, results)}
+        cache.put(digest, entry)
+        for rel in waiting:
+            sizes[rel] = (len(data), entry['gz'], entry.get('br'))
+    return sizes
+
+
+class PageWeight:
+    """What one page downloads, in total and by kind of file"""
+
+    def __init__(self, rel, files, external, missing, sizes):
+        self.rel = rel
+        self.files = files
+        self.external = external
+        self.missing = missing
+        self.requests = len(files) + len(external)
+        self.raw = sum(sizes[f][0] for f in files)
+        self.gz = sum(sizes[f][1] for f in files)
+        self.br = None if any(sizes[f][2] is None for f in files) else sum(sizes[f][2] for f in files)
+        self.kinds = {}
+        for f in files:
+            count, raw, gz, br = self.kinds.get(kind(f), (0, 0, 0, 0))
+            br = None if br is None or sizes[f][2] is None else br + sizes[f][2]
+            self.kinds[kind(f)] = (count + 1, raw + sizes[f][0], gz + sizes[f][1], br)
+        self.problems = []
+
+
+class BudgetReport:
+    """Outcome of one budget run"""
+
+    def __init__(self, site_dir):
+        self.site_dir = site_dir
+        self.pages = []
+        self.sizes = {}
+        self.computed = 0
+        self.reused = 0
+        self.elapsed = 0.0
+
+    @property
+    def failed(self):
+        return [w for w in self.pages if w.problems]
+
+    def print_summary(self, details=()):
+        print("-" * 60)
+        print(f"{'page':44}{'requests':>9}{'raw KB':>10}{'gzip KB':>10}{'br KB':>9}")
+        for w in self.pages:
+            br = f"{w.br / 1024:.1f}" if w.br is not None else '-'
+            mark = '❌' if w.problems else '✅'
+            print(f"{mark} {w.rel:42}{w.requests:>9}{w.raw / 1024:>10.1f}{w.gz / 1024:>10.1f}{br:>9}")
+        for w in self.pages:
+            if w.rel in details:
+                self.print_page(w)
+        for w in self.pages:
+            for url, target in w.missing:
+                print(f"⚠ {w.rel}: {url} ({target}) does not exist")
+        for w in self.failed:
+            for message in w.problems:
+                print(f"❌ {w.rel}: {message}")
+        print(f"Site: {self.site_dir}/")
+        print(f"Pages: {len(self.pages)} checked, {len(self.failed)} over budget")
+        print(f"Sizes: {len(self.sizes)} files, {self.computed} compressed, {self.reused} reused")
+        print(f"Time: {self.elapsed * 1000:.1f} ms")
+
+    def print_page(self, w):
+        print(f"\n{w.rel}")
+        for f in w.files:
+            raw, gz, br = self.sizes[f]
+            print(f"    {kind(f):7}{f:52}{raw / 1024:>9.1f}{gz / 1024:>9.1f}")
+        for url in w.external:
+            print(f"    {'extern':7}{url[:52]:52}{'?':>9}{'?':>9}")
+        for name, (count, raw, gz, br) in sorted(w.kinds.items()):
+            print(f"    {name:7}{count:>3} file(s){raw / 1024:>52.1f}{gz / 1024:>9.1f}")
+        print()
+
+    def to_json(self):
+        return json.dumps({
+            'site': str(self.site_dir),
+            'pages': [{'page': w.rel, 'requests': w.requests, 'raw': w.raw, 'gzip': w.gz, 'brotli': w.br,
+                       'kinds': {name: dict(zip(('requests', 'raw', 'gzip', 'brotli'), values))
+                                 for name, values in sorted(w.kinds.items())},
+                       'external': w.external,
+                       'missing': [target for _, target in w.missing],
+                       'problems': w.problems} for w in self.pages],
+            'elapsed_ms': round(self.elapsed * 1000, 3),
+        }, indent=2)
+
+
+def check_budgets(root='.', site_dir=None, pages=None, jobs=None, fmt='text', verbose=True):
+    """Weigh every page and check it against the registered budgets"""
+    start = time.perf_counter()
+    root = Path(root)
+    if site_dir is None:
+        site_dir = root / DIST_DIR if (root / DIST_DIR / 'index.html').exists() else root
+    report = BudgetReport(Path(site_dir))
+    site = Site(site_dir).load()
+    graph = DependencyGraph(site)
+
+    graphs = {rel: graph.page(rel) for rel in site.pages}
+    needed = {f: None for files, _, _ in graphs.values() for f in files}
+    cache = SizeCache(root)
+    report.sizes = measure(site, needed, cache, jobs)
+    report.reused = cache.hits
+    report.computed = cache.added
+    cache.save()
+
+    for rel, (files, external, missing) in graphs.items():
+        weight = PageWeight(rel, files, external, missing, report.sizes)
+        for b in BUDGETS:
+            if b.applies_to(rel):
+                weight.problems += b.check(weight)
+        report.pages.append(weight)
+
+    report.elapsed = time.perf_counter() - start
+    if verbose:
+        if fmt == 'json':
+            print(report.to_json())
+        else:
+            report.print_summary(details=pages or ())
+    return report
+
+
+def _kb(size):
+    return f"{size / 1024:.1f} KB"
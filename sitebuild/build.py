@@ -0,0 +1,184 @@
+"""
+Production build into dist/
+
+The source pages are the ones the rewrite transforms maintain, so they stay
+as they are. "python -m sitebuild build" copies the pages and public files
+into an in-memory Site, runs the registered build stages over it (each
+stage may rewrite pages and add or replace files) and writes the result to
+dist/. Only files whose bytes changed are written and files the build no
+longer produces are removed, so dist/ can be served or deployed as it is.
+"""
+
+import os
+import posixpath
+import time
+from pathlib import Path
+
+from .engine import IOStats, discover_pages
+from .stages import resolve_stages
+
+DIST_DIR = 'dist'
+PUBLIC_DIRS = ('css', 'js', 'assets', 'data')
+PUBLIC_FILES = ('manifest.json', 'sw.js', 'robots.txt', 'sitemap.xml', 'favicon.ico')
+SKIPPED_SUFFIXES = ('.backup', '.tmp', '.md')
+
+
+class Site:
+    """The output tree held in memory
+
+    pages maps each page to its text. files maps every other output to its
+    bytes, or to None when a source file is copied unchanged: the file of the
+    same name, or the one copies names for it.
+    """
+
+    def __init__(self, root, io=None):
+        self.root = Path(root)
+        self.io = io or IOStats()
+        self.pages = {}
+        self.files = {}
+        self.notes = []
+        self.copies = {}
+        self._sources = {}
+
+    def load(self):
+        for path in discover_pages(self.root):
+            rel = path.relative_to(self.root).as_posix()
+            self.pages[rel] = self.io.read_bytes(path).decode('utf-8')
+        for name in PUBLIC_DIRS:
+            for path in sorted((self.root / name).rglob('*')):
+                if path.is_file() and not path.name.startswith('.') and path.suffix not in SKIPPED_SUFFIXES:
+                    self.files[path.relative_to(self.root).as_posix()] = None
+        for name in PUBLIC_FILES:
+            if (self.root / name).is_file():
+                self.files[name] = None
+        return self
+
+    def copy(self, source, rel):
+        """Output the unchanged source file under another name"""
+        self.files[rel] = None
+        self.copies[rel] = self.copies.get(source, source)
+
+    def source(self, rel):
+        """Path of the source file an unchanged output is copied from"""
+        return self.root / self.copies.get(rel, rel)
+
+    def exists(self, rel):
+        return rel in self.files or rel in self.pages
+
+    def read_bytes(self, rel):
+        """Current contents of an output file, reading the source at most once"""
+        data = self.files.get(rel)
+        if data is not None:
+            return data
+        if rel not in self._sources:
+            self._sources[rel] = self.io.read_bytes(self.source(rel))
+        return self._sources[rel]
+
+    def read_text(self, rel):
+        if rel in self.pages:
+            return self.pages[rel]
+        return self.read_bytes(rel).decode('utf-8')
+
+    def size(self, rel):
+        data = self.files.get(rel)
+        return len(data) if data is not None else self.source(rel).stat().st_size
+
+    def resolve(self, page, url):
+        """The output path a local URL on page points at, or None"""
+        if not url or url.startswith(('http:', 'https:', '//', 'data:', 'mailto:', 'tel:', '#')):
+            return None
+        path = url.split('#', 1)[0].split('?', 1)[0]
+        if not path:
+            return None
+        if path.startswith('/'):
+            rel = posixpath.normpath(path.lstrip('/'))
+        else:
+            rel = posixpath.normpath(posixpath.join(posixpath.dirname(page), path))
+        return None if rel.startswith('..') else rel
+
+    def url(self, page, rel):
+        """URL of an output path relative to page"""
+        return posixpath.relpath(rel, posixpath.dirname(page) or '.')
+
+    def note(self, rel, message):
+        self.notes.append((rel, message))
+
+
+class BuildReport:
+    """Outcome of one build"""
+
+    def __init__(self, stages, out):
+        self.stages = stages
+        self.out = out
+        self.outputs = 0
+        self.written = []
+        self.removed = []
+        self.notes = []
+        self.io = None
+        self.elapsed = 0.0
+
+    def print_summary(self):
+        print("-" * 60)
+        print(f"Stages: {', '.join(s.name for s in self.stages) or '(none)'}")
+        for rel, message in self.notes:
+            print(f"ℹ {rel}: {message}")
+        print(f"Output: {self.outputs} files in {self.out}/, {len(self.written)} written, "
+              f"{len(self.removed)} removed")
+        print(f"I/O: {self.io.summary()}")
+        print(f"Time: {self.elapsed * 1000:.1f} ms")
+
+
+def _write_output(site, out, report):
+    """Write changed outputs into out and delete the ones no longer produced"""
+    outputs = {rel: text.encode('utf-8') for rel, text in site.pages.items()}
+    outputs.update(site.files)
+    for rel, data in outputs.items():
+        target = out / rel
+        if data is None:
+            source = site.source(rel)
+            st = source.stat()
+            try:
+                current = target.stat()
+                if current.st_size == st.st_size and current.st_mtime_ns == st.st_mtime_ns:
+                    continue
+            except FileNotFoundError:
+                pass
+            target.parent.mkdir(parents=True, exist_ok=True)
+            site.io.copy_file(source, target)
+        else:
+            if target.exists() and target.read_bytes() == data:
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            site.io.write_bytes(target, data)
+        report.written.append(rel)
+
+    for path in sorted(out.rglob('*'), reverse=True):
+        rel = path.relative_to(out).as_posix()
+        if path.is_file() and rel not in outputs:
+            path.unlink()
+            report.removed.append(rel)
+        elif path.is_dir() and not any(path.iterdir()):
+            path.rmdir()
+    report.outputs = len(outputs)
+
+
+def build(root='.', names=None, out=DIST_DIR, verbose=True):
+    """Run the build stages over a copy of the site and write it to out"""
+    start = time.perf_counter()
+    root = Path(root)
+    out = root / out
+    selected = resolve_stages(names)
+    report = BuildReport(selected, os.path.relpath(out, root))
+
+    site = Site(root).load()
+    for s in selected:
+        s(site)
+    out.mkdir(parents=True, exist_ok=True)
+    _write_output(site, out, report)
+
+    report.notes = site.notes
+    report.io = site.io
+    report.elapsed = time.perf_counter() - start
+    if verbose:
+        report.print_summary()
+    return report
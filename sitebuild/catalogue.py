@@ -0,0 +1,116 @@
+"""
+Service catalogue
+
+data/services.json lists every service page with its slug, mega menu
+category, title and images. The mega menu in templates/partials/header.html,
+the list of rendered service pages and the link rewriting done by the
+navbar transforms are all derived from it, so adding a service means adding
+one entry there plus its content file.
+
+Link rewriting goes through a lookup table built once per catalogue: one
+pass over the page finds every href and swaps it for its table entry, no
+matter how many services the catalogue lists.
+"""
+
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+CATALOGUE_PATH = 'data/services.json'
+
+# Basic navigation links copied from index.html, as seen from services/
+SERVICE_NAV_LINKS = {
+    '#': '../index.html',
+    '#home': '../index.html#home',
+    '#services': '../index.html#services',
+    '#products': '../index.html#products',
+    '#about': '../index.html#about',
+    '#blog': '../index.html#blog',
+    'contact.html': '../contact.html',
+}
+ROOT_NAV_LINKS = {'#': 'index.html'}
+
+_HREF = re.compile(r'href="([^"]*)"')
+
+
+class CatalogueError(Exception):
+    """Raised when data/services.json is missing or malformed"""
+
+
+class Catalogue:
+    """The services listed in data/services.json, grouped by category
+
+    Entries with "menu": false get a page and link rewrites but are left out
+    of the mega menu.
+    """
+
+    def __init__(self, data):
+        try:
+            self.categories = [dict(c, services=[]) for c in data['categories']]
+            by_id = {c['id']: c for c in self.categories}
+            self.services = []
+            for entry in data['services']:
+                service = dict(entry, images=list(entry.get('images', ())))
+                service['image'] = service['images'][0] if service['images'] else ''
+                service['page'] = f"services/{service['slug']}.html"
+                category = by_id[service['category']]
+                if service.get('menu', True):
+                    category['services'].append(service)
+                self.services.append(service)
+        except (KeyError, TypeError) as e:
+            raise CatalogueError(f"Malformed {CATALOGUE_PATH}: {e}") from e
+
+        self.by_slug = {s['slug']: s for s in self.services}
+        if len(self.by_slug) != len(self.services):
+            raise CatalogueError(f"Duplicate service slugs in {CATALOGUE_PATH}")
+        self._tables = {}
+
+    @classmethod
+    def load(cls, root='.'):
+        path = Path(root) / CATALOGUE_PATH
+        if not path.exists():
+            raise CatalogueError(f"{CATALOGUE_PATH} not found")
+        return from_text(path.read_text(encoding='utf-8'))
+
+    @property
+    def slugs(self):
+        return [s['slug'] for s in self.services]
+
+    @property
+    def menu(self):
+        """Categories that have services, in catalogue order, for the mega menu"""
+        return [c for c in self.categories if c['services']]
+
+    def link_table(self, service_page):
+        """href rewrites for links copied from index.html into a page
+
+        On service pages the basic navigation links point back to the site
+        root and mega menu links drop their services/ prefix.
+        """
+        if service_page not in self._tables:
+            if service_page:
+                table = dict(SERVICE_NAV_LINKS)
+                table.update((s['page'], f"{s['slug']}.html") for s in self.services)
+            else:
+                table = dict(ROOT_NAV_LINKS)
+            self._tables[service_page] = table
+        return self._tables[service_page]
+
+
+@lru_cache(maxsize=4)
+def from_text(text):
+    """Parse catalogue JSON, reusing the result for identical text"""
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise CatalogueError(f"Invalid JSON in {CATALOGUE_PATH}: {e}") from e
+    return Catalogue(data)
+
+
+def rewrite_links(content, table):
+    """Replace every href found in table, in a single pass over content"""
+    def replace(m):
+        target = table.get(m.group(1))
+        return m.group(0) if target is None else f'href="{target}"'
+    return _HREF.sub(replace, content)
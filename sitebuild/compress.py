@@ -0,0 +1,94 @@
+"""
+Pre-compressed copies of the text outputs
+
+Static servers such as nginx (gzip_static, brotli_static) and Caddy
+(precompressed) send page.html.gz or page.html.br in place of page.html
+when the browser accepts them. The bytes are then compressed once, at
+build time and at the highest levels, instead of on every request.
+
+Compressed bytes are kept in .sitebuild/compressed/, named after a hash of
+the input, and copied into the output from there, so a file whose bytes
+have not changed since an earlier build is not compressed again. New files
+are compressed in a process pool.
+
+The brotli package is optional: without it only .gz files are written.
+"""
+
+import gzip
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .snapshots import atomic_write
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STORE_DIR = '.sitebuild/compressed'
+COMPRESS_VERSION = 1
+SUFFIXES = ('.html', '.css', '.js', '.svg', '.json')
+
+
+def encodings():
+    """The encodings this Python can write: gz always, br with the brotli package"""
+    return ('gz', 'br') if brotli is not None else ('gz',)
+
+
+def compress(data, encoding, fast=False):
+    """data compressed at the highest level, or at a quick one for on-the-fly use"""
+    if encoding == 'gz':
+        return gzip.compress(data, compresslevel=6 if fast else 9, mtime=0)
+    return brotli.compress(data, quality=5 if fast else 11)
+
+
+def _compress_job(job):
+    data, names = job
+    return [compress(data, name) for name in names]
+
+
+def compress_all(work, jobs=None):
+    """[compress(data, e) for e in names] for each (data, names) in work, in a pool"""
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1 or len(work) < 2:
+        return [_compress_job(job) for job in work]
+    with ProcessPoolExecutor(min(jobs, len(work))) as pool:
+        return list(pool.map(_compress_job, work))
+
+
+class CompressStore:
+    """Compressed bytes from previous builds, by input hash, in .sitebuild/compressed/"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.dir = f"{STORE_DIR}/v{COMPRESS_VERSION}"
+        self.used = set()
+
+    def rel(self, digest, encoding):
+        """Path of a stored file, relative to the site root"""
+        return f"{self.dir}/{digest}.{encoding}"
+
+    def size(self, digest, encoding):
+        """Size of the stored bytes, or None when they are missing"""
+        try:
+            size = (self.root / self.rel(digest, encoding)).stat().st_size
+        except FileNotFoundError:
+            return None
+        self.used.add(self.rel(digest, encoding))
+        return size
+
+    def put(self, digest, encoding, data):
+        path = self.root / self.rel(digest, encoding)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, data)
+        self.used.add(self.rel(digest, encoding))
+
+    def prune(self):
+        """Delete the stored files this build did not use"""
+        directory = self.root / self.dir
+        if not directory.is_dir():
+            return
+        for path in directory.iterdir():
+            if f"{self.dir}/{path.name}" not in self.used:
+                path.unlink()
@@ -0,0 +1,119 @@
+"""
+Critical CSS for the first screen of a page
+
+The first screen of every page is its header (contact bar and navbar) and
+the hero section after it. critical_css() keeps the stylesheet rules that
+can match that markup, up to a size budget, so they can be inlined while
+the full stylesheets load without blocking rendering.
+
+Results are cached in .sitebuild/critical.json, keyed by a hash of the
+first screen's structure (its tags, classes, ids and attributes, not its
+text) and of the stylesheets. Pages built from the same template share an
+entry, and a page is only recomputed when its structure or CSS changes.
+"""
+
+import json
+import re
+from pathlib import Path
+
+from . import css
+from .manifest import sha256
+from .snapshots import atomic_write
+from .tokenizer import apply_edits, scan
+
+CACHE_PATH = '.sitebuild/critical.json'
+CRITICAL_VERSION = 1
+
+# Inlined CSS beyond ~14 KB no longer fits the first round trip with the HTML
+BUDGET = 14 * 1024
+
+# Panels inside the header that stay hidden until the user opens them
+HIDDEN_CLASSES = {'mega-menu', 'dropdown-menu', 'mobile-menu'}
+
+# Selectors that only apply after the user interacts with the page
+INTERACTIVE = re.compile(r':(?:hover|focus|focus-within|focus-visible|active|visited|target)\b'
+                         r'|::?selection')
+
+
+def above_the_fold(content):
+    """Markup of the header and of the first section after it, minus hidden panels"""
+    page_map = scan(content, ('header', 'section'), predicate=_is_hidden, predicate_tags=('div', 'ul'))
+    headers = page_map.find('header')
+    start = headers[0].end if headers else 0
+    hero = next((r for r in page_map.find('section') if r.start >= start), None)
+    hidden = [r for r in page_map.regions if r.tag in ('div', 'ul')]
+
+    out = []
+    for part in headers[:1] + [hero]:
+        if part is None:
+            continue
+        inside = [(r.start - part.start, r.end - part.start)
+                  for r in hidden if part.start <= r.start < part.end]
+        out.append(apply_edits(content[part.start:part.end], inside))
+    return ''.join(out)
+
+
+def _is_hidden(tag, attrs):
+    return not HIDDEN_CLASSES.isdisjoint((attrs.get('class') or '').split())
+
+
+def critical_css(sheets, dom, budget=BUDGET):
+    """(css, truncated): the rules of sheets that can match dom, in order, within budget
+
+    Rules are taken in stylesheet order and the list stops at the first one
+    that would overflow the budget; the full stylesheets still follow.
+    """
+    out = []
+    size = 0
+    for nodes in sheets:
+        for node in css.prune(nodes, dom, exclude=INTERACTIVE):
+            text = css.serialize([node])
+            if size + len(text.encode('utf-8')) > budget:
+                return ''.join(out), True
+            out.append(text)
+            size += len(text.encode('utf-8'))
+    return ''.join(out), False
+
+
+def cache_key(dom, sheet_texts, budget=BUDGET):
+    signature = [CRITICAL_VERSION, budget, dom.signature(), [sha256(t.encode('utf-8')) for t in sheet_texts]]
+    return sha256(json.dumps(signature).encode('utf-8'))
+
+
+class CriticalCache:
+    """Critical CSS from previous builds, in .sitebuild/critical.json"""
+
+    def __init__(self, root):
+        self.path = Path(root) / CACHE_PATH
+        self.data = {}
+        self.used = set()
+        self.hits = 0
+        self.changed = False
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+            except ValueError:
+                data = {}
+            if data.get('version') == CRITICAL_VERSION:
+                self.data = data.get('entries', {})
+
+    def get(self, key):
+        entry = self.data.get(key)
+        if entry is not None:
+            self.used.add(key)
+            self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        self.data[key] = entry
+        self.used.add(key)
+        self.changed = True
+
+    def save(self):
+        """Write the entries used by this build, dropping the rest"""
+        entries = {key: self.data[key] for key in sorted(self.used)}
+        if not self.changed and entries == self.data and self.path.exists():
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        text = json.dumps({'version': CRITICAL_VERSION, 'entries': entries}, indent=1)
+        atomic_write(self.path, text.encode('utf-8'))
@@ -0,0 +1,372 @@
+"""
+CSS parsing, minification and unused-rule elimination
+
+A stylesheet is parsed once into a list of rules and at-rule blocks. For a
+page, prune() keeps the rules with at least one selector that can match the
+page: every tag, class, id and attribute the selector names must occur in
+the page's markup or in a string in its scripts (which is how classes added
+at runtime are found). Ancestry and pseudo-classes are not checked, so a kept
+rule may still not apply, but a dropped rule never could.
+
+serialize() writes the rules back minified: comments and redundant
+whitespace removed, the last semicolon of each block dropped.
+"""
+
+import re
+from functools import lru_cache
+
+from .tokenizer import parse_attrs
+
+# Classes treated as present on every page: the shared footer (checked by
+# verify_footer_consistency.py), state classes toggled by script.js and
+# the classes the AOS library adds
+SAFE_CLASSES = re.compile(r'footer(-[\w-]+)?|social-links|active|open|show|visible|hidden'
+                          r'|scrolled|loaded|is-[\w-]+|aos-[\w-]+')
+# Attributes set at runtime: the theme script writes data-theme on <html>
+SAFE_ATTRS = {'data-theme'}
+
+_COMMENT_OR_STRING = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.DOTALL)
+_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|[{};]|[^"\'{};]+')
+_STRING = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+_GROUPING_AT_RULES = ('@media', '@supports', '@layer', '@container', '@document')
+
+
+class Rule:
+    """A style rule: a selector list and its declarations"""
+
+    __slots__ = ('selectors', 'declarations')
+
+    def __init__(self, selectors, declarations):
+        self.selectors = selectors
+        self.declarations = declarations
+
+
+class AtRule:
+    """An at-rule; children is None for statements such as @import"""
+
+    __slots__ = ('prelude', 'children', 'declarations')
+
+    def __init__(self, prelude, children=None, declarations=None):
+        self.prelude = prelude
+        self.children = children
+        self.declarations = declarations
+
+    @property
+    def keyword(self):
+        return self.prelude.split(None, 1)[0].lower()
+
+
+def strip_comments(css):
+    return _COMMENT_OR_STRING.sub(lambda m: m.group(1) or '', css)
+
+
+def parse(css):
+    """Parse a stylesheet into a list of Rule and AtRule objects"""
+    tokens = _TOKEN.findall(strip_comments(css))
+    nodes, _ = _parse_block(tokens, 0)
+    return nodes
+
+
+def _parse_block(tokens, i):
+    nodes = []
+    prelude = []
+    while i < len(tokens):
+        token = tokens[i]
+        i += 1
+        if token == '}':
+            break
+        if token == ';':
+            text = ''.join(prelude).strip()
+            if text.startswith('@'):
+                nodes.append(AtRule(_collapse(text)))
+            prelude = []
+        elif token == '{':
+            text = _collapse(''.join(prelude))
+            prelude = []
+            if text.startswith('@'):
+                keyword = text.split(None, 1)[0].lower()
+                if keyword in _GROUPING_AT_RULES or keyword.endswith('keyframes'):
+                    children, i = _parse_block(tokens, i)
+                    nodes.append(AtRule(text, children))
+                else:
+                    body, i = _read_body(tokens, i)
+                    nodes.append(AtRule(text, declarations=body))
+            else:
+                body, i = _read_body(tokens, i)
+                nodes.append(Rule(split_selectors(text), body))
+        else:
+            prelude.append(token)
+    return nodes, i
+
+
+def _read_body(tokens, i):
+    """Declarations up to the matching close brace"""
+    depth = 0
+    body = []
+    while i < len(tokens):
+        token = tokens[i]
+        i += 1
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            if depth == 0:
+                break
+            depth -= 1
+        body.append(token)
+    return ''.join(body), i
+
+
+def _collapse(text):
+    return ' '.join(text.split())
+
+
+def split_selectors(text):
+    """Split a selector list on top-level commas"""
+    selectors = []
+    depth = 0
+    start = 0
+    for i, ch in enumerate(text):
+        if ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            selectors.append(text[start:i].strip())
+            start = i + 1
+    selectors.append(text[start:].strip())
+    return [s for s in selectors if s]
+
+
+def _outside_strings(text, func):
+    """Apply func to the parts of text that are not quoted strings"""
+    parts = _STRING.split(text)
+    return ''.join(part if i % 2 else func(part) for i, part in enumerate(parts))
+
+
+def minify_selector(selector):
+    return _outside_strings(_collapse(selector), lambda s: re.sub(r'\s*([>+~])\s*', r'\1', s))
+
+
+def _split_declarations(body):
+    """Split declarations on semicolons outside strings and parentheses"""
+    declarations = []
+    depth = 0
+    current = []
+    for part in _STRING.split(body):
+        if part.startswith(('"', "'")):
+            current.append(part)
+            continue
+        start = 0
+        for i, ch in enumerate(part):
+            if ch == '(':
+                depth += 1
+            elif ch == ')':
+                depth -= 1
+            elif ch == ';' and depth == 0:
+                current.append(part[start:i])
+                declarations.append(''.join(current))
+                current = []
+                start = i + 1
+        current.append(part[start:])
+    declarations.append(''.join(current))
+    return [d.strip() for d in declarations if d.strip()]
+
+
+def _minify_value(value):
+    def squeeze(s):
+        s = re.sub(r'\s*,\s*', ',', s)
+        s = re.sub(r'\s*!\s*important', '!important', s, flags=re.IGNORECASE)
+        s = re.sub(r'\(\s+', '(', s)
+        s = re.sub(r'\s+\)', ')', s)
+        return re.sub(r'(?<![\w.#-])0\.(\d)', r'.\1', s)
+    return _outside_strings(_collapse(value), squeeze)
+
+
+def minify_declarations(body):
+    out = []
+    for declaration in _split_declarations(body):
+        name, sep, value = declaration.partition(':')
+        if not sep:
+            continue
+        out.append(f"{name.strip()}:{_minify_value(value)}")
+    return ';'.join(out)
+
+
+def _minify_prelude(prelude):
+    prelude = _collapse(prelude)
+    prelude = re.sub(r'\(\s*([\w-]+)\s*:\s*', r'(\1:', prelude)
+    return re.sub(r'\s*\)', ')', prelude)
+
+
+def serialize(nodes):
+    """Minified CSS text for a list of nodes"""
+    out = []
+    for node in nodes:
+        if isinstance(node, Rule):
+            if node.selectors:
+                out.append(','.join(minify_selector(s) for s in node.selectors)
+                           + '{' + minify_declarations(node.declarations) + '}')
+        elif node.children is not None:
+            inner = serialize(node.children)
+            if inner or node.keyword.endswith('keyframes'):
+                out.append(_minify_prelude(node.prelude) + '{' + inner + '}')
+        elif node.declarations is not None:
+            out.append(_minify_prelude(node.prelude) + '{' + minify_declarations(node.declarations) + '}')
+        else:
+            out.append(_minify_prelude(node.prelude) + ';')
+    return ''.join(out)
+
+
+class DomIndex:
+    """Tags, classes, ids and attribute names a page can contain
+
+    With safe=False the SAFE_CLASSES are not assumed present, for when only
+    the markup itself counts (critical CSS).
+    """
+
+    _TAG = re.compile(r'<([a-zA-Z][\w-]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>')
+    _SCRIPT_STRING = re.compile(r'"((?:\\.|[^"\\\n])*)"|\'((?:\\.|[^\'\\\n])*)\'|`([^`]*)`')
+    _WORD = re.compile(r'[A-Za-z_-][\w-]*')
+
+    def __init__(self, html, scripts=(), safe=True):
+        self.safe = safe
+        self.tags = {'html', 'body', 'head'}
+        self.classes = set()
+        self.ids = set()
+        self.attrs = set(SAFE_ATTRS)
+        for m in self._TAG.finditer(html):
+            self.tags.add(m.group(1).lower())
+            attrs = parse_attrs(m.group(2))
+            self.attrs.update(attrs)  # parse_attrs lowercases names
+            self.classes.update((attrs.get('class') or '').split())
+            if attrs.get('id'):
+                self.ids.add(attrs['id'])
+
+        # Anything a script could add at runtime
+        words = set()
+        for script in scripts:
+            words |= script_words(script)
+        self.classes |= words
+        self.ids |= words
+        self.attrs |= words
+        self.tags |= {w.lower() for w in words}
+
+    def signature(self):
+        """Canonical form of the index; equal for pages with the same structure"""
+        return [sorted(self.tags), sorted(self.classes), sorted(self.ids), sorted(self.attrs), self.safe]
+
+
+_SCRIPT_WORDS = {}
+
+
+def script_words(script):
+    """Identifier-like words found in the string literals of a script"""
+    if script not in _SCRIPT_WORDS:
+        words = set()
+        for m in DomIndex._SCRIPT_STRING.finditer(script):
+            text = m.group(1) or m.group(2) or m.group(3) or ''
+            words.update(DomIndex._WORD.findall(text))
+        _SCRIPT_WORDS[script] = words
+    return _SCRIPT_WORDS[script]
+
+
+_FUNCTIONAL_PSEUDO = re.compile(r'::?[\w-]+\((?:[^()]|\([^()]*\))*\)')
+_PSEUDO = re.compile(r'::?[\w-]+')
+_ATTRIBUTE = re.compile(r'\[\s*([\w-]+)[^\]]*\]')
+_COMPOUND = re.compile(r'[^\s>+~]+')
+_CLASS = re.compile(r'\.((?:\\.|[\w-])+)')
+_ID = re.compile(r'#((?:\\.|[\w-])+)')
+_TYPE = re.compile(r'^([a-zA-Z][\w-]*)')
+
+
+def _unescape(name):
+    return re.sub(r'\\(.)', r'\1', name)
+
+
+@lru_cache(maxsize=None)
+def selector_requirements(selector):
+    """(tags, classes, safe classes, ids, attributes) selector needs to match
+
+    Computed once per distinct selector; matching a page is then a few
+    subset tests.
+    """
+    attrs = {a.lower() for a in _ATTRIBUTE.findall(selector)}
+    stripped = _ATTRIBUTE.sub('', _PSEUDO.sub('', _FUNCTIONAL_PSEUDO.sub('', selector)))
+    tags = set()
+    classes = set()
+    safe = set()
+    ids = set()
+    for compound in _COMPOUND.findall(stripped):
+        tag = _TYPE.match(compound)
+        if tag:
+            tags.add(tag.group(1).lower())
+        for name in map(_unescape, _CLASS.findall(compound)):
+            (safe if SAFE_CLASSES.fullmatch(name) else classes).add(name)
+        ids.update(map(_unescape, _ID.findall(compound)))
+    return frozenset(tags), frozenset(classes), frozenset(safe), frozenset(ids), frozenset(attrs)
+
+
+def selector_can_match(selector, dom):
+    """False only if the selector names something absent from the page"""
+    tags, classes, safe, ids, attrs = selector_requirements(selector)
+    return (tags <= dom.tags and classes <= dom.classes and ids <= dom.ids and attrs <= dom.attrs
+            and (dom.safe or safe <= dom.classes))
+
+
+_ANIMATION = re.compile(r'animation(?:-name)?\s*:([^;]*)', re.IGNORECASE)
+
+
+def prune(nodes, dom, exclude=None):
+    """The nodes whose rules can match the page, with unused keyframes dropped
+
+    Selectors matching the exclude pattern are dropped as well.
+    """
+    kept = _prune(nodes, dom, exclude)
+    used = set()
+    _collect_animations(kept, used)
+    return _drop_keyframes(kept, used)
+
+
+def _prune(nodes, dom, exclude):
+    kept = []
+    for node in nodes:
+        if isinstance(node, Rule):
+            selectors = [s for s in node.selectors
+                         if selector_can_match(s, dom) and not (exclude and exclude.search(s))]
+            if selectors:
+                kept.append(Rule(selectors, node.declarations))
+        elif node.children is not None and not node.keyword.endswith('keyframes'):
+            children = _prune(node.children, dom, exclude)
+            if children:
+                kept.append(AtRule(node.prelude, children))
+        else:
+            kept.append(node)
+    return kept
+
+
+def _collect_animations(nodes, used):
+    for node in nodes:
+        if isinstance(node, Rule):
+            for m in _ANIMATION.finditer(node.declarations):
+                used.update(re.findall(r'[\w-]+', m.group(1)))
+        elif node.children is not None and not node.keyword.endswith('keyframes'):
+            _collect_animations(node.children, used)
+
+
+def _drop_keyframes(nodes, used):
+    kept = []
+    for node in nodes:
+        if isinstance(node, AtRule) and node.children is not None:
+            if node.keyword.endswith('keyframes'):
+                name = node.prelude.split(None, 1)[1] if ' ' in node.prelude else ''
+                if name.strip('"\'') not in used:
+                    continue
+            else:
+                node = AtRule(node.prelude, _drop_keyframes(node.children, used))
+        kept.append(node)
+    return kept
+
+
+def minify(css):
+    """Minify a stylesheet without removing any rules"""
+    return serialize(parse(css))
@@ -0,0 +1,131 @@
+"""
+Previews of what a rewrite would change
+
+"python -m sitebuild refresh --dry-run" runs the transforms as usual but
+writes nothing. Each page that would change is shown as it is transformed,
+in one of three forms (--diff):
+
+- stat: elements added and removed, attributes changed, size change,
+- unified: a unified diff of the page text,
+- structural: the elements removed and added, each shown once at the top
+  of its subtree with the number of elements under it, and the attributes
+  whose value changed, e.g.
+
+      - nav.bg-white.shadow-lg (line 30, 84 elements)
+      + header.header (line 30, 97 elements)
+      ~ a.nav-link (line 41) href: "#services" -> "../index.html#services"
+
+Both versions of a page are parsed with dom.parse_dom and their elements
+(tag, id and classes, in document order) are aligned with
+difflib.SequenceMatcher, so a replaced navbar reads as one removal and one
+addition rather than hundreds of changed lines. Text-only changes show in
+the stat and unified forms.
+"""
+
+import difflib
+
+from .dom import parse_dom
+
+DIFF_FORMATS = ('stat', 'unified', 'structural')
+
+
+class PageDiff:
+    """The elements and attributes that differ between two versions of a page"""
+
+    def __init__(self, rel):
+        self.rel = rel
+        self.removed = []
+        self.added = []
+        self.attributes = []
+        self.nodes_removed = 0
+        self.nodes_added = 0
+        self.bytes = 0
+
+    def stat(self):
+        return (f"+{self.nodes_added} -{self.nodes_removed} elements, "
+                f"{len(self.attributes)} attribute change(s), {self.bytes:+,} bytes")
+
+
+def _key(el):
+    return el.tag, el.attrs.get('id'), el.classes
+
+
+def label(el):
+    """tag#id.class... for an element, with at most three classes"""
+    text = el.tag
+    if el.attrs.get('id'):
+        text += '#' + el.attrs['id']
+    return text + ''.join('.' + name for name in sorted(el.classes)[:3])
+
+
+def _subtrees(elements):
+    """(element, size) for the top-most of elements, size counting those under it"""
+    inside = {id(el) for el in elements}
+    tops = {}
+    for el in elements:
+        top = el
+        while top.parent is not None and id(top.parent) in inside:
+            top = top.parent
+        if id(top) in tops:
+            tops[id(top)][1] += 1
+        else:
+            tops[id(top)] = [top, 1]
+    return [tuple(entry) for entry in tops.values()]
+
+
+def page_diff(rel, before, after):
+    """PageDiff between the text of a page before and after a rewrite"""
+    result = PageDiff(rel)
+    result.bytes = len(after.encode('utf-8')) - len(before.encode('utf-8'))
+    old = parse_dom(before).elements
+    new = parse_dom(after).elements
+    matcher = difflib.SequenceMatcher(None, [_key(el) for el in old], [_key(el) for el in new],
+                                      autojunk=False)
+    removed = []
+    added = []
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == 'equal':
+            for a, b in zip(old[i1:i2], new[j1:j2]):
+                if a.attrs != b.attrs:
+                    for name in sorted(a.attrs.keys() | b.attrs.keys()):
+                        if a.attrs.get(name) != b.attrs.get(name):
+                            result.attributes.append((b, name, a.attrs.get(name), b.attrs.get(name)))
+            continue
+        removed += old[i1:i2]
+        added += new[j1:j2]
+    result.nodes_removed = len(removed)
+    result.nodes_added = len(added)
+    result.removed = _subtrees(removed)
+    result.added = _subtrees(added)
+    return result
+
+
+def _value(value):
+    return '(none)' if value is None else f'"{value}"'
+
+
+def structural(change):
+    """Lines of the structural form of a PageDiff"""
+    lines = [f"- {label(el)} (line {el.line}, {size} element{'s' if size > 1 else ''})"
+             for el, size in change.removed]
+    lines += [f"+ {label(el)} (line {el.line}, {size} element{'s' if size > 1 else ''})"
+              for el, size in change.added]
+    lines += [f"~ {label(el)} (line {el.line}) {name}: {_value(a)} -> {_value(b)}"
+              for el, name, a, b in change.attributes]
+    return lines
+
+
+def unified(rel, before, after, context=3):
+    """Lines of a unified diff between two versions of a page"""
+    return [line.rstrip('\n') for line in difflib.unified_diff(
+        before.splitlines(True), after.splitlines(True), f"a/{rel}", f"b/{rel}", n=context)]
+
+
+def render(change, before, after, fmt='stat'):
+    """The text printed for one changed page"""
+    head = f"📄 {change.rel}: {change.stat()}"
+    if fmt == 'structural':
+        return '\n'.join([head] + ['    ' + line for line in structural(change)])
+    if fmt == 'unified':
+        return '\n'.join([head] + unified(change.rel, before, after))
+    return head
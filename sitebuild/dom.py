@@ -0,0 +1,223 @@
+"""
+Lightweight DOM for pages
+
+parse_dom turns a page into elements with their tag, attributes, parent,
+children and line, indexed by tag, class and id. It is forgiving in the
+way browsers are: an end tag closes everything opened after its element,
+and elements left open end with their parent. Script and style bodies are
+skipped.
+
+Document.select answers a small selector language with those indexes:
+tag, *, .class, #id, [attr], [attr=v], [attr~=v], [attr^=v], [attr$=v],
+[attr*=v], descendant and child (>) combinators and comma-separated lists.
+The linter's rules and the structural diffs of refresh --dry-run are
+built on it.
+"""
+
+import re
+from functools import lru_cache
+
+from .tokenizer import parse_attrs
+
+
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                 'source', 'track', 'wbr'}
+
+_TOKEN = re.compile(r'''<!--.*?-->|<(/?)([a-zA-Z][\w:-]*)((?:[^>"']|"[^"]*"|'[^']*')*)>''', re.DOTALL)
+_RAW_TEXT_END = {'script': re.compile(r'</script\s*>', re.IGNORECASE),
+                 'style': re.compile(r'</style\s*>', re.IGNORECASE)}
+
+
+class SelectorError(Exception):
+    """Raised for a selector Document.select cannot compile"""
+
+
+class Element:
+    """One element of a parsed page"""
+
+    __slots__ = ('tag', 'attrs', 'classes', 'parent', 'children', 'line')
+
+    def __init__(self, tag, attrs, parent, line):
+        self.tag = tag
+        self.attrs = attrs
+        self.classes = frozenset((attrs.get('class') or '').split())
+        self.parent = parent
+        self.children = []
+        self.line = line
+
+
+class Document:
+    """A parsed page with its elements indexed by tag, class and id"""
+
+    def __init__(self):
+        self.children = []
+        self.elements = []
+        self.by_tag = {}
+        self.by_class = {}
+        self.by_id = {}
+
+    def add(self, el):
+        self.elements.append(el)
+        self.by_tag.setdefault(el.tag, []).append(el)
+        for name in el.classes:
+            self.by_class.setdefault(name, []).append(el)
+        if el.attrs.get('id'):
+            self.by_id.setdefault(el.attrs['id'], []).append(el)
+
+    def select(self, selector, scope=None):
+        """Elements matching selector, in document order; only inside scope when given"""
+        found = []
+        for steps in compile_selector(selector):
+            for el in self._candidates(steps[-1][1]):
+                if _match(el, steps, len(steps) - 1) and (scope is None or _inside(el, scope)):
+                    found.append(el)
+        if len(compile_selector(selector)) > 1:
+            order = {id(el): i for i, el in enumerate(self.elements)}
+            found = sorted({id(el): el for el in found}.values(), key=lambda el: order[id(el)])
+        return found
+
+    def _candidates(self, compound):
+        tag, ident, classes, _ = compound
+        if ident is not None:
+            return self.by_id.get(ident, ())
+        if classes:
+            return self.by_class.get(min(classes), ())
+        if tag is not None:
+            return self.by_tag.get(tag, ())
+        return self.elements
+
+
+def parse_dom(html):
+    """Document for html; unclosed elements end with their parent"""
+    doc = Document()
+    stack = []
+    line = 1
+    last = 0
+    pos = 0
+    while True:
+        m = _TOKEN.search(html, pos)
+        if m is None:
+            break
+        pos = m.end()
+        if m.group(2) is None:
+            continue
+        tag = m.group(2).lower()
+        if m.group(1):
+            for i in range(len(stack) - 1, -1, -1):
+                if stack[i].tag == tag:
+                    del stack[i:]
+                    break
+            continue
+
+        line += html.count('\n', last, m.start())
+        last = m.start()
+        parent = stack[-1] if stack else None
+        el = Element(tag, parse_attrs(m.group(3)), parent, line)
+        (parent.children if parent else doc.children).append(el)
+        doc.add(el)
+
+        raw_end = _RAW_TEXT_END.get(tag)
+        if raw_end is not None:
+            end = raw_end.search(html, pos)
+            pos = end.end() if end else len(html)
+        elif tag not in VOID_ELEMENTS and not m.group(3).rstrip().endswith('/'):
+            stack.append(el)
+    return doc
+
+
+_COMPOUND = re.compile(r'(\*|[a-zA-Z][\w-]*)?((?:[.#][\w-]+|\[[^\]]+\])*)')
+_SIMPLE = re.compile(r'[.#][\w-]+|\[[^\]]+\]')
+_ATTR_TEST = re.compile(r'''\[\s*([\w:-]+)\s*(?:([~^$*]?=)\s*(?:"([^"]*)"|'([^']*)'|([^\]\s]*)))?\s*\]''')
+
+
+@lru_cache(maxsize=256)
+def compile_selector(selector):
+    """Alternatives of a selector list, each a list of (combinator, compound) steps"""
+    alternatives = []
+    for part in selector.split(','):
+        tokens = re.split(r'\s*(>)\s*|\s+', part.strip())
+        steps = []
+        combinator = ' '
+        for token in tokens:
+            if not token:
+                continue
+            if token == '>':
+                combinator = '>'
+                continue
+            steps.append((combinator, _compound(token, selector)))
+            combinator = ' '
+        if not steps:
+            raise SelectorError(f"Empty selector in {selector!r}")
+        alternatives.append(steps)
+    return alternatives
+
+
+def _compound(text, selector):
+    m = _COMPOUND.fullmatch(text)
+    if not m or not text:
+        raise SelectorError(f"Unsupported selector {text!r} in {selector!r}")
+    tag = m.group(1).lower() if m.group(1) and m.group(1) != '*' else None
+    ident = None
+    classes = set()
+    attrs = []
+    for simple in _SIMPLE.findall(m.group(2)):
+        if simple[0] == '.':
+            classes.add(simple[1:])
+        elif simple[0] == '#':
+            ident = simple[1:]
+        else:
+            a = _ATTR_TEST.fullmatch(simple)
+            if not a:
+                raise SelectorError(f"Unsupported attribute selector {simple!r} in {selector!r}")
+            value = next((v for v in a.group(3, 4, 5) if v is not None), None)
+            attrs.append((a.group(1).lower(), a.group(2), value))
+    return tag, ident, frozenset(classes), tuple(attrs)
+
+
+def _matches(el, compound):
+    tag, ident, classes, attrs = compound
+    if tag is not None and el.tag != tag:
+        return False
+    if ident is not None and el.attrs.get('id') != ident:
+        return False
+    if not classes <= el.classes:
+        return False
+    for name, op, value in attrs:
+        actual = el.attrs.get(name)
+        if actual is None:
+            return False
+        if op is None:
+            continue
+        if not ((op == '=' and actual == value)
+                or (op == '~=' and value in actual.split())
+                or (op == '^=' and value and actual.startswith(value))
+                or (op == '$=' and value and actual.endswith(value))
+                or (op == '*=' and value and value in actual)):
+            return False
+    return True
+
+
+def _match(el, steps, i):
+    """True when el matches steps[i] and its ancestors match the steps before it"""
+    combinator, compound = steps[i]
+    if not _matches(el, compound):
+        return False
+    if i == 0:
+        return True
+    if combinator == '>':
+        return el.parent is not None and _match(el.parent, steps, i - 1)
+    ancestor = el.parent
+    while ancestor is not None:
+        if _match(ancestor, steps, i - 1):
+            return True
+        ancestor = ancestor.parent
+    return False
+
+
+def _inside(el, scope):
+    ancestor = el.parent
+    while ancestor is not None:
+        if ancestor is scope:
+            return True
+        ancestor = ancestor.parent
+    return False
@@ -0,0 +1,298 @@
+"""
+Single-pass page rewrite engine
+
+Loads every page once, runs the selected transforms over the in-memory
+content and writes each file back at most once, only if its bytes changed.
+"""
+
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from . import diff
+from .fragments import BuildContext, FragmentMissing
+from .manifest import build_key
+from .snapshots import Transaction, atomic_write
+from .transforms import resolve_transforms
+
+# Source fragments that live next to the pages but are never rewritten
+TEMPLATE_FILES = {'navbar-template.html', 'footer-template.html', 'footer-template-slim.html'}
+
+
+class IOStats:
+    """Counts the files opened and bytes moved during a build"""
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def read_bytes(self, path):
+        data = Path(path).read_bytes()
+        self.reads += 1
+        self.bytes_read += len(data)
+        return data
+
+    def write_bytes(self, path, data):
+        atomic_write(path, data)
+        self.count_write(data)
+
+    def copy_file(self, source, target):
+        """Copy source to target, keeping its timestamps"""
+        shutil.copy2(source, target)
+        self.writes += 1
+        self.bytes_written += Path(target).stat().st_size
+
+    def count_write(self, data):
+        self.writes += 1
+        self.bytes_written += len(data)
+
+    def summary(self):
+        return (f"{self.reads} reads ({self.bytes_read / 1024:.1f} KB), "
+                f"{self.writes} writes ({self.bytes_written / 1024:.1f} KB)")
+
+
+class PagePath:
+    """Location of a page relative to the site root"""
+
+    def __init__(self, root, path):
+        self.path = Path(path)
+        self.rel = self.path.relative_to(root).as_posix()
+
+    @property
+    def name(self):
+        return self.path.name
+
+    @property
+    def is_service(self):
+        return self.rel.startswith('services/')
+
+
+class Page(PagePath):
+    """An HTML page held in memory for the duration of a build"""
+
+    def __init__(self, root, path, data):
+        super().__init__(root, path)
+        self.original = data
+        self.content = data.decode('utf-8')
+
+    def encoded(self):
+        return self.content.encode('utf-8')
+
+    @property
+    def changed(self):
+        return self.encoded() != self.original
+
+
+class RefreshReport:
+    """Outcome of one engine run"""
+
+    def __init__(self, transforms):
+        self.transforms = transforms
+        self.skipped_transforms = []
+        self.pages = []
+        self.fresh = []
+        self.written = []
+        self.errors = []
+        self.warnings = []
+        self.notes = []
+        self.io = IOStats()
+        self.diffs = None
+        self.run_id = None
+        self.elapsed = 0.0
+
+    def print_summary(self):
+        print("-" * 60)
+        print(f"Transforms: {', '.join(t.name for t in self.transforms) or '(none)'}")
+        for name, reason in self.skipped_transforms:
+            print(f"⚠ Skipped {name}: {reason}")
+        print(f"Pages: {len(self.fresh)} up to date, {len(self.pages)} loaded, "
+              f"{len(self.written)} written")
+        if self.diffs is not None:
+            added = sum(d.nodes_added for d in self.diffs)
+            removed = sum(d.nodes_removed for d in self.diffs)
+            print(f"Dry run: {len(self.diffs)} page(s) would change, +{added} -{removed} elements, "
+                  f"{sum(len(d.attributes) for d in self.diffs)} attribute change(s); nothing written")
+        for rel, message in self.notes:
+            print(f"ℹ {rel}: {message}")
+        for rel, message in self.warnings:
+            print(f"⚠ {rel}: {message}")
+        for rel, name, error in self.errors:
+            print(f"❌ {name} failed on {rel}: {error}")
+        print(f"I/O: {self.io.summary()}")
+        if self.run_id:
+            print(f"Snapshot: {self.run_id} (undo with: python -m sitebuild rollback)")
+        print(f"Time: {self.elapsed * 1000:.1f} ms")
+
+
+def discover_pages(root='.'):
+    """Return every root and services/ HTML page, in a stable order"""
+    root = Path(root)
+    pages = sorted(p for p in root.glob('*.html') if p.name not in TEMPLATE_FILES)
+    pages += sorted(p for p in (root / 'services').glob('*.html') if p.name not in TEMPLATE_FILES)
+    return pages
+
+
+def load_pages(paths, ctx):
+    """Read each page exactly once"""
+    return [Page(ctx.root, path.path, ctx.read_bytes(path.rel)) for path in paths]
+
+
+def apply_transforms(page, transforms, ctx, errors):
+    """Run the transforms over one page in memory, recording failures"""
+    failed = False
+    for t in transforms:
+        if not t.applies_to(page):
+            continue
+        try:
+            page.content = t(page.content, page, ctx)
+        except Exception as e:
+            errors.append((page.rel, t.name, e))
+            failed = True
+    return not failed
+
+
+# Per-process state for pool workers, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(root, names, fragments):
+    """Give a pool worker the transforms and the fragments extracted by the parent"""
+    ctx = BuildContext(root, IOStats())
+    ctx.preload(fragments)
+    _worker['ctx'] = ctx
+    _worker['transforms'] = resolve_transforms(names)
+
+
+def _transform_in_worker(item):
+    """Transform one page in a pool worker and return its new content"""
+    rel, data = item
+    ctx = _worker['ctx']
+    ctx.warnings = []
+    ctx.notes = []
+    page = Page(ctx.root, ctx.root / rel, data)
+    errors = []
+    apply_transforms(page, _worker['transforms'], ctx, errors)
+    errors = [(rel, name, f"{type(e).__name__}: {e}") for rel, name, e in errors]
+    return page.content, errors, ctx.warnings, ctx.notes
+
+
+def transform_pages(pages, transforms, ctx, errors, jobs=1):
+    """Apply the transforms to every page, in a process pool when jobs > 1
+
+    Returns the set of page paths whose transforms all succeeded. Results are
+    always collected in page order so output and reports are deterministic.
+    """
+    if jobs <= 1 or len(pages) < 2:
+        return {page.rel for page in pages if apply_transforms(page, transforms, ctx, errors)}
+
+    names = [t.name for t in transforms]
+    fragments = {name: ctx.get(name) for t in transforms for name in t.fragments}
+    chunksize = max(1, len(pages) // (jobs * 4))
+    ok = set()
+
+    with ProcessPoolExecutor(jobs, initializer=_init_worker,
+                             initargs=(ctx.root, names, fragments)) as pool:
+        items = [(page.rel, page.original) for page in pages]
+        for page, (content, page_errors, warnings, notes) in zip(
+                pages, pool.map(_transform_in_worker, items, chunksize=chunksize)):
+            page.content = content
+            errors.extend(page_errors)
+            ctx.warnings.extend(warnings)
+            ctx.notes.extend(notes)
+            if not page_errors:
+                ok.add(page.rel)
+    return ok
+
+
+def refresh(root='.', names=None, verbose=True, manifest=None, jobs=1, dry_run=False, diff_format='stat'):
+    """Run the selected transforms over the site and write changed pages
+
+    With a Manifest, pages whose bytes and build key are unchanged since the
+    last run are skipped without being loaded. With jobs > 1 the pages are
+    transformed in a process pool; reading and writing stay in this process.
+    With dry_run nothing is written: each page that would change is diffed
+    (see diff.py) and printed in diff_format, and the manifest is left alone.
+    """
+    start = time.perf_counter()
+    root = Path(root)
+    report = RefreshReport(resolve_transforms(names))
+    ctx = BuildContext(root, report.io)
+
+    # Drop transforms whose fragments are unavailable rather than failing the run
+    fragment_hashes = {}
+    active = []
+    for t in report.transforms:
+        try:
+            for name in t.fragments:
+                if manifest:
+                    fragment_hashes[name] = manifest.fragment_hash(name, ctx)
+                else:
+                    ctx.get(name)
+            active.append(t)
+        except FragmentMissing as e:
+            report.skipped_transforms.append((t.name, e))
+    report.transforms = active
+
+    # Only pages that at least one transform could touch need loading
+    candidates = [PagePath(root, path) for path in discover_pages(root)]
+    keys = {}
+    stale = []
+    for path in candidates:
+        applicable = [t for t in active if t.applies_to(path)]
+        if not applicable:
+            continue
+        if manifest:
+            keys[path.rel] = build_key(applicable, fragment_hashes)
+            if manifest.is_fresh(path, keys[path.rel], ctx):
+                report.fresh.append(path.rel)
+                continue
+        stale.append(path)
+
+    report.pages = load_pages(stale, ctx)
+    ok = transform_pages(report.pages, active, ctx, report.errors, jobs)
+
+    if dry_run:
+        report.diffs = []
+        for page in report.pages:
+            if page.changed:
+                before = page.original.decode('utf-8')
+                report.diffs.append(diff.page_diff(page.rel, before, page.content))
+                if verbose:
+                    print(diff.render(report.diffs[-1], before, page.content, diff_format))
+        report.warnings = ctx.warnings
+        report.notes = ctx.notes
+        report.elapsed = time.perf_counter() - start
+        if verbose:
+            report.print_summary()
+        return report
+
+    # All changed pages are replaced together, after snapshotting the old ones
+    with Transaction(root, 'refresh ' + ' '.join(t.name for t in active), io=report.io) as txn:
+        for page in report.pages:
+            if page.changed:
+                txn.write(page.path, page.encoded(), previous=page.original)
+                report.written.append(page)
+    report.run_id = txn.run_id
+
+    for page in report.pages:
+        if verbose and page.changed:
+            print(f"✅ Updated: {page.rel}")
+        if manifest:
+            if page.rel in ok:
+                manifest.record(page, keys[page.rel])
+            else:
+                manifest.forget(page.rel)
+
+    report.warnings = ctx.warnings
+    report.notes = ctx.notes
+    if manifest:
+        manifest.prune(path.rel for path in candidates)
+        manifest.save()
+
+    report.elapsed = time.perf_counter() - start
+    if verbose:
+        report.print_summary()
+    return report
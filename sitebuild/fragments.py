@@ -0,0 +1,178 @@
+"""
+Shared source fragments used by the page transforms
+
+A fragment is a piece of markup pulled out of another file (the header in
+index.html, the footer templates in services/). Each fragment is extracted
+at most once per build and cached on the BuildContext.
+"""
+
+from pathlib import Path
+
+from .catalogue import CATALOGUE_PATH
+from .images import CACHE_PATH as IMAGE_CACHE_PATH
+
+FRAGMENTS = {}
+
+
+class FragmentMissing(Exception):
+    """Raised when a fragment's source file or markers cannot be found"""
+
+
+def fragment(name):
+    """Register a fragment extractor under the given name"""
+    def register(func):
+        FRAGMENTS[name] = func
+        return func
+    return register
+
+
+class BuildContext:
+    """Holds the file cache, I/O counters and cached fragments for one build"""
+
+    def __init__(self, root, io):
+        self.root = Path(root)
+        self.io = io
+        self.fragment_sources = {}
+        self.warnings = []
+        self.notes = []
+        self._bytes = {}
+        self._fragments = {}
+        self._tracking = None
+
+    def read_bytes(self, rel):
+        """Return the bytes of a file under the root, reading it at most once"""
+        if rel not in self._bytes:
+            self._bytes[rel] = self.io.read_bytes(self.root / rel)
+        return self._bytes[rel]
+
+    def source(self, rel):
+        """Return the original text of a fragment source file"""
+        if self._tracking is not None:
+            self._tracking.add(rel)
+        if rel not in self._bytes and not (self.root / rel).exists():
+            raise FragmentMissing(f"{rel} not found")
+        return self.read_bytes(rel).decode('utf-8')
+
+    def preload(self, fragments):
+        """Seed the fragment cache with fragments extracted elsewhere"""
+        self._fragments.update(fragments)
+
+    def warn(self, page, message):
+        """Record a non-fatal problem found while transforming a page"""
+        self.warnings.append((page.rel, message))
+
+    def note(self, page, message):
+        """Record an informational result for a page, shown in the run summary"""
+        self.notes.append((page.rel, message))
+
+    def get(self, name):
+        """Return the named fragment, extracting it on first use"""
+        if name not in self._fragments:
+            if name not in FRAGMENTS:
+                raise FragmentMissing(f"Unknown fragment: {name}")
+            self._tracking = set()
+            try:
+                self._fragments[name] = FRAGMENTS[name](self)
+            finally:
+                self.fragment_sources[name] = self._tracking
+                self._tracking = None
+        return self._fragments[name]
+
+
+@fragment('index-navbar')
+def index_navbar(ctx):
+    """The header block of index.html with paths rewritten for service pages"""
+    content = ctx.source('index.html')
+
+    # update_navbar.py looked for the "<!-- Header -->" comment; newer copies
+    # of index.html start the block with the header tag itself
+    header_start = content.find('    <!-- Header -->')
+    if header_start == -1:
+        header_start = content.find('    <header class="header"')
+    header_end = content.find('    </header>')
+
+    if header_start == -1 or header_end == -1:
+        raise FragmentMissing("Could not find header section in index.html")
+
+    navbar_html = content[header_start:header_end + len('    </header>')]
+
+    navbar_html = navbar_html.replace('href="#', 'href="../index.html#')
+    navbar_html = navbar_html.replace('src="assets/', 'src="../assets/')
+    navbar_html = navbar_html.replace('href="services\\', 'href="')
+    navbar_html = navbar_html.replace('href="services/', 'href="')
+
+    return navbar_html
+
+
+@fragment('footer-template')
+def footer_template(ctx):
+    """The standard service footer from services/footer-template.html"""
+    return ctx.source('services/footer-template.html')
+
+
+@fragment('footer-template-slim')
+def footer_template_slim(ctx):
+    """The slim service footer from services/footer-template-slim.html"""
+    return ctx.source('services/footer-template-slim.html')
+
+
+@fragment('service-catalogue')
+def service_catalogue(ctx):
+    """The service catalogue JSON from data/services.json"""
+    return ctx.source(CATALOGUE_PATH)
+
+
+@fragment('image-variants')
+def image_variants(ctx):
+    """The image variant cache written by python -m sitebuild images, if any"""
+    try:
+        return ctx.source(IMAGE_CACHE_PATH)
+    except FragmentMissing:
+        return '{}'
+
+
+def _slice(content, start_marker, end_marker, required=True):
+    """Text from start_marker up to and including the next end_marker"""
+    start = content.find(start_marker)
+    end = content.find(end_marker, max(start, 0))
+    if start == -1 or end == -1:
+        if required:
+            raise FragmentMissing(f"Could not find {start_marker!r} in index.html")
+        return ''
+    return content[start:end + len(end_marker)]
+
+
+@fragment('index-header')
+def index_header(ctx):
+    """The header (contact bar and navbar) of index.html, unmodified"""
+    return _slice(ctx.source('index.html'), '<header class="header" role="banner">', '</header>')
+
+
+@fragment('index-footer')
+def index_footer(ctx):
+    """The footer of index.html, unmodified"""
+    return _slice(ctx.source('index.html'), '<!-- Footer -->', '</footer>')
+
+
+@fragment('index-navbar-styles')
+def index_navbar_styles(ctx):
+    """The hero/navbar style block of index.html, if it has one"""
+    return _slice(ctx.source('index.html'), '<!-- Hero Section Styles -->', '</style>', required=False)
+
+
+@fragment('index-navbar-script')
+def index_navbar_script(ctx):
+    """The navbar script block of index.html, if it has one"""
+    return _slice(ctx.source('index.html'), '<!-- Navbar JavaScript -->', '</script>', required=False)
+
+
+@fragment('index-styles')
+def index_styles(ctx):
+    """The first inline style block of index.html"""
+    return _slice(ctx.source('index.html'), '<style>', '</style>')
+
+
+@fragment('index-script')
+def index_script(ctx):
+    """The first inline script block of index.html"""
+    return _slice(ctx.source('index.html'), '<script>', '</script>')
@@ -0,0 +1,323 @@
+"""
+Image optimisation for assets/images
+
+Every raster image under assets/images/ is resized to a few standard widths
+and re-encoded as WebP, AVIF (when Pillow can write it) and its own format,
+into assets/images/optimized/. Images are processed in a process pool. A
+cache under .sitebuild/ records each input's content hash and the outputs
+it produced, so unchanged images are skipped on later runs.
+
+Pillow is only needed here; the rest of sitebuild runs without it.
+"""
+
+import io
+import json
+import os
+import posixpath
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+from .manifest import file_stat, sha256
+from .snapshots import atomic_write
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+IMAGE_DIR = 'assets/images'
+OUTPUT_DIR = 'assets/images/optimized'
+CACHE_PATH = '.sitebuild/images.json'
+PIPELINE_VERSION = 2
+
+WIDTHS = (480, 960, 1440)
+SOURCE_FORMATS = {'.jpg': 'jpeg', '.jpeg': 'jpeg', '.png': 'png'}
+EXTENSIONS = {'jpeg': '.jpg', 'png': '.png', 'webp': '.webp', 'avif': '.avif'}
+QUALITY = {'jpeg': 82, 'webp': 80, 'avif': 60}
+
+
+class PillowMissing(Exception):
+    """Raised when the image pipeline runs without Pillow installed"""
+
+
+def require_pillow():
+    if Image is None:
+        raise PillowMissing("Pillow is required for image optimisation: pip install Pillow")
+
+
+def modern_formats():
+    """The extra formats this Pillow build can write, best first"""
+    require_pillow()
+    Image.init()
+    return [fmt for fmt in ('avif', 'webp') if fmt.upper() in Image.SAVE]
+
+
+def source_images(root='.'):
+    """Raster images under assets/images/, excluding generated variants"""
+    root = Path(root)
+    images = []
+    for path in sorted((root / IMAGE_DIR).rglob('*')):
+        rel = path.relative_to(root).as_posix()
+        if path.suffix.lower() in SOURCE_FORMATS and not rel.startswith(OUTPUT_DIR + '/'):
+            images.append(rel)
+    return images
+
+
+def variant_path(rel, width, fmt):
+    """Where the variant of an image at a width and format is written
+
+    assets/images/book-types/paper boxes.jpg at 480px as WebP becomes
+    assets/images/optimized/book-types/paper-boxes-480.webp; spaces are
+    replaced so the paths can go into srcset unescaped.
+    """
+    inner = Path(rel).relative_to(IMAGE_DIR).with_suffix('')
+    stem = re.sub(r'\s+', '-', inner.as_posix())
+    return f"{OUTPUT_DIR}/{stem}-{width}{EXTENSIONS[fmt]}"
+
+
+def target_widths(width):
+    """Standard widths smaller than the image, plus the image's own width"""
+    return [w for w in WIDTHS if w < width] + [width]
+
+
+def _encode(image, fmt):
+    buf = io.BytesIO()
+    if fmt == 'jpeg':
+        image.convert('RGB').save(buf, 'JPEG', quality=QUALITY[fmt], optimize=True,
+                                  progressive=True)
+    elif fmt == 'png':
+        image.save(buf, 'PNG', optimize=True)
+    elif fmt == 'webp':
+        image.save(buf, 'WEBP', quality=QUALITY[fmt], method=4)
+    else:
+        image.save(buf, 'AVIF', quality=QUALITY[fmt])
+    return buf.getvalue()
+
+
+def optimise_image(job):
+    """Write every variant of one image; runs in a pool worker
+
+    Returns (rel, size, outputs): size is the [width, height] of the
+    image and outputs lists [path, width, format, bytes].
+    """
+    root, rel, formats = job
+    root = Path(root)
+    source_format = SOURCE_FORMATS[Path(rel).suffix.lower()]
+    with Image.open(root / rel) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        width, height = image.size
+
+        outputs = []
+        for w in target_widths(width):
+            resized = image if w == width else image.resize(
+                (w, max(1, round(height * w / width))), Image.LANCZOS)
+            for fmt in [*formats, source_format]:
+                data = _encode(resized, fmt)
+                out = variant_path(rel, w, fmt)
+                (root / out).parent.mkdir(parents=True, exist_ok=True)
+                atomic_write(root / out, data)
+                outputs.append([out, w, fmt, len(data)])
+    return rel, [width, height], outputs
+
+
+class ImageCache:
+    """Input hashes and outputs from previous runs, in .sitebuild/images.json"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.path = self.root / CACHE_PATH
+        self.data = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+            except ValueError:
+                data = {}
+            if data.get('version') == PIPELINE_VERSION:
+                self.data = data.get('images', {})
+
+    def settings_key(self, formats):
+        return sha256(json.dumps([WIDTHS, QUALITY, formats]).encode('utf-8'))
+
+    def fresh(self, rel, key):
+        """True when rel and all its outputs are as the last run left them"""
+        entry = self.data.get(rel)
+        if not entry or entry['key'] != key:
+            return False
+        if not all((self.root / out[0]).exists() for out in entry['outputs']):
+            return False
+        if file_stat(self.root / rel) == entry['stat']:
+            return True
+        # Touched but not changed: refresh the stat and keep the outputs
+        if sha256((self.root / rel).read_bytes()) == entry['hash']:
+            entry['stat'] = file_stat(self.root / rel)
+            return True
+        return False
+
+    def record(self, rel, key, size, outputs):
+        data = (self.root / rel).read_bytes()
+        self.data[rel] = {'key': key, 'hash': sha256(data), 'stat': file_stat(self.root / rel),
+                          'bytes': len(data), 'size': size, 'outputs': outputs}
+
+    def prune(self, rels):
+        """Forget the images not in rels and delete their variants; returns the forgotten ones"""
+        rels = set(rels)
+        kept = {out[0] for rel in rels & set(self.data) for out in self.data[rel]['outputs']}
+        removed = sorted(set(self.data) - rels)
+        for rel in removed:
+            for out in self.data.pop(rel)['outputs']:
+                if out[0] not in kept:
+                    (self.root / out[0]).unlink(missing_ok=True)
+        return removed
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        text = json.dumps({'version': PIPELINE_VERSION, 'images': self.data},
+                          indent=1, sort_keys=True)
+        atomic_write(self.path, text.encode('utf-8'))
+
+
+class ImageReport:
+    """Outcome of one image pipeline run"""
+
+    def __init__(self):
+        self.processed = []
+        self.fresh = []
+        self.removed = []
+        self.errors = []
+        self.savings = {}
+        self.elapsed = 0.0
+
+    def print_summary(self):
+        print("-" * 72)
+        print(f"{'image':44}{'original KB':>13}{'best KB':>9}{'saved':>6}")
+        total_before = total_after = 0
+        for rel, (before, after, fmt) in sorted(self.savings.items()):
+            total_before += before
+            total_after += after
+            name = rel[len(IMAGE_DIR) + 1:]
+            print(f"{name[:44]:44}{before / 1024:>13.1f}{after / 1024:>9.1f}"
+                  f"{(1 - after / before) * 100 if before else 0:>5.0f}%  {fmt}")
+        for rel, error in self.errors:
+            print(f"❌ {rel}: {error}")
+        saved = total_before - total_after
+        print(f"Images: {len(self.processed)} optimised, {len(self.fresh)} unchanged"
+              + (f", {len(self.removed)} removed" if self.removed else ''))
+        if total_before:
+            print(f"Total: {total_before / 1024:.1f} KB -> {total_after / 1024:.1f} KB "
+                  f"({saved / 1024:.1f} KB saved, {saved / total_before * 100:.0f}%)")
+        print(f"Time: {self.elapsed * 1000:.1f} ms")
+
+
+def _savings(root, rel, outputs):
+    """Original size vs the smallest full-width variant"""
+    before = (Path(root) / rel).stat().st_size
+    full_width = max(out[1] for out in outputs)
+    best = min((out for out in outputs if out[1] == full_width), key=lambda out: out[3])
+    return before, min(before, best[3]), best[2]
+
+
+def optimise_images(root='.', jobs=None, force=False, verbose=True):
+    """Generate the resized and re-encoded variants of every changed image"""
+    require_pillow()
+    start = time.perf_counter()
+    root = Path(root)
+    report = ImageReport()
+    cache = ImageCache(root)
+    formats = modern_formats()
+    key = cache.settings_key(formats)
+
+    images = source_images(root)
+    stale = []
+    for rel in images:
+        if not force and cache.fresh(rel, key):
+            report.fresh.append(rel)
+        else:
+            stale.append(rel)
+
+    jobs = jobs or os.cpu_count() or 1
+    work = [(str(root), rel, formats) for rel in stale]
+    if jobs <= 1 or len(work) < 2:
+        results = map(_optimise_safely, work)
+        _collect(root, cache, key, report, results, verbose)
+    else:
+        with ProcessPoolExecutor(jobs) as pool:
+            _collect(root, cache, key, report, pool.map(_optimise_safely, work), verbose)
+
+    for rel in report.fresh:
+        report.savings[rel] = _savings(root, rel, cache.data[rel]['outputs'])
+    # Variants of images that were deleted or renamed go with their cache entries
+    report.removed = cache.prune(images)
+    cache.save()
+
+    report.elapsed = time.perf_counter() - start
+    if verbose:
+        report.print_summary()
+    return report
+
+
+def _optimise_safely(job):
+    """optimise_image, returning the error text instead of raising"""
+    try:
+        return optimise_image(job) + (None,)
+    except Exception as e:
+        return job[1], None, [], f"{type(e).__name__}: {e}"
+
+
+def _collect(root, cache, key, report, results, verbose):
+    for rel, size, outputs, error in results:
+        if error:
+            report.errors.append((rel, error))
+            continue
+        cache.record(rel, key, size, outputs)
+        report.processed.append(rel)
+        report.savings[rel] = _savings(root, rel, outputs)
+        if verbose:
+            print(f"✅ Optimised: {rel} ({len(outputs)} variants)")
+
+
+class VariantIndex:
+    """Lookup from image path to its variants, read from the image cache"""
+
+    def __init__(self, data):
+        self.images = data.get('images', {}) if data.get('version') == PIPELINE_VERSION else {}
+
+    def get(self, rel):
+        return self.images.get(rel)
+
+    def srcset(self, rel, fmt, base):
+        """srcset value for one format, with paths relative to base"""
+        outputs = sorted((o for o in self.images[rel]['outputs'] if o[2] == fmt), key=lambda o: o[1])
+        return ', '.join(f"{posixpath.relpath(o[0], base)} {o[1]}w" for o in outputs)
+
+    def formats(self, rel):
+        """Formats available for an image, preferred first, source format last"""
+        found = {o[2] for o in self.images[rel]['outputs']}
+        source = SOURCE_FORMATS[Path(rel).suffix.lower()]
+        return [fmt for fmt in ('avif', 'webp') if fmt in found] + [source]
+
+    def estimated_bytes(self, rel, display_width):
+        """Bytes a browser would likely fetch for the image shown at display_width
+
+        Assumes a 2x screen and the best format on offer: the smallest
+        variant at least twice the display width, or the largest one.
+        """
+        entry = self.images[rel]
+        best = self.formats(rel)[0]
+        outputs = sorted((o for o in entry['outputs'] if o[2] == best), key=lambda o: o[1])
+        wanted = display_width * 2
+        chosen = next((o for o in outputs if o[1] >= wanted), outputs[-1])
+        return min(chosen[3], entry['bytes'])
+
+
+@lru_cache(maxsize=4)
+def variant_index(text):
+    """Parse the image cache, reusing the result for identical text"""
+    try:
+        return VariantIndex(json.loads(text))
+    except ValueError:
+        return VariantIndex({})
@@ -0,0 +1,601 @@
+"""
+Quote and contact intake
+
+"python -m sitebuild intake" accepts the submissions the site's forms
+make and stores them in a SQLite database (.sitebuild/intake.sqlite3):
+
+- POST /api/quotes: a price calculator configuration. It is priced again
+  with data/pricing.json (pricing.PriceLine.quote) and refused with 422
+  when an option or quantity is not in the table; the stored and returned
+  total is always the server's,
+- POST /api/contact: a name, email and message (or a newsletter email),
+- POST /api/uploads?name=FILE[&line=LINE&size=SIZE]: artwork as the raw
+  request body. It is streamed to .sitebuild/uploads/ in UPLOAD_CHUNK
+  pieces (never held in memory whole), hashed on the way, and then
+  preflighted (preflight.py) within the preflight budget; the report is
+  stored with the upload and returned,
+- GET /api/health: counts of requests, rows and commits.
+
+The server is one asyncio event loop speaking just enough HTTP/1.1 for
+JSON requests, with keep-alive and CORS so a page served from elsewhere
+can post to it. Writes are group-committed: each request queues its row
+and waits, and one writer task takes everything queued (up to BATCH_MAX
+rows), inserts it with executemany() in a single transaction on a worker
+thread, and then answers all of those requests. Under load each commit
+carries many rows; when idle a request is committed on its own right away.
+The database is in WAL mode with synchronous=NORMAL, and the two INSERT
+statements are constant so sqlite3 keeps them prepared.
+
+"python -m sitebuild bench intake" load-tests the server on one core; see
+load_test().
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import secrets
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from . import preflight, pricing
+
+DB_PATH = '.sitebuild/intake.sqlite3'
+UPLOAD_DIR = '.sitebuild/uploads'
+UPLOAD_CHUNK = 1024 * 1024
+MAX_UPLOAD = 1024 * 1024 * 1024
+UPLOAD_SUFFIXES = ('.pdf', '.jpg', '.jpeg', '.png', '.tif', '.tiff')
+BATCH_MAX = 512
+# What "bench intake" checks the server against, on one core
+TARGET_RATE = 4000
+TARGET_P99 = 0.050
+MAX_BODY = 64 * 1024
+MAX_QUANTITY = 1_000_000
+TEXT_LIMITS = {'name': 200, 'email': 254, 'phone': 40, 'topic': 40, 'message': 5000, 'quote_number': 40}
+
+# Same check as FormValidator.validateEmail in js/script.js
+EMAIL = re.compile(r'^[^\s@]+@[^\s@]+\.[^\s@]+$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotes (
+    id INTEGER PRIMARY KEY,
+    ref TEXT NOT NULL UNIQUE,
+    received REAL NOT NULL,
+    line TEXT NOT NULL,
+    options TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    pages INTEGER,
+    unit REAL NOT NULL,
+    total REAL NOT NULL,
+    client_total REAL,
+    quote_number TEXT,
+    name TEXT,
+    email TEXT,
+    phone TEXT
+);
+CREATE TABLE IF NOT EXISTS contacts (
+    id INTEGER PRIMARY KEY,
+    ref TEXT NOT NULL UNIQUE,
+    received REAL NOT NULL,
+    topic TEXT NOT NULL,
+    name TEXT,
+    email TEXT NOT NULL,
+    phone TEXT,
+    message TEXT
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY,
+    ref TEXT NOT NULL UNIQUE,
+    received REAL NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    kind TEXT,
+    status TEXT NOT NULL,
+    report TEXT NOT NULL
+);
+"""
+
+INSERTS = {
+    'quotes': "INSERT INTO quotes (ref, received, line, options, quantity, pages, unit, total, client_total,"
+              " quote_number, name, email, phone) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    'contacts': "INSERT INTO contacts (ref, received, topic, name, email, phone, message)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+    'uploads': "INSERT INTO uploads (ref, received, name, size, sha256, kind, status, report)"
+               " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+}
+
+STATUS_TEXT = {200: 'OK', 201: 'Created', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 411: 'Length Required', 413: 'Payload Too Large', 422: 'Unprocessable Entity',
+               500: 'Internal Server Error'}
+
+
+class Invalid(Exception):
+    """A submission that fails validation; answered with 422"""
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _text(payload, key, required=False):
+    value = payload.get(key)
+    if value is None or value == '':
+        if required:
+            raise Invalid(f"{key} is required")
+        return None
+    if not isinstance(value, str):
+        raise Invalid(f"{key} must be a string")
+    value = value.strip()
+    if len(value) > TEXT_LIMITS[key]:
+        raise Invalid(f"{key} is longer than {TEXT_LIMITS[key]} characters")
+    if required and not value:
+        raise Invalid(f"{key} is required")
+    return value or None
+
+
+def _email(payload, required=False):
+    email = _text(payload, 'email', required)
+    if email is not None and not EMAIL.match(email):
+        raise Invalid("email is not a valid email address")
+    return email
+
+
+def _number(payload, key, integer=False):
+    value = payload.get(key)
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise Invalid(f"{key} must be a number")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise Invalid(f"{key} must be a number") from None
+    if not math.isfinite(number):
+        raise Invalid(f"{key} must be a number")
+    if integer and number != int(number):
+        raise Invalid(f"{key} must be a whole number")
+    return int(number) if integer else number
+
+
+def validate_quote(table, payload):
+    """The quotes row for a quote request, priced with the rate table"""
+    name = payload.get('line') or 'print'
+    if not isinstance(name, str):
+        raise Invalid("line must be a string")
+    try:
+        line = table.line(name)
+    except pricing.PricingError as e:
+        raise Invalid(str(e)) from None
+    options = payload.get('options') or {}
+    if not isinstance(options, dict) or not all(isinstance(v, str) for v in options.values()):
+        raise Invalid("options must map option names to values")
+    unknown = set(options) - {axis.name for axis in line.axes}
+    if unknown:
+        raise Invalid(f"Line {line.name} has no option(s) {', '.join(sorted(unknown))}")
+    quantity = _number(payload, 'quantity', integer=True)
+    if quantity is None:
+        quantity = line.default_quantity
+    if not 0 < quantity <= MAX_QUANTITY:
+        raise Invalid(f"quantity must be between 1 and {MAX_QUANTITY:,}")
+    pages = _number(payload, 'pages', integer=True) if line.pages else None
+    if pages is not None and pages <= 0:
+        raise Invalid("pages must be positive")
+    try:
+        price = line.quote(quantity, pages, **options)
+    except pricing.PricingError as e:
+        raise Invalid(str(e)) from None
+    # Store every option, defaults included, so a row says exactly what was priced
+    chosen = {axis.name: options.get(axis.name, axis.default) for axis in line.axes}
+    return (line.name, json.dumps(chosen, separators=(',', ':')), quantity, pages,
+            round(price['unit'], 4), round(price['total'], 2), _number(payload, 'total'),
+            _text(payload, 'quote_number'), _text(payload, 'name'), _email(payload), _text(payload, 'phone'))
+
+
+def validate_contact(payload):
+    """The contacts row for a contact or newsletter submission"""
+    topic = _text(payload, 'topic') or 'contact'
+    email = _email(payload, required=True)
+    message = _text(payload, 'message', required=topic == 'contact')
+    return topic, _text(payload, 'name'), email, _text(payload, 'phone'), message
+
+
+class GroupWriter:
+    """Queues rows from many requests and commits them together, one transaction per batch"""
+
+    def __init__(self, path, batch=BATCH_MAX):
+        self.path = Path(path)
+        self.batch = batch
+        self.queue = asyncio.Queue()
+        self.rows = 0
+        self.commits = 0
+        # sqlite3 connections belong to one thread: every database call runs on this one
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='intake-db')
+        self.conn = None
+        self.task = None
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _commit(self, items):
+        by_table = {}
+        for table, row, _ in items:
+            by_table.setdefault(table, []).append(row)
+        self.conn.execute("BEGIN")
+        try:
+            for table, rows in by_table.items():
+                self.conn.executemany(INSERTS[table], rows)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.conn = await loop.run_in_executor(self.executor, self._open)
+        self.task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.conn is not None:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.conn.close)
+        self.executor.shutdown()
+
+    async def write(self, table, row, ref=None):
+        """Queue a row (without its ref and time) and wait until it is committed; returns its ref"""
+        ref = ref or secrets.token_hex(6)
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((table, (ref, time.time()) + row, future))
+        await future
+        return ref
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            while len(items) < self.batch and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            try:
+                await loop.run_in_executor(self.executor, self._commit, items)
+            except Exception as e:
+                for _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.rows += len(items)
+            self.commits += 1
+            for _, _, future in items:
+                if not future.done():
+                    future.set_result(None)
+
+
+class IntakeServer:
+    """The HTTP side: parses requests, validates them and hands rows to the GroupWriter"""
+
+    def __init__(self, root='.', db=None, batch=BATCH_MAX, origin='*'):
+        self.root = Path(root)
+        self.table = pricing.load(root)
+        self.writer = GroupWriter(self.root / (db or DB_PATH), batch)
+        self.origin = origin
+        self.preflight = preflight.Preflight()
+        self.requests = 0
+        self.rejected = 0
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=8001):
+        await self.writer.start()
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.writer.close()
+        self.preflight.close()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers = request
+                if method == 'POST' and path.split('?', 1)[0] == '/api/uploads':
+                    status, payload = await self.upload(reader, writer, path, headers)
+                else:
+                    status, payload = await self.dispatch(method, path, await read_body(reader, headers))
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(self.response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HttpError as e:
+            writer.write(self.response(e.status, {'ok': False, 'error': str(e)}, False))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            # A bug must still answer the request rather than drop the connection
+            print(f"❌ {type(e).__name__}: {e}")
+            writer.write(self.response(500, {'ok': False, 'error': "Internal error"}, False))
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body):
+        self.requests += 1
+        path = path.split('?', 1)[0]
+        if method == 'OPTIONS':
+            return 204, None
+        if path == '/api/health' and method == 'GET':
+            return 200, {'ok': True, 'requests': self.requests, 'rejected': self.rejected,
+                         'rows': self.writer.rows, 'commits': self.writer.commits}
+        if path not in ('/api/quotes', '/api/contact', '/api/uploads'):
+            return 404, {'ok': False, 'error': f"No such endpoint: {path}"}
+        if method != 'POST':
+            return 405, {'ok': False, 'error': "Use POST"}
+        try:
+            payload = json.loads(body or b'null')
+            if not isinstance(payload, dict):
+                raise Invalid("Expected a JSON object")
+            if path == '/api/quotes':
+                row = validate_quote(self.table, payload)
+                ref = await self.writer.write('quotes', row)
+                return 201, {'ok': True, 'ref': ref, 'unit': row[4], 'total': row[5]}
+            row = validate_contact(payload)
+            ref = await self.writer.write('contacts', row)
+            return 201, {'ok': True, 'ref': ref}
+        except Invalid as e:
+            self.rejected += 1
+            return 422, {'ok': False, 'error': str(e)}
+        except ValueError as e:
+            self.rejected += 1
+            return 400, {'ok': False, 'error': f"Body is not JSON: {e}"}
+        except sqlite3.Error as e:
+            print(f"❌ {path}: {e}")
+            return 500, {'ok': False, 'error': "Could not store the submission"}
+
+    async def upload(self, reader, writer, path, headers):
+        """Stream an upload to disk, preflight it and store the report"""
+        self.requests += 1
+        query = parse_qs(path.partition('?')[2])
+        name = Path(query.get('name', ['upload'])[0]).name[:TEXT_LIMITS['name']] or 'upload'
+        if 'content-length' not in headers:
+            raise HttpError(411, "Send the file with a Content-Length")
+        length = content_length(headers)
+        if length > MAX_UPLOAD:
+            raise HttpError(413, f"Files are limited to {MAX_UPLOAD // 1024 // 1024} MB")
+        try:
+            options = preflight.options_for(self.root, query.get('line', [None])[0], query.get('size', [None])[0])
+        except pricing.PricingError as e:
+            raise HttpError(422, str(e)) from None
+        if headers.get('expect', '').lower() == '100-continue':
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+
+        loop = asyncio.get_running_loop()
+        ref = secrets.token_hex(6)
+        suffix = Path(name).suffix.lower()
+        directory = self.root / UPLOAD_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        part = directory / f"{ref}.part"
+        digest = hashlib.sha256()
+        remaining = length
+        try:
+            with open(part, 'wb') as f:
+                buffer = bytearray()
+                while remaining:
+                    chunk = await reader.read(min(UPLOAD_CHUNK, remaining))
+                    if not chunk:
+                        raise ConnectionError("Upload cut off")
+                    digest.update(chunk)
+                    buffer += chunk
+                    remaining -= len(chunk)
+                    if len(buffer) >= UPLOAD_CHUNK or not remaining:
+                        await loop.run_in_executor(None, f.write, bytes(buffer))
+                        buffer.clear()
+        except BaseException:
+            part.unlink(missing_ok=True)
+            raise
+        stored = part.with_name(ref + (suffix if suffix in UPLOAD_SUFFIXES else ''))
+        part.rename(stored)
+
+        # A file is only kept with its uploads row, so a failure here removes it
+        try:
+            report = await loop.run_in_executor(None, self.preflight.run, stored, options)
+            result = report.to_dict(name)
+            row = (name, length, digest.hexdigest(), report.kind, report.status, json.dumps(result))
+            await self.writer.write('uploads', row, ref=ref)
+        except sqlite3.Error as e:
+            stored.unlink(missing_ok=True)
+            print(f"❌ {path}: {e}")
+            return 500, {'ok': False, 'error': "Could not store the upload"}
+        except BaseException:
+            stored.unlink(missing_ok=True)
+            raise
+        return 201, {'ok': True, 'ref': ref, 'size': length, 'sha256': row[2], 'preflight': result}
+
+    def response(self, status, payload, keep_alive=True):
+        body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                f"Content-Length: {len(body)}",
+                f"Access-Control-Allow-Origin: {self.origin}",
+                "Access-Control-Allow-Methods: GET, POST, OPTIONS",
+                "Access-Control-Allow-Headers: Content-Type",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if payload is not None:
+            head.append("Content-Type: application/json")
+        return ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+
+
+async def read_request(reader):
+    """(method, path, headers) of the next request on a connection, None once it closes"""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, path, _ = line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(400, "Malformed request line") from None
+    return method.upper(), path, await read_headers(reader)
+
+
+def content_length(headers):
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HttpError(400, "Bad Content-Length")
+    return length
+
+
+async def read_body(reader, headers):
+    length = content_length(headers)
+    if length > MAX_BODY:
+        raise HttpError(413, f"Request body is larger than {MAX_BODY // 1024} KB")
+    return await reader.readexactly(length) if length else b''
+
+
+async def read_headers(reader):
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+def serve(root='.', host='127.0.0.1', port=8001, db=None, batch=BATCH_MAX, origin='*'):
+    """Run the intake server until interrupted"""
+    async def main():
+        server = IntakeServer(root, db, batch, origin)
+        bound = await server.start(host, port)
+        print(f"Intake at http://{host}:{bound}/api/ storing to {server.writer.path} (Ctrl+C to stop)")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.close()
+            print(f"\nStored {server.writer.rows:,} submission(s) in {server.writer.commits:,} commit(s)")
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def sample_requests(table, count, seed=0):
+    """count encoded POST requests: quotes for random configurations and, one in five, a contact"""
+    rng = random.Random(seed)
+    lines = list(table.lines.values())
+    requests = []
+    for i in range(count):
+        if i % 5 == 4:
+            path = '/api/contact'
+            payload = {'name': f"Load test {i}", 'email': f"load{i}@example.com",
+                       'message': "Please call me about an order."}
+        else:
+            line = rng.choice(lines)
+            path = '/api/quotes'
+            payload = {'line': line.name, 'quantity': rng.choice(line.tier_minimums or [100, 250, 500]),
+                       'options': {axis.name: rng.choice(axis.options) for axis in line.axes}}
+            if line.pages:
+                payload['pages'] = rng.choice(line.pages.get('sheet') or [line.pages['default']])
+        body = json.dumps(payload).encode('utf-8')
+        requests.append(f"POST {path} HTTP/1.1\r\nHost: intake\r\nContent-Type: application/json\r\n"
+                        f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+    return requests
+
+
+async def read_response(reader):
+    """(status, body) of the next response on a connection"""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed")
+    headers = await read_headers(reader)
+    length = int(headers.get('content-length') or 0)
+    return int(line.split()[1]), await reader.readexactly(length) if length else b''
+
+
+async def health(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"GET /api/health HTTP/1.1\r\nHost: intake\r\nConnection: close\r\n\r\n")
+    _, body = await read_response(reader)
+    writer.close()
+    return json.loads(body)
+
+
+class LoadResult:
+    def __init__(self, rate, sent, elapsed, latencies, errors, rows, commits):
+        self.rate = rate
+        self.sent = sent
+        self.elapsed = elapsed
+        self.latencies = sorted(latencies)
+        self.errors = errors
+        self.rows = rows
+        self.commits = commits
+
+    @property
+    def achieved(self):
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, p):
+        if not self.latencies:
+            return float('nan')
+        return self.latencies[min(len(self.latencies) - 1, int(len(self.latencies) * p / 100))]
+
+
+async def load_test(host, port, requests, rate, connections=64):
+    """Send requests at a fixed rate over keep-alive connections and time the responses
+
+    Request i is due at start + i / rate whether or not earlier ones have
+    been answered, and its latency runs from that moment, so a server that
+    falls behind shows the queueing in p99 rather than being sent less.
+    """
+    loop = asyncio.get_running_loop()
+    before = await health(host, port)
+    latencies = []
+    errors = 0
+    due = iter(range(len(requests)))
+    start = loop.time() + 0.05
+
+    async def worker():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for i in due:
+                at = start + i / rate
+                delay = at - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                writer.write(requests[i])
+                status, _ = await read_response(reader)
+                if status == 201:
+                    latencies.append(loop.time() - at)
+                else:
+                    errors += 1
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(worker() for _ in range(connections)))
+    elapsed = loop.time() - start
+    after = await health(host, port)
+    return LoadResult(rate, len(requests), elapsed, latencies, errors,
+                      after['rows'] - before['rows'], after['commits'] - before['commits'])
@@ -0,0 +1,374 @@
+"""
+JavaScript splitting, tree-shaking and minification
+
+The site scripts are plain (non-module) scripts written as a series of
+top-level declarations, most of them classes that look up their elements
+with $(), $$(), querySelector() or getElementById() and do nothing when
+those elements are missing. split() cuts a script into its top-level
+statements; each class becomes a module. For a page, shake() keeps:
+
+- every statement that is not a class (globals, helpers, start-up code),
+- classes with no literal DOM hooks, or with effects beyond their
+  elements (theme storage, fetches, injected styles), which are always kept,
+- classes whose hooks can match the page, including elements created by
+  the other kept code,
+- classes that kept code refers to other than by instantiating them.
+
+"new X(...)" for a dropped class becomes null, so App still starts and
+later code sees an absent manager.
+
+minify() strips comments and indentation and squeezes the space around
+punctuation. Line breaks are kept so automatic semicolon insertion still
+applies.
+"""
+
+import re
+from functools import lru_cache
+
+from . import css
+
+_KEYWORDS_BEFORE_REGEX = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete',
+                          'void', 'throw', 'yield', 'await', 'instanceof'}
+_PUNCT_BEFORE_REGEX = set('(,=:[!&|?{};+-*%<>~^')
+
+# Code a class may run whether or not its elements exist
+GLOBAL_EFFECTS = re.compile(r'document\.(documentElement|body|head|title)'
+                            r'|localStorage|sessionStorage|fetch\(|history\.|window\.location')
+
+_HOOK = re.compile(r'''(?:\$\$?|querySelector(?:All)?|getElementById|getElementsByClassName)\(\s*(['"])((?:\\.|(?!\1).)*)\1\s*\)''')
+_CLASS = re.compile(r'class\s+([A-Za-z_$][\w$]*)')
+_NEW = re.compile(r'\bnew\s+([A-Z][\w$]*)\s*\(([^()]*)\)')
+_THIS_NEW = re.compile(r'this\.([\w$]+)\s*=\s*new\s+([A-Z][\w$]*)\s*\(')
+_NAME = re.compile(r'[A-Za-z_$][\w$]*')
+_PLAIN = re.compile(r'[^"\'`]+')
+
+
+def lex(source):
+    """Split source into (kind, text) pieces: code, string, template, regex or comment"""
+    pieces = []
+    i = 0
+    n = len(source)
+    code_start = 0
+
+    def flush(end):
+        if end > code_start:
+            pieces.append(('code', source[code_start:end]))
+
+    while i < n:
+        ch = source[i]
+        if ch in '"\'':
+            flush(i)
+            j = _skip_string(source, i)
+            pieces.append(('string', source[i:j]))
+            i = code_start = j
+        elif ch == '`':
+            flush(i)
+            j = _skip_template(source, i)
+            pieces.append(('template', source[i:j]))
+            i = code_start = j
+        elif ch == '/' and source.startswith('//', i):
+            flush(i)
+            j = source.find('\n', i)
+            j = n if j < 0 else j
+            pieces.append(('comment', source[i:j]))
+            i = code_start = j
+        elif ch == '/' and source.startswith('/*', i):
+            flush(i)
+            j = source.find('*/', i + 2)
+            j = n if j < 0 else j + 2
+            pieces.append(('comment', source[i:j]))
+            i = code_start = j
+        elif ch == '/' and _regex_allowed(pieces, source[code_start:i]):
+            flush(i)
+            j = _skip_regex(source, i)
+            pieces.append(('regex', source[i:j]))
+            i = code_start = j
+        else:
+            i += 1
+    flush(n)
+    return pieces
+
+
+def _skip_string(source, i):
+    quote = source[i]
+    i += 1
+    while i < len(source):
+        if source[i] == '\\':
+            i += 2
+        elif source[i] == quote or source[i] == '\n':
+            return i + 1
+        else:
+            i += 1
+    return i
+
+
+def _skip_template(source, i):
+    i += 1
+    while i < len(source):
+        ch = source[i]
+        if ch == '\\':
+            i += 2
+        elif ch == '`':
+            return i + 1
+        elif source.startswith('${', i):
+            i = _skip_braces(source, i + 2)
+        else:
+            i += 1
+    return i
+
+
+def _skip_braces(source, i):
+    """Index after the } closing a template substitution"""
+    depth = 0
+    for kind, text in lex_from(source, i):
+        if kind == 'code':
+            for k, ch in enumerate(text):
+                if ch == '{':
+                    depth += 1
+                elif ch == '}':
+                    if depth == 0:
+                        return i + k + 1
+                    depth -= 1
+        i += len(text)
+    return i
+
+
+def lex_from(source, start):
+    """lex() from an offset, one piece at a time (used inside templates)"""
+    i = start
+    while i < len(source):
+        ch = source[i]
+        if ch in '"\'':
+            j = _skip_string(source, i)
+            kind = 'string'
+        elif ch == '`':
+            j = _skip_template(source, i)
+            kind = 'template'
+        else:
+            j = _PLAIN.match(source, i).end()
+            kind = 'code'
+        yield kind, source[i:j]
+        i = j
+
+
+def _regex_allowed(pieces, code_before):
+    """True when a / at this point starts a regex literal rather than a division"""
+    text = code_before.rstrip()
+    if not text:
+        for kind, piece in reversed(pieces):
+            if kind == 'comment':
+                continue
+            if kind != 'code':
+                return False
+            text = piece.rstrip()
+            if text:
+                break
+    if not text:
+        return True
+    if text[-1] in _PUNCT_BEFORE_REGEX:
+        return True
+    word = re.search(r'[\w$]+$', text)
+    return bool(word) and word.group(0) in _KEYWORDS_BEFORE_REGEX
+
+
+def _skip_regex(source, i):
+    i += 1
+    in_class = False
+    while i < len(source):
+        ch = source[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if ch == '\n':
+            return i
+        if ch == '[':
+            in_class = True
+        elif ch == ']':
+            in_class = False
+        elif ch == '/' and not in_class:
+            i += 1
+            while i < len(source) and (source[i].isalnum() or source[i] == '_'):
+                i += 1
+            return i
+        i += 1
+    return i
+
+
+class Unit:
+    """One top-level statement of a script, with any comments above it"""
+
+    __slots__ = ('text', 'pieces', 'name')
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.text = ''.join(text for _, text in pieces)
+        code = ''.join(text for kind, text in pieces if kind == 'code').lstrip()
+        m = _CLASS.match(code)
+        self.name = m.group(1) if m else None
+
+    @property
+    def code(self):
+        return ''.join(text for kind, text in self.pieces if kind == 'code')
+
+
+def split(source):
+    """Top-level statements of a script: each starts in column 0 at bracket depth 0"""
+    units = []
+    current = []
+    depth = 0
+    at_line_start = True
+    for kind, text in lex(source):
+        if kind != 'code':
+            if at_line_start and depth == 0 and current and _has_code(current):
+                units.append(current)
+                current = []
+            current.append((kind, text))
+            at_line_start = False
+            continue
+        start = 0
+        for i, ch in enumerate(text):
+            if at_line_start and depth == 0 and not ch.isspace() and ch not in ')]}':
+                if i > start:
+                    current.append(('code', text[start:i]))
+                    start = i
+                if current and _has_code(current):
+                    units.append(current)
+                    current = []
+            if ch in '{([':
+                depth += 1
+            elif ch in '})]':
+                depth -= 1
+            at_line_start = ch == '\n'
+        current.append(('code', text[start:]))
+    if current:
+        units.append(current)
+    return [Unit(pieces) for pieces in units]
+
+
+def _has_code(pieces):
+    return any(kind != 'comment' and text.strip() for kind, text in pieces)
+
+
+class Module:
+    """A class unit with the page elements it needs"""
+
+    def __init__(self, unit):
+        self.unit = unit
+        self.name = unit.name
+        self.hooks = [_hook_selector(m.group(0), m.group(2)) for m in _HOOK.finditer(unit.text)]
+        self.always = not self.hooks or bool(GLOBAL_EFFECTS.search(unit.text))
+        self.words = css.script_words(unit.text)
+
+
+def _hook_selector(call, argument):
+    if call.startswith('getElementById'):
+        return '#' + argument
+    if call.startswith('getElementsByClassName'):
+        return ''.join('.' + name for name in argument.split())
+    return argument
+
+
+class Bundle:
+    """A script split into units, ready to be shaken per page"""
+
+    def __init__(self, source):
+        self.units = split(source)
+        self.modules = {u.name: Module(u) for u in self.units if u.name}
+        code = ''.join(u.code for u in self.units)
+        # Instances the script goes on to use, e.g. this.dataLoader.loadData()
+        used = {name for prop, name in _THIS_NEW.findall(code)
+                if re.search(rf'\.{re.escape(prop)}\.', code)}
+        self.deps = {}
+        for unit in self.units:
+            # A plain "new X()" can become null; any other mention needs X
+            names = set(_NAME.findall(_NEW.sub('', unit.code)))
+            names |= {name for _, name in _THIS_NEW.findall(unit.code) if name in used}
+            self.deps[unit.name] = (names & self.modules.keys()) - {unit.name}
+
+    def shake(self, dom):
+        """Names of the classes a page needs"""
+        kept = {name for name, m in self.modules.items() if m.always} | self.deps[None]
+        while True:
+            words = set()
+            for name in kept:
+                words |= self.modules[name].words
+            page = _extend(dom, words)
+            found = {name for name, m in self.modules.items()
+                     if name not in kept and any(_can_match(h, page) for h in m.hooks)}
+            for name in kept:
+                found |= self.deps[name] - kept
+            if not found:
+                return kept
+            kept |= found
+
+    def render(self, kept):
+        """Source of the bundle with only the kept classes"""
+        dropped = self.modules.keys() - kept
+
+        def instantiate(m):
+            return 'null' if m.group(1) in dropped else m.group(0)
+
+        out = []
+        for unit in self.units:
+            if unit.name in dropped:
+                continue
+            if dropped:
+                out.append(''.join(_NEW.sub(instantiate, text) if kind == 'code' else text
+                                   for kind, text in unit.pieces))
+            else:
+                out.append(unit.text)
+        return ''.join(out)
+
+
+def _extend(dom, words):
+    page = css.DomIndex('', safe=dom.safe)
+    page.tags = dom.tags | {w.lower() for w in words}
+    page.classes = dom.classes | words
+    page.ids = dom.ids | words
+    page.attrs = dom.attrs | words
+    return page
+
+
+def _can_match(selector_list, dom):
+    try:
+        selectors = css.split_selectors(selector_list)
+    except ValueError:
+        return True
+    return any(css.selector_can_match(s, dom) for s in selectors) if selectors else True
+
+
+@lru_cache(maxsize=8)
+def bundle(source):
+    """Split a script, reusing the result for identical source"""
+    return Bundle(source)
+
+
+_SQUEEZE = re.compile(r'[ \t]*([{}()\[\];,:=<>!&|?])[ \t]*')
+
+
+def minify(source):
+    """Strip comments and indentation and squeeze spaces around punctuation
+
+    Only code is touched; strings, templates and regex literals are copied
+    as they are.
+    """
+    out = []
+    code = []
+
+    def flush():
+        text = re.sub(r'[ \t]+', ' ', ''.join(code))
+        text = re.sub(r' ?\n[ \n]*', '\n', text)
+        out.append(_SQUEEZE.sub(r'\1', text))
+        code.clear()
+
+    for kind, text in lex(source):
+        if kind == 'code':
+            code.append(text)
+        elif kind == 'comment':
+            # A block comment may be all that separates two tokens
+            code.append('\n' if '\n' in text else ' ')
+        else:
+            flush()
+            out.append(text)
+    flush()
+    return ''.join(out).strip() + '\n'
@@ -0,0 +1,201 @@
+"""
+Whole-site link and anchor checker
+
+"python -m sitebuild links" reads every page once (in a process pool with
+--jobs) and indexes the ids each page defines and the URLs it refers to:
+href, src, srcset and poster attributes, and CSS url()s in <style> blocks
+and style attributes. The url()s in the stylesheets and the file paths in
+data/*.json are indexed as well. One pass over that index then reports:
+
+- links to pages or files the site does not have,
+- #fragments that match no id (or <a name>) on the page they point at,
+- images, stylesheets and scripts that are missing.
+
+A file only counts as present when a build publishes it, so links to
+.backup files or templates are reported too. External URLs are not fetched.
+"""
+
+import posixpath
+import re
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote
+
+from .build import Site
+from .tokenizer import parse_attrs
+
+URL_ATTRS = ('href', 'src', 'srcset', 'poster')
+LINK_TAGS = ('a', 'area')
+# Fragments browsers handle without an element to scroll to
+BUILTIN_FRAGMENTS = {'', 'top'}
+
+_TOKEN = re.compile(r'''<!--.*?-->|<([a-zA-Z][\w:-]*)((?:[^>"']|"[^"]*"|'[^']*')*)>''', re.DOTALL)
+_RAW_TEXT_END = {'script': re.compile(r'</script\s*>', re.IGNORECASE),
+                 'style': re.compile(r'</style\s*>', re.IGNORECASE)}
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]*)\1\s*\)''')
+_DATA_PATH = re.compile(r'''"((?:\.\./|/)?[\w./-][\w ./-]*\.(?:png|jpe?g|gif|webp|avif|svg|ico|pdf|html|css|js|json))"''',
+                        re.IGNORECASE)
+
+
+class PageIndex:
+    """The ids a file defines and the URLs it refers to, with line numbers"""
+
+    __slots__ = ('rel', 'ids', 'refs')
+
+    def __init__(self, rel):
+        self.rel = rel
+        self.ids = set()
+        self.refs = []
+
+    def add(self, line, tag, attr, url):
+        self.refs.append((line, tag, attr, url))
+
+
+def _lines(text):
+    starts = [0] + [m.end() for m in re.finditer('\n', text)]
+    return lambda offset: bisect_right(starts, offset)
+
+
+def index_page(item):
+    """PageIndex for one page; runs in a pool worker when --jobs is given"""
+    rel, text = item
+    index = PageIndex(rel)
+    line_at = _lines(text)
+    pos = 0
+    while True:
+        m = _TOKEN.search(text, pos)
+        if m is None:
+            break
+        pos = m.end()
+        if m.group(1) is None:
+            continue
+        tag = m.group(1).lower()
+        attrs = parse_attrs(m.group(2))
+        line = line_at(m.start())
+
+        if attrs.get('id'):
+            index.ids.add(attrs['id'])
+        if tag == 'a' and attrs.get('name'):
+            index.ids.add(attrs['name'])
+        for attr in URL_ATTRS:
+            value = attrs.get(attr)
+            if value is None:
+                continue
+            if attr == 'srcset':
+                for part in value.split(','):
+                    if part.strip():
+                        index.add(line, tag, attr, part.split()[0])
+            else:
+                index.add(line, tag, attr, value)
+        for url in _CSS_URL.finditer(attrs.get('style') or ''):
+            index.add(line, tag, 'style', url.group(2))
+
+        raw_end = _RAW_TEXT_END.get(tag)
+        if raw_end is not None:
+            end = raw_end.search(text, pos)
+            if end is None:
+                break
+            if tag == 'style':
+                for url in _CSS_URL.finditer(text, pos, end.start()):
+                    index.add(line_at(url.start()), 'style', 'url', url.group(2))
+            pos = end.end()
+    return index
+
+
+def index_stylesheet(rel, text):
+    index = PageIndex(rel)
+    line_at = _lines(text)
+    for m in _CSS_URL.finditer(text):
+        index.add(line_at(m.start()), 'css', 'url', m.group(2))
+    return index
+
+
+def index_data(rel, text):
+    """Paths in a data file; they are relative to the site root, where the pages that fetch it live"""
+    index = PageIndex(rel)
+    line_at = _lines(text)
+    for m in _DATA_PATH.finditer(text):
+        index.add(line_at(m.start()), 'json', 'path', m.group(1))
+    return index
+
+
+class LinkReport:
+    """Outcome of one link check"""
+
+    def __init__(self):
+        self.files = 0
+        self.checked = 0
+        self.problems = []
+        self.elapsed = 0.0
+
+    def print_summary(self):
+        print("-" * 60)
+        for rel, line, tag, attr, url, message in self.problems:
+            print(f"❌ {rel}:{line} <{tag} {attr}=\"{url}\">: {message}")
+        print(f"Files: {self.files} indexed, {self.checked} local URLs checked, "
+              f"{len(self.problems)} problem(s)")
+        print(f"Time: {self.elapsed * 1000:.1f} ms")
+
+
+def _base(index):
+    return 'index.html' if index.rel.endswith('.json') else index.rel
+
+
+def check_links(root='.', jobs=1, verbose=True):
+    """Report broken links, missing anchors and missing assets across the site"""
+    start = time.perf_counter()
+    report = LinkReport()
+    site = Site(root).load()
+
+    items = list(site.pages.items())
+    if jobs > 1 and len(items) > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            indexes = list(pool.map(index_page, items, chunksize=max(1, len(items) // (jobs * 4))))
+    else:
+        indexes = [index_page(item) for item in items]
+    ids = {index.rel: index.ids for index in indexes}
+    for rel in site.files:
+        if rel.endswith('.css'):
+            indexes.append(index_stylesheet(rel, site.read_text(rel)))
+        elif rel.startswith('data/') and rel.endswith('.json'):
+            indexes.append(index_data(rel, site.read_text(rel)))
+    report.files = len(indexes)
+
+    for index in indexes:
+        seen = set()
+        for line, tag, attr, url in index.refs:
+            if url.startswith('javascript:') or url in seen:
+                continue
+            seen.add(url)
+            message = _check(site, ids, _base(index), tag, url)
+            if message is not False:
+                report.checked += 1
+            if message:
+                report.problems.append((index.rel, line, tag, attr, url, message))
+
+    report.elapsed = time.perf_counter() - start
+    if verbose:
+        report.print_summary()
+    return report
+
+
+def _check(site, ids, base, tag, url):
+    """None when url is fine, a description of the problem, or False when it is not local"""
+    url = unquote(url)
+    fragment = url.split('#', 1)[1] if '#' in url else ''
+    if url.startswith('#'):
+        # In a stylesheet, url(#id) points into an SVG rather than the page
+        target = base
+    else:
+        target = site.resolve(base, url)
+        if target is None:
+            return False
+        if not site.exists(target) and site.exists(posixpath.join(target, 'index.html')):
+            target = posixpath.join(target, 'index.html')
+        if not site.exists(target):
+            kind = 'page' if tag in LINK_TAGS else 'file'
+            return f"no such {kind} {target}"
+    if fragment not in BUILTIN_FRAGMENTS and target in ids and fragment not in ids[target]:
+        return f"no id \"{fragment}\" in {target}"
+    return None
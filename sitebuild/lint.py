@@ -0,0 +1,218 @@
+"""
+Structural page linter
+
+Each page is parsed once into a lightweight DOM (elements with their tag,
+attributes, parent and children). Rules are selector queries over that
+DOM, e.g. "exactly one header.header, containing a .contact-bar" or "at
+least four footer.footer .footer-section". Selectors are compiled once
+and looked up through per-page tag, class and id indexes, so adding a rule
+costs one query per page rather than one more scan of the page text.
+
+    python -m sitebuild lint [--jobs N] [--format text|json|junit] [RULE|GROUP ...]
+
+The DOM and the selectors it supports are in dom.py.
+"""
+
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from xml.sax.saxutils import quoteattr
+
+from .dom import compile_selector, parse_dom
+from .engine import PagePath, discover_pages
+from .transforms import service_pages
+
+RULES = {}
+
+
+class Rule:
+    """A selector query with the number of matches a page must have"""
+
+    def __init__(self, name, selector, minimum, maximum, contains, applies_to, group, description):
+        self.name = name
+        self.selector = selector
+        self.minimum = minimum
+        self.maximum = maximum
+        self.contains = contains
+        self.applies_to = applies_to
+        self.group = group
+        self.description = description
+        compile_selector(selector)
+        if contains:
+            compile_selector(contains)
+
+    def check(self, doc):
+        """(message, line) for a page that breaks the rule, or None"""
+        found = doc.select(self.selector)
+        if self.minimum is not None and len(found) < self.minimum:
+            return f"{self.expected()}, found {len(found)}", found[0].line if found else None
+        if self.maximum is not None and len(found) > self.maximum:
+            return f"{self.expected()}, found {len(found)}", found[self.maximum].line
+        if self.contains:
+            for el in found:
+                if not doc.select(self.contains, scope=el):
+                    return f"{self.selector} (line {el.line}) has no {self.contains}", el.line
+        return None
+
+    def expected(self):
+        if self.minimum == self.maximum:
+            return f"expected exactly {self.minimum} {self.selector}"
+        if self.maximum is None:
+            return f"expected at least {self.minimum} {self.selector}"
+        if self.minimum is None or self.minimum == 0:
+            return f"expected at most {self.maximum} {self.selector}"
+        return f"expected {self.minimum} to {self.maximum} {self.selector}"
+
+
+def rule(name, selector, count=None, minimum=None, maximum=None, contains=None,
+         applies_to=service_pages, group=None, description=''):
+    """Register a rule: selector must match count times, or between minimum and maximum"""
+    if count is not None:
+        minimum = maximum = count
+    RULES[name] = Rule(name, selector, minimum, maximum, contains, applies_to, group, description)
+    return RULES[name]
+
+
+def resolve_rules(names=None):
+    """Rules by name or group, in registry order"""
+    if not names:
+        return list(RULES.values())
+    groups = {r.group for r in RULES.values()}
+    unknown = [n for n in names if n not in RULES and n not in groups]
+    if unknown:
+        raise KeyError(f"Unknown lint rule(s): {', '.join(unknown)}")
+    return [r for r in RULES.values() if r.name in names or r.group in names]
+
+
+# Checks from check_navbar_status.py
+rule('navbar-header', 'header.header', count=1, contains='.contact-bar', group='navbar',
+     description="One site header with the contact bar")
+rule('navbar-legacy', 'nav.bg-white.shadow-lg, nav.fixed.top-0', maximum=0, group='navbar',
+     description="No navbar left from the old layout")
+
+# Checks from verify_footer_consistency.py
+rule('footer', 'footer.footer', count=1, contains='.footer-content', group='footer',
+     description="One footer.footer with its .footer-content")
+rule('footer-sections', 'footer.footer .footer-section', minimum=4, group='footer',
+     description="At least four footer sections")
+rule('footer-stylesheet', 'link[rel~=stylesheet][href="../css/style.css"]', minimum=1, group='footer',
+     description="The main stylesheet, which has the footer styles")
+rule('footer-logo', 'img[src="../assets/images/logo.svg"]', minimum=1, group='footer',
+     description="The site logo")
+
+
+def lint_page(item):
+    """(rel, problems, timings) for one page; runs in a pool worker when --jobs is given
+
+    problems lists (rule, message, line); timings maps each rule, and
+    "(parse)", to seconds.
+    """
+    root, rel, names = item
+    start = time.perf_counter()
+    page = PagePath(root, Path(root) / rel)
+    doc = parse_dom((Path(root) / rel).read_text(encoding='utf-8'))
+    timings = {'(parse)': time.perf_counter() - start}
+    problems = []
+    for r in resolve_rules(names):
+        if not r.applies_to(page):
+            continue
+        start = time.perf_counter()
+        result = r.check(doc)
+        timings[r.name] = time.perf_counter() - start
+        if result:
+            problems.append((r.name, *result))
+    return rel, problems, timings
+
+
+class LintReport:
+    """Outcome of one lint run"""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.pages = {}
+        self.checked = {}
+        self.timings = {}
+        self.elapsed = 0.0
+
+    @property
+    def problems(self):
+        return [(rel, *p) for rel, problems in self.pages.items() for p in problems]
+
+    def print_summary(self):
+        print("-" * 60)
+        for rel, name, message, line in self.problems:
+            where = f"{rel}:{line}" if line else rel
+            print(f"❌ {where}: {name}: {message}")
+        print(f"{'rule':28}{'pages':>8}{'failed':>8}{'ms':>10}")
+        for name, (pages, seconds) in self.timings.items():
+            failed = sum(1 for _, n, _, _ in self.problems if n == name)
+            print(f"{name:28}{pages:>8}{failed:>8}{seconds * 1000:>10.2f}")
+        clean = sum(1 for problems in self.pages.values() if not problems)
+        print(f"Pages: {len(self.pages)} linted, {clean} clean, {len(self.problems)} problem(s)")
+        print(f"Time: {self.elapsed * 1000:.1f} ms")
+
+    def to_json(self):
+        return json.dumps({
+            'pages': len(self.pages),
+            'problems': [{'page': rel, 'rule': name, 'message': message, 'line': line}
+                         for rel, name, message, line in self.problems],
+            'timings_ms': {name: round(seconds * 1000, 3) for name, (_, seconds) in self.timings.items()},
+            'elapsed_ms': round(self.elapsed * 1000, 3),
+        }, indent=2)
+
+    def to_junit(self):
+        """One testcase per page and rule, in the JUnit XML format CI servers read"""
+        cases = []
+        for rel, problems in self.pages.items():
+            failed = {name: (message, line) for name, message, line in problems}
+            for r in self.rules:
+                if r.name not in self.checked.get(rel, ()):
+                    continue
+                case = f'    <testcase classname={quoteattr(rel)} name={quoteattr(r.name)}'
+                if r.name in failed:
+                    message, line = failed[r.name]
+                    detail = f"{rel}:{line}: {message}" if line else f"{rel}: {message}"
+                    cases.append(f'{case}>\n      <failure message={quoteattr(message)}>'
+                                 f'{_escape(detail)}</failure>\n    </testcase>')
+                else:
+                    cases.append(f'{case}/>')
+        return (f'<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<testsuite name="sitebuild.lint" tests="{len(cases)}" '
+                f'failures="{len(self.problems)}" time="{self.elapsed:.3f}">\n'
+                + '\n'.join(cases) + '\n</testsuite>')
+
+
+def _escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def lint(root='.', names=None, jobs=1, fmt='text', verbose=True):
+    """Run the lint rules over every page and report the problems"""
+    start = time.perf_counter()
+    rules = resolve_rules(names)
+    report = LintReport(rules)
+    root = Path(root)
+    items = [(str(root), path.relative_to(root).as_posix(), names) for path in discover_pages(root)]
+    if jobs > 1 and len(items) > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            results = list(pool.map(lint_page, items, chunksize=max(1, len(items) // (jobs * 4))))
+    else:
+        results = [lint_page(item) for item in items]
+
+    for rel, problems, timings in results:
+        report.pages[rel] = problems
+        report.checked[rel] = [name for name in timings if name != '(parse)']
+        for name, seconds in timings.items():
+            pages, total = report.timings.get(name, (0, 0.0))
+            report.timings[name] = (pages + 1, total + seconds)
+
+    report.elapsed = time.perf_counter() - start
+    if verbose:
+        if fmt == 'json':
+            print(report.to_json())
+        elif fmt == 'junit':
+            print(report.to_junit())
+        else:
+            report.print_summary()
+    return report
@@ -0,0 +1,129 @@
+"""
+Persistent build manifest for incremental refreshes
+
+The manifest remembers, for every page, the hash of its last built bytes and
+a build key derived from the transforms that ran (name and version) and the
+hashes of the fragments they used. A page whose bytes and key both match is
+skipped without being loaded.
+
+Fragment hashes are reused while the files they were extracted from keep the
+same size and mtime, so a no-change rerun never re-extracts anything.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from .snapshots import atomic_write
+
+MANIFEST_PATH = '.sitebuild/manifest.json'
+MANIFEST_VERSION = 1
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_stat(path):
+    """The (mtime_ns, size) pair used as a cheap change check; None if missing"""
+    try:
+        st = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def build_key(transforms, fragment_hashes):
+    """Hash of the transform versions and fragment hashes a page depends on"""
+    parts = [[t.name, t.version, [[name, fragment_hashes[name]] for name in t.fragments]]
+             for t in transforms]
+    return sha256(json.dumps(parts).encode('utf-8'))
+
+
+class Manifest:
+    """Build state stored between runs under .sitebuild/"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._saved_text = None
+        self.data = self._empty()
+
+        if self.path.exists():
+            self._saved_text = self.path.read_text(encoding='utf-8')
+            try:
+                data = json.loads(self._saved_text)
+            except ValueError:
+                data = None
+            if isinstance(data, dict) and data.get('version') == MANIFEST_VERSION:
+                self.data = data
+
+    @classmethod
+    def for_root(cls, root):
+        return cls(Path(root) / MANIFEST_PATH)
+
+    @staticmethod
+    def _empty():
+        return {'version': MANIFEST_VERSION, 'sources': {}, 'fragments': {}, 'pages': {}}
+
+    def reset(self):
+        """Forget all recorded state so the next build is a full one"""
+        self.data = self._empty()
+
+    def fragment_hash(self, name, ctx):
+        """Hash of a fragment, extracting it only if one of its sources changed"""
+        entry = self.data['fragments'].get(name)
+        if entry and all(self._source_unchanged(ctx.root, rel) for rel in entry['sources']):
+            return entry['hash']
+
+        text = ctx.get(name)
+        sources = sorted(ctx.fragment_sources.get(name, ()))
+        self.data['fragments'][name] = {'hash': sha256(text.encode('utf-8')), 'sources': sources}
+        for rel in sources:
+            self.data['sources'][rel] = file_stat(ctx.root / rel)
+        return self.data['fragments'][name]['hash']
+
+    def _source_unchanged(self, root, rel):
+        sources = self.data['sources']
+        return rel in sources and sources[rel] == file_stat(Path(root) / rel)
+
+    def is_fresh(self, page_path, key, ctx):
+        """True if the page was built with this key and has not changed since"""
+        entry = self.data['pages'].get(page_path.rel)
+        if not entry or entry['key'] != key:
+            return False
+
+        stat = file_stat(page_path.path)
+        if entry['stat'] == stat:
+            return True
+
+        # Touched but maybe not edited; the bytes stay cached for loading
+        if sha256(ctx.read_bytes(page_path.rel)) == entry['hash']:
+            entry['stat'] = stat
+            return True
+        return False
+
+    def record(self, page, key):
+        """Remember the bytes a page was left with after this build"""
+        self.data['pages'][page.rel] = {
+            'stat': file_stat(page.path),
+            'hash': sha256(page.encoded()),
+            'key': key,
+        }
+
+    def forget(self, rel):
+        self.data['pages'].pop(rel, None)
+
+    def prune(self, rels):
+        """Drop entries for pages that no longer exist"""
+        for rel in set(self.data['pages']) - set(rels):
+            del self.data['pages'][rel]
+
+    def save(self):
+        """Write the manifest back, skipping the write if nothing changed"""
+        text = json.dumps(self.data, indent=1, sort_keys=True)
+        if text == self._saved_text:
+            return False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path, text.encode('utf-8'))
+        self._saved_text = text
+        return True
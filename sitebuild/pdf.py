@@ -0,0 +1,470 @@
+"""
+A PDF object reader over mmap
+
+Preflight needs the page tree, the page boxes and the fonts of a PDF, all
+of which are small objects reachable from the trailer. PdfDocument maps
+the file and reads only those: it finds "startxref" at the end of the file,
+reads the cross-reference sections it points at (following /Prev and
+/XRefStm), and then parses each object where the table says it is, when it
+is first asked for. A 500 MB file of page images costs the same few
+hundred kilobytes of reads as a small one.
+
+Classic "xref" tables are not parsed up front: their entries are 20 bytes
+each, so an object's entry is found by arithmetic on the section's offset.
+Cross-reference streams and object streams (PDF 1.5) are decoded with
+zlib, including the PNG predictors xref streams use.
+
+Names are returned as str, strings as bytes, dictionaries as dict, arrays
+as list and indirect references as Ref. Encrypted files can be opened, but
+their strings and object streams are not decrypted.
+"""
+
+import mmap
+import re
+import zlib
+from collections import namedtuple
+
+Ref = namedtuple('Ref', 'num gen')
+
+_SPACE = re.compile(rb'(?:[\x00\t\n\x0c\r ]+|%[^\r\n]*)*')
+_NUMBER = re.compile(rb'[+-]?(?:\d+\.?\d*|\.\d+)')
+_REF = re.compile(rb'(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+R(?![A-Za-z0-9])')
+_NAME = re.compile(rb'/([^\x00\t\n\x0c\r ()<>\[\]{}/%]*)')
+_KEYWORD = re.compile(rb'[A-Za-z]+')
+_CONSTANTS = {b'true': True, b'false': False, b'null': None}
+_HEX_STRING = re.compile(rb'<([0-9A-Fa-f\x00\t\n\x0c\r ]*)>')
+_NAME_ESCAPE = re.compile(r'#([0-9A-Fa-f]{2})')
+_OCTAL = re.compile(rb'[0-7]{1,3}')
+_OBJ = re.compile(rb'(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+obj(?![A-Za-z])')
+_XREF_ENTRY = re.compile(rb'(\d{10}) (\d{5}) ([nf])')
+_XREF_SECTION = re.compile(rb'(\d+)[ \t]+(\d+)[ \t]*\r?\n?')
+_STRING_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+                   b'(': b'(', b')': b')', b'\\': b'\\'}
+
+
+class PdfError(Exception):
+    """Raised for a file that is not a PDF or whose structure cannot be read"""
+
+
+def _integers(values, length=None):
+    """Whether values is an array of non-negative integers (of the given length)"""
+    return (isinstance(values, list) and (length is None or len(values) == length)
+            and all(isinstance(v, int) and not isinstance(v, bool) and v >= 0 for v in values))
+
+
+class Stream:
+    """A stream object: its dictionary and where its data starts in the file"""
+
+    def __init__(self, doc, attrs, start):
+        self.doc = doc
+        self.attrs = attrs
+        self.start = start
+
+    def raw(self):
+        length = self.doc.resolve(self.attrs.get('Length'))
+        if not isinstance(length, int) or length < 0:
+            raise PdfError("Stream without a usable /Length")
+        return self.doc.buf[self.start:self.start + length]
+
+    def data(self):
+        """The decoded data; only FlateDecode (with PNG predictors) is supported"""
+        data = self.raw()
+        filters = self.doc.resolve(self.attrs.get('Filter'))
+        params = self.doc.resolve(self.attrs.get('DecodeParms'))
+        if not isinstance(filters, list):
+            filters = [filters] if filters else []
+        if not isinstance(params, list):
+            params = [params] * len(filters)
+        for name, parms in zip(filters, params):
+            if name not in ('FlateDecode', 'Fl'):
+                raise PdfError(f"Unsupported stream filter {name}")
+            try:
+                data = zlib.decompress(data)
+            except zlib.error as e:
+                raise PdfError(f"Damaged stream: {e}") from e
+            parms = self.doc.resolve(parms)
+            if not isinstance(parms, dict):
+                parms = {}
+            predictor = [parms.get(key, default) for key, default in
+                         (('Predictor', 1), ('Columns', 1), ('Colors', 1), ('BitsPerComponent', 8))]
+            if not _integers(predictor):
+                raise PdfError("Stream with unusable /DecodeParms")
+            if predictor[0] >= 10:
+                data = _unpredict(data, *predictor[1:])
+        return data
+
+
+def _unpredict(data, columns, colors, bits):
+    """Undo PNG row predictors (each row starts with its filter type byte)"""
+    bpp = max(1, colors * bits // 8)
+    width = (columns * colors * bits + 7) // 8
+    out = bytearray()
+    prior = bytearray(width)
+    for i in range(0, len(data) - width, width + 1):
+        kind = data[i]
+        row = bytearray(data[i + 1:i + 1 + width])
+        for x in range(width):
+            left = row[x - bpp] if x >= bpp else 0
+            up = prior[x]
+            if kind == 1:
+                row[x] = (row[x] + left) & 0xFF
+            elif kind == 2:
+                row[x] = (row[x] + up) & 0xFF
+            elif kind == 3:
+                row[x] = (row[x] + (left + up) // 2) & 0xFF
+            elif kind == 4:
+                corner = prior[x - bpp] if x >= bpp else 0
+                p = left + up - corner
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - corner)
+                row[x] = (row[x] + (left if pa <= pb and pa <= pc else up if pb <= pc else corner)) & 0xFF
+        out += row
+        prior = row
+    return bytes(out)
+
+
+class Parser:
+    """Reads PDF objects from a buffer (the mapped file, or a decoded object stream)"""
+
+    def __init__(self, buf, doc=None):
+        self.buf = buf
+        self.doc = doc
+
+    def skip(self, pos):
+        return _SPACE.match(self.buf, pos).end()
+
+    def parse(self, pos):
+        """(object, end) for the object at pos"""
+        buf = self.buf
+        pos = self.skip(pos)
+        if pos >= len(buf):
+            raise PdfError("Unexpected end of data")
+        ch = buf[pos:pos + 1]
+        if ch == b'/':
+            m = _NAME.match(buf, pos)
+            name = m.group(1).decode('latin-1')
+            return (_NAME_ESCAPE.sub(lambda e: chr(int(e.group(1), 16)), name) if '#' in name else name), m.end()
+        if ch in b'0123456789':
+            m = _REF.match(buf, pos)
+            if m:
+                return Ref(int(m.group(1)), int(m.group(2))), m.end()
+        if ch in b'0123456789+-.':
+            m = _NUMBER.match(buf, pos)
+            if not m:
+                raise PdfError(f"Bad number at {pos}")
+            text = m.group(0)
+            return (float(text) if b'.' in text else int(text)), m.end()
+        if buf[pos:pos + 2] == b'<<':
+            return self.parse_dict(pos + 2)
+        if ch == b'[':
+            return self.parse_array(pos + 1)
+        if ch == b'(':
+            return self.parse_string(pos + 1)
+        if ch == b'<':
+            m = _HEX_STRING.match(buf, pos)
+            if not m:
+                raise PdfError(f"Bad hex string at {pos}")
+            digits = re.sub(rb'[^0-9A-Fa-f]', b'', m.group(1))
+            return bytes.fromhex((digits + b'0' * (len(digits) % 2)).decode('ascii')), m.end()
+        m = _KEYWORD.match(buf, pos)
+        if m and m.group(0) in _CONSTANTS:
+            return _CONSTANTS[m.group(0)], m.end()
+        raise PdfError(f"Unexpected {(m.group(0) if m else ch)!r} at {pos}")
+
+    def parse_dict(self, pos):
+        result = {}
+        while True:
+            pos = self.skip(pos)
+            if self.buf[pos:pos + 2] == b'>>':
+                return result, pos + 2
+            key, pos = self.parse(pos)
+            if not isinstance(key, str):
+                raise PdfError(f"Dictionary key is not a name at {pos}")
+            result[key], pos = self.parse(pos)
+
+    def parse_array(self, pos):
+        result = []
+        while True:
+            pos = self.skip(pos)
+            if self.buf[pos:pos + 1] == b']':
+                return result, pos + 1
+            item, pos = self.parse(pos)
+            result.append(item)
+
+    def parse_string(self, pos):
+        buf = self.buf
+        out = bytearray()
+        depth = 1
+        while pos < len(buf):
+            ch = buf[pos:pos + 1]
+            if ch == b'\\':
+                nxt = buf[pos + 1:pos + 2]
+                if nxt in _STRING_ESCAPES:
+                    out += _STRING_ESCAPES[nxt]
+                    pos += 2
+                elif nxt and nxt in b'01234567':
+                    m = _OCTAL.match(buf, pos + 1)
+                    out.append(int(m.group(0), 8) & 0xFF)
+                    pos = m.end()
+                else:
+                    # A line continuation, or an escape PDF does not define: drop the backslash
+                    pos += 1 if nxt not in (b'\r', b'\n') else 2 + (buf[pos + 1:pos + 3] == b'\r\n')
+                continue
+            if ch == b'(':
+                depth += 1
+            elif ch == b')':
+                depth -= 1
+                if depth == 0:
+                    return bytes(out), pos + 1
+            out += ch
+            pos += 1
+        raise PdfError("Unterminated string")
+
+    def parse_indirect(self, pos, expected=None):
+        """(num, gen, object) for the "n g obj ... endobj" at pos"""
+        m = _OBJ.match(self.buf, self.skip(pos))
+        if not m:
+            raise PdfError(f"No object at offset {pos}")
+        num, gen = int(m.group(1)), int(m.group(2))
+        if expected is not None and num != expected:
+            raise PdfError(f"Expected object {expected} at offset {pos}, found {num}")
+        value, end = self.parse(m.end())
+        if isinstance(value, dict):
+            after = self.skip(end)
+            if self.buf[after:after + 6] == b'stream':
+                start = after + 6
+                start += 2 if self.buf[start:start + 2] == b'\r\n' else 1
+                value = Stream(self.doc, value, start)
+        return num, gen, value
+
+
+class PdfDocument:
+    """A PDF file opened through mmap; objects are read when they are first resolved"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise PdfError("Empty file") from e
+        self.size = len(self.buf)
+        header = self.buf.find(b'%PDF-', 0, 1024)
+        if header < 0:
+            self.close()
+            raise PdfError("Not a PDF file (no %PDF- header)")
+        # Offsets are relative to the header when junk comes before it
+        self.base = header
+        self.version = self.buf[header + 5:header + 8].decode('latin-1', 'replace')
+        self.parser = Parser(self.buf, self)
+        # Newest first: (first, count, offset of the first entry) for a classic table
+        # section, or a dict num -> (type, field 2, field 3) read from an xref stream
+        self.sections = []
+        self.trailer = {}
+        self.xref_kind = None
+        self._objects = {}
+        self._object_streams = {}
+        try:
+            self._read_xref()
+        except PdfError:
+            self.close()
+            raise
+
+    def close(self):
+        if not self.buf.closed:
+            self.buf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def encrypted(self):
+        return 'Encrypt' in self.trailer
+
+    def _read_xref(self):
+        tail = max(0, self.size - 2048)
+        at = self.buf.rfind(b'startxref', tail)
+        if at < 0:
+            raise PdfError("No startxref: the file is truncated or damaged")
+        offset, _ = self.parser.parse(at + 9)
+        seen = set()
+        pending = [offset]
+        while pending:
+            offset = pending.pop(0)
+            if not isinstance(offset, int) or offset in seen:
+                continue
+            seen.add(offset)
+            pos = self.parser.skip(self.base + offset)
+            if pos >= self.size:
+                raise PdfError(f"Cross-reference offset {offset} is past the end of the file")
+            if self.buf[pos:pos + 4] == b'xref':
+                trailer = self._read_table(pos + 4)
+                self.xref_kind = self.xref_kind or 'table'
+            else:
+                trailer = self._read_stream(pos)
+                self.xref_kind = self.xref_kind or 'stream'
+            if not isinstance(trailer, dict):
+                raise PdfError(f"Trailer at offset {offset} is not a dictionary")
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            # Hybrid files list their compressed objects in an xref stream as well
+            pending += [trailer[key] for key in ('XRefStm', 'Prev') if key in trailer]
+        if 'Root' not in self.trailer:
+            raise PdfError("Trailer has no /Root")
+
+    def _read_table(self, pos):
+        buf = self.buf
+        while True:
+            pos = self.parser.skip(pos)
+            if buf[pos:pos + 7] == b'trailer':
+                trailer, _ = self.parser.parse(pos + 7)
+                if not isinstance(trailer, dict):
+                    raise PdfError(f"Trailer at {pos} is not a dictionary")
+                return trailer
+            m = _XREF_SECTION.match(buf, pos)
+            if not m:
+                raise PdfError(f"Damaged cross-reference table at {pos}")
+            first, count = int(m.group(1)), int(m.group(2))
+            start = m.end()
+            if count and not _XREF_ENTRY.match(buf, start + 20 * (count - 1)):
+                # Not 20-byte entries (a writer used one-byte line ends): read them one by one
+                entries = {}
+                for i in range(count):
+                    e = _XREF_ENTRY.match(buf, self.parser.skip(start))
+                    if not e:
+                        raise PdfError(f"Damaged cross-reference entry at {start}")
+                    entries[first + i] = (1 if e.group(3) == b'n' else 0), int(e.group(1)), int(e.group(2))
+                    start = e.end()
+                self.sections.append(entries)
+                pos = start
+                continue
+            self.sections.append((first, count, start))
+            pos = start + 20 * count
+
+    def _read_stream(self, pos):
+        _, _, stream = self.parser.parse_indirect(pos)
+        if not isinstance(stream, Stream) or stream.attrs.get('Type') != 'XRef':
+            raise PdfError(f"No cross-reference table or stream at offset {pos - self.base}")
+        attrs = stream.attrs
+        widths = attrs.get('W') or [1, 2, 1]
+        index = attrs.get('Index') or [0, attrs.get('Size', 0)]
+        if not _integers(widths, 3) or not _integers(index) or len(index) % 2:
+            raise PdfError(f"Damaged cross-reference stream at offset {pos - self.base}")
+        data = stream.data()
+        entries = {}
+        at = 0
+        for first, count in zip(index[::2], index[1::2]):
+            for num in range(first, first + count):
+                if at + sum(widths) > len(data):
+                    break
+                fields = []
+                for width in widths:
+                    fields.append(int.from_bytes(data[at:at + width], 'big') if width else 0)
+                    at += width
+                entries[num] = (fields[0] if widths[0] else 1), fields[1], fields[2]
+        self.sections.append(entries)
+        return attrs
+
+    def _entry(self, num):
+        """(type, field 2, field 3) as in an xref stream: 1 = offset and gen, 2 = object stream and index"""
+        # The newest section that has the object in use wins. Free entries are passed over:
+        # a hybrid file's table marks the objects its xref stream lists as free.
+        for section in self.sections:
+            if isinstance(section, dict):
+                entry = section.get(num)
+            elif section[0] <= num < section[0] + section[1]:
+                m = _XREF_ENTRY.match(self.buf, section[2] + 20 * (num - section[0]))
+                if not m:
+                    raise PdfError(f"Damaged cross-reference entry for object {num}")
+                entry = (1 if m.group(3) == b'n' else 0), int(m.group(1)), int(m.group(2))
+            else:
+                entry = None
+            if entry and entry[0] in (1, 2):
+                return entry
+        return None
+
+    def object(self, num):
+        """Object num, or None when the file does not have it"""
+        if num in self._objects:
+            return self._objects[num]
+        entry = self._entry(num)
+        value = None
+        if entry and entry[0] == 1:
+            value = self.parser.parse_indirect(self.base + entry[1], expected=num)[2]
+        elif entry and entry[0] == 2:
+            value = self._from_object_stream(entry[1], entry[2])
+        self._objects[num] = value
+        return value
+
+    def _from_object_stream(self, num, index):
+        if num not in self._object_streams:
+            stream = self.object(num)
+            if not isinstance(stream, Stream):
+                raise PdfError(f"Object stream {num} is missing")
+            count, first = stream.attrs.get('N', 0), stream.attrs.get('First', 0)
+            if not _integers([count, first]):
+                raise PdfError(f"Object stream {num} is damaged")
+            data = stream.data()
+            parser = Parser(data, self)
+            header = []
+            pos = 0
+            for _ in range(count * 2):
+                value, pos = parser.parse(pos)
+                header.append(value)
+            if not _integers(header):
+                raise PdfError(f"Object stream {num} is damaged")
+            self._object_streams[num] = (parser, header[1::2], first)
+        parser, offsets, first = self._object_streams[num]
+        if index >= len(offsets):
+            raise PdfError(f"Object stream {num} has no object {index}")
+        return parser.parse(first + offsets[index])[0]
+
+    def resolve(self, value):
+        """value with indirect references followed"""
+        seen = 0
+        while isinstance(value, Ref):
+            value = self.object(value.num)
+            seen += 1
+            if seen > 32:
+                raise PdfError("Reference loop")
+        return value
+
+    @property
+    def catalog(self):
+        catalog = self.resolve(self.trailer.get('Root'))
+        if not isinstance(catalog, dict):
+            raise PdfError("Document catalog is missing")
+        return catalog
+
+    def page_count(self):
+        pages = self.resolve(self.catalog.get('Pages'))
+        count = self.resolve(pages.get('Count')) if isinstance(pages, dict) else None
+        return count if isinstance(count, int) else sum(1 for _ in self.pages())
+
+    def pages(self, inherited=('MediaBox', 'CropBox', 'Resources', 'Rotate')):
+        """Each page's dictionary, with the attributes it inherits from the page tree filled in"""
+        root = self.catalog.get('Pages')
+        stack = [(root, {})]
+        seen = set()
+        while stack:
+            ref, inherit = stack.pop()
+            if isinstance(ref, Ref):
+                if ref.num in seen:
+                    raise PdfError(f"Page tree loop at object {ref.num}")
+                seen.add(ref.num)
+            node = self.resolve(ref)
+            if not isinstance(node, dict):
+                continue
+            if node.get('Type') == 'Pages' or 'Kids' in node:
+                values = dict(inherit)
+                values.update({key: node[key] for key in inherited if key in node})
+                kids = self.resolve(node.get('Kids')) or []
+                if not isinstance(kids, list):
+                    raise PdfError("Page tree /Kids is not an array")
+                stack += [(kid, values) for kid in reversed(kids)]
+            else:
+                page = dict(inherit)
+                page.update(node)
+                yield page
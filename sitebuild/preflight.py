@@ -0,0 +1,490 @@
+"""
+Print preflight for customer artwork
+
+Customers upload print-ready PDFs and images for the book services.
+Preflight reads them the way the print shop will and reports what would
+stop or spoil a job:
+
+- document: encryption, page count, pages not a multiple of the product
+  line's page step (the "step" under "pages" in data/pricing.json),
+- boxes: a TrimBox on every page, one trim size throughout, at least 3 mm
+  of bleed, and the trim size that was ordered,
+- fonts: every font used on a page (or in its form XObjects) embedded,
+- image: pixel size, colour mode and the resolution the image prints at.
+
+    python -m sitebuild preflight [--line LINE] [--size SIZE] [--budget SECONDS] FILE ...
+
+PDFs are read through pdf.PdfDocument, which maps the file and only parses
+the cross-reference table and the objects the checks reach, so a 500 MB
+file of page images is as quick to check as a small one.
+
+Each check runs as its own task in a process pool and the report is due
+BUDGET seconds after the checks start. Checks look at the deadline as they
+go through the pages; one that runs out returns what it found so far, and
+one still queued is cancelled. Either way the check is reported as
+incomplete rather than the report being late.
+"""
+
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import struct
+import time
+from collections import Counter
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from . import pricing
+from .pdf import PdfDocument, PdfError, Ref
+
+CHECKS = {}
+BUDGET = 2.0
+LEVELS = ('error', 'warning', 'info')
+ICONS = {'error': '❌', 'warning': '⚠', 'info': 'ℹ'}
+POINTS_PER_INCH = 72
+BLEED_MIN = 3 / 25.4 * POINTS_PER_INCH   # 3 mm
+TRIM_TOLERANCE = 1.0                     # points
+MIN_DPI = 300
+LOW_DPI = 150
+FONT_FILES = ('FontFile', 'FontFile2', 'FontFile3')
+
+
+class OverBudget(Exception):
+    """Raised inside a check when the report is due"""
+
+
+class Deadline:
+    def __init__(self, at):
+        self.at = at
+
+    def check(self):
+        if time.time() > self.at:
+            raise OverBudget()
+
+
+class Check:
+    def __init__(self, name, kinds, func, description):
+        self.name = name
+        self.kinds = kinds
+        self.func = func
+        self.description = description
+
+
+def check(name, kinds, description):
+    """Register a check: a generator of (level, message) for a file of one of kinds"""
+    def register(func):
+        CHECKS[name] = Check(name, kinds, func, description)
+        return func
+    return register
+
+
+def sniff(path):
+    """'pdf', 'jpeg', 'png' or 'tiff' from the first bytes of a file, or None"""
+    with open(path, 'rb') as f:
+        head = f.read(1024)
+    if b'%PDF-' in head:
+        return 'pdf'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'tiff'
+    return None
+
+
+def parse_size(size):
+    """(width, height) in points for a size like "8.5x11" (inches)"""
+    m = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*[x×]\s*(\d+(?:\.\d+)?)\s*', size or '')
+    if not m:
+        raise pricing.PricingError(f"Size {size!r} is not WIDTHxHEIGHT in inches")
+    return float(m.group(1)) * POINTS_PER_INCH, float(m.group(2)) * POINTS_PER_INCH
+
+
+def options_for(root='.', line=None, size=None):
+    """The expectations for artwork of a product line: trim size and page step"""
+    options = {'size': size, 'trim': None, 'page_step': None}
+    if line:
+        priced = pricing.load(root).line(line)
+        if size is not None and any(a.name == 'size' for a in priced.axes) \
+                and size not in priced.axis('size').options:
+            raise pricing.PricingError(f"Line {line} has no size {size!r} "
+                                       f"(have: {', '.join(priced.axis('size').options)})")
+        if priced.pages:
+            options['page_step'] = priced.pages.get('step')
+    if size is not None:
+        options['trim'] = parse_size(size)
+    return options
+
+
+def _inches(w, h):
+    return f"{round(w / POINTS_PER_INCH, 2):g} x {round(h / POINTS_PER_INCH, 2):g} in"
+
+
+def _page_list(numbers, limit=6):
+    """"1-3, 7, 9" for page numbers, eliding the rest past limit ranges"""
+    ranges = []
+    for n in sorted(numbers):
+        if ranges and n == ranges[-1][1] + 1:
+            ranges[-1][1] = n
+        else:
+            ranges.append([n, n])
+    text = ', '.join(f"{a}-{b}" if a != b else str(a) for a, b in ranges[:limit])
+    return text + (', ...' if len(ranges) > limit else '')
+
+
+def _box(doc, page, name):
+    value = doc.resolve(page.get(name))
+    if not isinstance(value, list) or len(value) != 4:
+        return None
+    try:
+        x0, y0, x1, y1 = (float(doc.resolve(v)) for v in value)
+    except (TypeError, ValueError):
+        return None
+    return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+
+@check('document', ('pdf',), "encryption, page count and page step")
+def check_document(doc, options, deadline):
+    yield 'info', f"PDF {doc.version}, {doc.size / 1024 / 1024:.1f} MB, {doc.xref_kind} cross-reference"
+    if doc.encrypted:
+        yield 'error', "The file is encrypted: save it without a password or permissions"
+        return
+    count = doc.page_count()
+    yield 'info', f"{count} page{'s' if count != 1 else ''}"
+    step = options.get('page_step')
+    if step and count % step:
+        yield 'warning', (f"{count} pages is not a multiple of {step}: "
+                          f"{step - count % step} blank page(s) will be added")
+
+
+@check('boxes', ('pdf',), "trim box, trim size and bleed on every page")
+def check_boxes(doc, options, deadline):
+    sizes = Counter()
+    pages_by_size = {}
+    no_trim = []
+    short_bleed = []
+    wrong_size = []
+    bad_box = []
+    expected = options.get('trim')
+    for number, page in enumerate(doc.pages(), 1):
+        deadline.check()
+        media = _box(doc, page, 'MediaBox')
+        if media is None:
+            bad_box.append(number)
+            continue
+        crop = _box(doc, page, 'CropBox') or media
+        trim = _box(doc, page, 'TrimBox')
+        if trim is None:
+            no_trim.append(number)
+            trim = crop
+        else:
+            bleed = _box(doc, page, 'BleedBox') or crop
+            margin = min(trim[0] - bleed[0], trim[1] - bleed[1], bleed[2] - trim[2], bleed[3] - trim[3])
+            if margin < BLEED_MIN - 0.5:
+                short_bleed.append(number)
+        w, h = trim[2] - trim[0], trim[3] - trim[1]
+        if doc.resolve(page.get('Rotate', 0)) in (90, 270, -90):
+            w, h = h, w
+        key = (round(w, 1), round(h, 1))
+        sizes[key] += 1
+        pages_by_size.setdefault(key, []).append(number)
+        if expected and (abs(w - expected[0]) > TRIM_TOLERANCE or abs(h - expected[1]) > TRIM_TOLERANCE):
+            wrong_size.append(number)
+
+    if bad_box:
+        yield 'error', f"No valid MediaBox on page(s) {_page_list(bad_box)}"
+    if no_trim:
+        yield 'warning', (f"No TrimBox on page(s) {_page_list(no_trim)}: the page is taken as the trim, "
+                          f"so there is no bleed")
+    if short_bleed:
+        yield 'warning', f"Less than 3 mm bleed on page(s) {_page_list(short_bleed)}"
+    if len(sizes) > 1:
+        listed = '; '.join(f"{_inches(*key)} on {_page_list(pages_by_size[key], 3)}" for key, _ in sizes.most_common())
+        yield 'warning', f"Pages have {len(sizes)} trim sizes: {listed}"
+    elif sizes:
+        (w, h), = sizes
+        yield 'info', f"Trim {_inches(w, h)} ({w:g} x {h:g} pt)"
+    if wrong_size:
+        yield 'error', (f"Trim does not match the ordered {options.get('size') or _inches(*expected)} "
+                        f"on page(s) {_page_list(wrong_size)}")
+
+
+def _font_embedded(doc, font):
+    if font.get('Subtype') == 'Type3':
+        return True
+    if font.get('Subtype') == 'Type0':
+        descendants = doc.resolve(font.get('DescendantFonts'))
+        font = doc.resolve(descendants[0]) if isinstance(descendants, list) and descendants else {}
+        if not isinstance(font, dict):
+            return False
+    descriptor = doc.resolve(font.get('FontDescriptor'))
+    return isinstance(descriptor, dict) and any(key in descriptor for key in FONT_FILES)
+
+
+def _page_fonts(doc, resources, seen):
+    """(key, font) for the fonts of a resource dictionary and of the form XObjects it uses"""
+    stack = [resources]
+    while stack:
+        res = doc.resolve(stack.pop())
+        if not isinstance(res, dict):
+            continue
+        fonts = doc.resolve(res.get('Font')) or {}
+        for ref in (fonts.values() if isinstance(fonts, dict) else ()):
+            key = ref.num if isinstance(ref, Ref) else id(ref)
+            font = doc.resolve(ref)
+            if isinstance(font, dict):
+                yield key, font
+        xobjects = doc.resolve(res.get('XObject')) or {}
+        for ref in (xobjects.values() if isinstance(xobjects, dict) else ()):
+            if not isinstance(ref, Ref) or ref.num in seen:
+                continue
+            seen.add(ref.num)
+            form = doc.resolve(ref)
+            attrs = getattr(form, 'attrs', None)
+            if attrs and attrs.get('Subtype') == 'Form' and 'Resources' in attrs:
+                stack.append(attrs['Resources'])
+
+
+@check('fonts', ('pdf',), "every font embedded")
+def check_fonts(doc, options, deadline):
+    fonts = {}
+    missing = {}
+    seen_forms = set()
+    for number, page in enumerate(doc.pages(), 1):
+        deadline.check()
+        for key, font in _page_fonts(doc, page.get('Resources'), seen_forms):
+            if key not in fonts:
+                fonts[key] = _font_embedded(doc, font)
+            if not fonts[key]:
+                name = font.get('BaseFont') or '(unnamed)'
+                missing.setdefault(name, []).append(number)
+    for name, pages in missing.items():
+        yield 'error', f"Font {name} is not embedded (page(s) {_page_list(set(pages))})"
+    if fonts and not missing:
+        yield 'info', f"{len(fonts)} font(s), all embedded"
+
+
+def _jpeg_header(buf):
+    """(width, height, components, dpi) from a JPEG's markers"""
+    pos = 2
+    dpi = None
+    while pos + 4 <= len(buf):
+        if buf[pos] != 0xFF:
+            raise PdfError("Damaged JPEG marker")
+        marker = buf[pos + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        length = struct.unpack('>H', buf[pos + 2:pos + 4])[0]
+        if marker == 0xE0 and buf[pos + 4:pos + 9] == b'JFIF\x00':
+            units, x, y = struct.unpack('>BHH', buf[pos + 11:pos + 16])
+            if units in (1, 2) and x and y:
+                dpi = (x, y) if units == 1 else (x * 2.54, y * 2.54)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            h, w, components = struct.unpack('>HHB', buf[pos + 5:pos + 10])
+            return w, h, components, dpi
+        pos += 2 + length
+    raise PdfError("No frame header in JPEG")
+
+
+def _png_header(buf):
+    w, h, _, color = struct.unpack('>IIBB', buf[16:26])
+    dpi = None
+    at = buf.find(b'pHYs', 8, min(len(buf), 1 << 20))
+    if at > 0:
+        x, y, unit = struct.unpack('>IIB', buf[at + 4:at + 13])
+        if unit == 1 and x and y:
+            dpi = (x * 0.0254, y * 0.0254)
+    components = {0: 1, 2: 3, 3: 3, 4: 1, 6: 3}.get(color, 3)
+    return w, h, components, dpi
+
+
+@check('image', ('jpeg', 'png', 'tiff'), "pixel size, colour mode and print resolution")
+def check_image(path, options, deadline):
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        if buf[:4] in (b'II*\x00', b'MM\x00*'):
+            yield 'info', "TIFF artwork is not inspected; it is checked by hand"
+            return
+        w, h, components, dpi = _jpeg_header(buf) if buf[:2] == b'\xff\xd8' else _png_header(buf)
+    mode = {1: 'greyscale', 3: 'RGB', 4: 'CMYK'}.get(components, f"{components} channels")
+    yield 'info', f"{w} x {h} px, {mode}"
+    if components == 3:
+        yield 'info', "RGB artwork is converted to CMYK for print; bright colours may shift"
+    trim = options.get('trim')
+    if trim:
+        # Whichever orientation fits the image better
+        effective = max(min(w / (trim[0] / POINTS_PER_INCH), h / (trim[1] / POINTS_PER_INCH)),
+                        min(h / (trim[0] / POINTS_PER_INCH), w / (trim[1] / POINTS_PER_INCH)))
+        where = f"at {options.get('size') or _inches(*trim)}"
+    elif dpi:
+        effective = min(dpi)
+        where = f"at its own size of {w / dpi[0]:.1f} x {h / dpi[1]:.1f} in"
+    else:
+        return
+    if effective < LOW_DPI:
+        yield 'error', f"Prints at {effective:.0f} dpi {where}: too low for print (at least {MIN_DPI})"
+    elif effective < MIN_DPI:
+        yield 'warning', f"Prints at {effective:.0f} dpi {where}: {MIN_DPI} dpi or more is recommended"
+    else:
+        yield 'info', f"Prints at {effective:.0f} dpi {where}"
+
+
+# The document a worker process has open, kept for the file's other checks
+_open_document = {}
+
+
+def _document(path):
+    st = os.stat(path)
+    key = (path, st.st_size, st.st_mtime_ns)
+    if key not in _open_document:
+        for doc in _open_document.values():
+            doc.close()
+        _open_document.clear()
+        _open_document[key] = PdfDocument(path)
+    return _open_document[key]
+
+
+def run_check(name, path, kind, options, deadline):
+    """Run one check (in a worker process); returns (findings, complete, seconds)"""
+    start = time.perf_counter()
+    findings = []
+    complete = True
+    try:
+        target = _document(path) if kind == 'pdf' else path
+        for level, message in CHECKS[name].func(target, options, Deadline(deadline)):
+            findings.append((level, message))
+    except OverBudget:
+        complete = False
+    except (PdfError, OSError, ValueError, struct.error, RecursionError) as e:
+        findings.append(('error', f"Could not read the file: {e}"))
+    except Exception as e:
+        # Uploads are untrusted: structure no check expects is a damaged file, not a crash
+        findings.append(('error', f"Could not read the file: {type(e).__name__}: {e}"))
+    return findings, complete, time.perf_counter() - start
+
+
+class PreflightReport:
+    """Outcome of preflighting one file"""
+
+    def __init__(self, path, kind, size, budget):
+        self.path = Path(path)
+        self.kind = kind
+        self.size = size
+        self.budget = budget
+        self.results = {}    # check -> (findings, complete, seconds)
+        self.elapsed = 0.0
+
+    @property
+    def findings(self):
+        return [(name, level, message) for name, (found, _, _) in self.results.items() for level, message in found]
+
+    @property
+    def incomplete(self):
+        return [name for name, (_, complete, _) in self.results.items() if not complete]
+
+    @property
+    def status(self):
+        levels = {level for _, level, _ in self.findings}
+        if 'error' in levels:
+            return 'fail'
+        if self.incomplete:
+            return 'incomplete'
+        return 'warn' if 'warning' in levels else 'pass'
+
+    def print_summary(self, name=None):
+        icon = {'fail': '❌', 'incomplete': '⚠', 'warn': '⚠', 'pass': '✅'}[self.status]
+        print(f"{icon} {name or self.path.name}: {self.status} "
+              f"({self.kind or 'unknown type'}, {self.size / 1024:.1f} KB, {self.elapsed * 1000:.1f} ms)")
+        for check_name, level, message in sorted(self.findings, key=lambda f: LEVELS.index(f[1])):
+            print(f"    {ICONS[level]} {check_name}: {message}")
+        for check_name in self.incomplete:
+            print(f"    ⚠ {check_name}: not finished within the {self.budget:g} s budget")
+
+    def to_dict(self, name=None):
+        return {
+            'file': name or self.path.name,
+            'kind': self.kind,
+            'size': self.size,
+            'status': self.status,
+            'findings': [{'check': c, 'level': level, 'message': message} for c, level, message in self.findings],
+            'incomplete': self.incomplete,
+            'timings_ms': {c: round(seconds * 1000, 3) for c, (_, _, seconds) in self.results.items()},
+            'elapsed_ms': round(self.elapsed * 1000, 3),
+        }
+
+
+class Preflight:
+    """A process pool that preflights files within a latency budget"""
+
+    def __init__(self, jobs=None, budget=BUDGET):
+        self.jobs = jobs or min(4, os.cpu_count() or 1)
+        self.budget = budget
+        self.pool = None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, path, options=None):
+        start = time.perf_counter()
+        path = str(path)
+        if not os.path.isfile(path):
+            report = PreflightReport(path, None, 0, self.budget)
+            report.results['type'] = ([('error', "File not found")], True, 0.0)
+            return report
+        kind = sniff(path)
+        report = PreflightReport(path, kind, os.path.getsize(path), self.budget)
+        if kind is None:
+            report.results['type'] = ([('error', "Not a PDF, JPEG, PNG or TIFF file")], True, 0.0)
+            report.elapsed = time.perf_counter() - start
+            return report
+        if self.pool is None:
+            # Workers come from a fork server, not forked from this process: the
+            # intake server would otherwise hand them its open connections, which
+            # then never see EOF when it closes them
+            context = (multiprocessing.get_context('forkserver')
+                       if 'forkserver' in multiprocessing.get_all_start_methods() else None)
+            self.pool = ProcessPoolExecutor(self.jobs, mp_context=context)
+        deadline = time.time() + self.budget
+        futures = {self.pool.submit(run_check, c.name, path, kind, options or {}, deadline): c.name
+                   for c in CHECKS.values() if kind in c.kinds}
+        done, late = wait(futures, timeout=self.budget + 0.05)
+        for future in late:
+            future.cancel()
+            report.results[futures[future]] = ([], False, self.budget)
+        for future in done:
+            try:
+                report.results[futures[future]] = future.result()
+            except Exception as e:
+                # The worker itself failed (a crashed pool, or an error outside run_check)
+                report.results[futures[future]] = ([('error', f"Could not check the file: {e}")], True, 0.0)
+                if isinstance(e, BrokenExecutor):
+                    self.close()
+        report.results = {c: report.results[c] for c in CHECKS if c in report.results}
+        report.elapsed = time.perf_counter() - start
+        return report
+
+
+def preflight_files(root='.', paths=(), line=None, size=None, budget=BUDGET, jobs=None, fmt='text'):
+    """Preflight files and print a report for each; returns the reports"""
+    options = options_for(root, line, size)
+    reports = []
+    with Preflight(jobs, budget) as runner:
+        for path in paths:
+            report = runner.run(path, options)
+            reports.append(report)
+            if fmt == 'text':
+                report.print_summary(str(path))
+    if fmt == 'json':
+        print(json.dumps([r.to_dict(str(r.path)) for r in reports], indent=2))
+    return reports
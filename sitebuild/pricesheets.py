@@ -0,0 +1,157 @@
+"""
+Price sheets
+
+"python -m sitebuild price-sheets" writes the full price grid of each
+product line in data/pricing.json: one row for every combination of its
+options, sheet page counts and sheet quantities (the "sheet" lists under
+"pages" and "quantity"), with the unit price, subtotal, discount and total.
+Rows are numbered in mixed radix over those columns. Each chunk of
+CHUNK_ROWS rows gets its codes from the row numbers, is priced with one
+PriceLine.batch() call and is streamed to the file, so memory stays flat
+however large a grid grows.
+
+Sheets are written as CSV, or as Parquet with the pyarrow package: a row
+group per chunk, with the option columns dictionary-encoded.
+
+The build's "price-sheets" stage publishes data/prices/<line>.json for
+the browser calculators. It holds the unit price of every option
+combination (and sheet page count) in one flat array, indexed by the same
+mixed-radix codes. The unit price does not depend on the quantity, so the
+quantity is left out. The calculators look a configuration up there and
+only compute the prices the sheet does not list. Without NumPy the stage
+is skipped and the calculators compute every price, as before.
+"""
+
+import csv
+import json
+import os
+import time
+from pathlib import Path
+
+from . import pricing
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+SHEET_DIR = 'price-sheets'
+LOOKUP_DIR = 'data/prices'
+LOOKUP_VERSION = 1
+CHUNK_ROWS = 65536
+FORMATS = ('csv', 'parquet')
+PRICE_COLUMNS = ('unit', 'subtotal', 'discount', 'total')
+
+
+def dimensions(line, quantities=True):
+    """(name, values) for each column of a line's grid, slowest-changing first"""
+    dims = [(axis.name, axis.options) for axis in line.axes]
+    if line.pages:
+        dims.append(('pages', line.pages.get('sheet') or [line.pages['default']]))
+    if quantities:
+        quantity = line.data.get('quantity', {})
+        dims.append(('quantity', quantity.get('sheet') or line.tier_minimums or [line.default_quantity]))
+    return dims
+
+
+def strides(dims):
+    result = []
+    stride = 1
+    for _, values in reversed(dims):
+        result.append(stride)
+        stride *= len(values)
+    return result[::-1]
+
+
+def chunks(line, dims, size=CHUNK_ROWS):
+    """(codes, prices) for each block of rows: code arrays by column and batch() results"""
+    np = pricing.np
+    pricing.require_numpy()
+    steps = strides(dims)
+    total = steps[0] * len(dims[0][1]) if dims else 0
+    for start in range(0, total, size):
+        rows = np.arange(start, min(start + size, total))
+        codes = {name: rows // step % len(values) for (name, values), step in zip(dims, steps)}
+        args = {name: codes[name] for name, _ in dims if name not in ('pages', 'quantity')}
+        for name in ('pages', 'quantity'):
+            if name in codes:
+                args[name] = np.asarray(dict(dims)[name], dtype=float)[codes[name]]
+        yield codes, line.batch(**args)
+
+
+def write_csv(line, path):
+    """Stream a line's full grid to a CSV file; returns the number of rows"""
+    dims = dimensions(line)
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in dims] + list(PRICE_COLUMNS))
+        for codes, prices in chunks(line, dims):
+            columns = [[values[c] for c in codes[name].tolist()] for name, values in dims]
+            columns += [[f"{v:.2f}" for v in prices[key].tolist()] for key in PRICE_COLUMNS]
+            writer.writerows(zip(*columns))
+            count += len(columns[0])
+    return count
+
+
+def write_parquet(line, path):
+    """Stream a line's full grid to a Parquet file, one row group per chunk"""
+    if pyarrow is None:
+        raise pricing.PricingError("pyarrow is required for Parquet price sheets: pip install pyarrow")
+    dims = dimensions(line)
+    count = 0
+    writer = None
+    try:
+        for codes, prices in chunks(line, dims):
+            columns = {}
+            for name, values in dims:
+                if name in ('pages', 'quantity'):
+                    columns[name] = pyarrow.array(pricing.np.asarray(values)[codes[name]])
+                else:
+                    columns[name] = pyarrow.DictionaryArray.from_arrays(
+                        pyarrow.array(codes[name].astype('int32')), pyarrow.array(values))
+            for key in PRICE_COLUMNS:
+                columns[key] = pyarrow.array(prices[key].round(2))
+            table = pyarrow.table(columns)
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(path, table.schema, compression='zstd')
+            writer.write_table(table)
+            count += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def lookup_table(line):
+    """The JSON the browser calculators look unit prices up in"""
+    dims = dimensions(line, quantities=False)
+    units = [prices['unit'] for _, prices in chunks(line, dims)]
+    unit = pricing.np.concatenate(units) if units else []
+    return {'version': LOOKUP_VERSION, 'line': line.name,
+            'keys': [[name, values] for name, values in dims],
+            'strides': strides(dims),
+            'unit': [float(v) for v in unit]}
+
+
+def lookup_json(line):
+    return json.dumps(lookup_table(line), separators=(',', ':'))
+
+
+def write_sheets(root='.', names=None, out=SHEET_DIR, fmt='csv', verbose=True):
+    """Write the price sheet of each line (or of the named ones) into out"""
+    table = pricing.load(root)
+    lines = [table.line(name) for name in names] if names else list(table.lines.values())
+    out = Path(root) / out
+    out.mkdir(parents=True, exist_ok=True)
+    written = []
+    for line in lines:
+        start = time.perf_counter()
+        path = out / f"{line.name}.{fmt}"
+        rows = write_parquet(line, path) if fmt == 'parquet' else write_csv(line, path)
+        written.append((path, rows))
+        if verbose:
+            print(f"✅ {os.path.relpath(path, root)}: {rows:,} rows, {path.stat().st_size / 1024:.1f} KB "
+                  f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return written
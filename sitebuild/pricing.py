@@ -0,0 +1,352 @@
+"""
+Print pricing engine
+
+data/pricing.json is the one rate table for the price calculators. Each
+product line lists its option axes, and each axis has a kind:
+
+- base: the starting price per unit (children's book type, print product),
+- multiplier: scales the unit price (book size, paper, finish, ...),
+- adder: is added to the unit price (cover, lamination, thickness).
+
+A line may also charge per block of pages and give quantity discounts:
+
+    unit     = base * multipliers + ceil(pages / step) * page price + adders
+    subtotal = unit * quantity
+    total    = subtotal * (1 - discount of the highest tier <= quantity)
+
+A line with an "ink" entry also charges for heavy ink coverage, measured
+from the artwork (sitebuild/artwork.py): per page, each percentage point
+of mean coverage over the included one costs the ink price, and quote()
+and batch() add that ink cost to the unit price. Without it they price
+the same as the browser calculators, which do not see the artwork.
+
+quote() prices one configuration in plain Python. PriceLine.batch() prices
+any number of them at once with NumPy arrays: option names become indexes
+into each axis's price array, and the discount tier of every quantity is
+found with one binary search (numpy.searchsorted). Ten thousand
+configurations take under a millisecond with options given as integer
+codes, a few milliseconds as names. NumPy is only needed for batch().
+
+The browser calculators (ChildrensBookPrinting in js/childrens-book.js
+and PriceCalculatorManager in js/script.js) compute the same formula from
+a copy of their line. The build writes the copy from the table (the
+"pricing" stage), and "python -m sitebuild price --export" writes it into
+the source scripts as well.
+"""
+
+import bisect
+import csv
+import json
+import math
+import numbers
+import re
+import time
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PRICING_PATH = 'data/pricing.json'
+PRICING_VERSION = 1
+AXIS_KINDS = ('base', 'multiplier', 'adder')
+# A quoted JS string, ending at its closing quote or the end of the line
+_JS_STRING = re.compile(r'"(?:[^"\\\n]|\\.)*"?|\'(?:[^\'\\\n]|\\.)*\'?')
+
+# Where each line is copied into the browser calculators
+EXPORTS = {
+    'childrens-book': ('js/childrens-book.js', 'this.priceData'),
+    'print': ('js/script.js', 'this.rates'),
+}
+
+
+class PricingError(Exception):
+    """Raised for a malformed rate table or a configuration it cannot price"""
+
+
+class NumpyMissing(PricingError):
+    """Raised when a batch is priced without NumPy installed"""
+
+
+def require_numpy():
+    if np is None:
+        raise NumpyMissing("NumPy is required for batch pricing: pip install numpy")
+
+
+def _amount(name, value):
+    """value, checked to be a finite number >= 0 (quantity, pages, ink)"""
+    if isinstance(value, bool) or not isinstance(value, numbers.Real) or not math.isfinite(value) or value < 0:
+        raise PricingError(f"{name} must be a number of zero or more, not {value!r}")
+    return value
+
+
+def _amounts(name, value):
+    """value as a float array, checked like _amount()"""
+    array = np.asarray(value)
+    if array.dtype.kind not in 'iuf':
+        raise PricingError(f"{name} must be numbers of zero or more")
+    array = array.astype(float)
+    if array.size and not (np.isfinite(array).all() and array.min() >= 0):
+        raise PricingError(f"{name} must be numbers of zero or more")
+    return array
+
+
+class Axis:
+    """One option of a product line, with the price of each of its values"""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.kind = data.get('kind')
+        if self.kind not in AXIS_KINDS:
+            raise PricingError(f"Axis {name}: kind must be one of {', '.join(AXIS_KINDS)}")
+        self.prices = dict(data['prices'])
+        self.options = list(self.prices)
+        self.default = data.get('default', self.options[0])
+        if self.default not in self.prices:
+            raise PricingError(f"Axis {name}: default {self.default!r} has no price")
+        self.index = {option: i for i, option in enumerate(self.options)}
+        self.array = np.array([self.prices[o] for o in self.options], dtype=float) if np is not None else None
+
+    def codes(self, values, n):
+        """Indexes into self.options for values: option names, integer codes or one scalar"""
+        if values is None:
+            values = self.default
+        values = np.asarray(values)
+        if values.ndim == 0:
+            values = np.full(n, values.item(), dtype=values.dtype)
+        if values.dtype.kind in 'iu':
+            if len(values) and (values.min() < 0 or values.max() >= len(self.options)):
+                raise PricingError(f"Axis {self.name}: option code out of range")
+            return values
+        unique, inverse = np.unique(values, return_inverse=True)
+        unknown = [str(u) for u in unique if u not in self.index]
+        if unknown:
+            raise PricingError(f"Axis {self.name}: unknown option(s) {', '.join(unknown)}")
+        return np.array([self.index[u] for u in unique], dtype=np.intp)[inverse]
+
+
+class PriceLine:
+    """A product line of the rate table"""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+        self.title = data.get('title', name)
+        try:
+            self.axes = [Axis(axis, entry) for axis, entry in data['axes'].items()]
+            self.pages = data.get('pages')
+            self.default_quantity = data.get('quantity', {}).get('default', 1)
+            self.ink = data.get('ink')
+            if self.ink is not None:
+                self.ink = {'included': float(self.ink['included']), 'price': float(self.ink['price'])}
+            tiers = sorted(data.get('discounts', ()))
+        except (KeyError, TypeError, AttributeError) as e:
+            raise PricingError(f"Line {name}: malformed entry ({e})") from e
+        if [a.kind for a in self.axes].count('base') != 1:
+            raise PricingError(f"Line {name}: needs exactly one base axis")
+        self.tier_minimums = [minimum for minimum, _ in tiers]
+        self.tier_rates = [rate for _, rate in tiers]
+
+    def axis(self, name):
+        for a in self.axes:
+            if a.name == name:
+                return a
+        raise PricingError(f"Line {self.name} has no option {name!r}")
+
+    def discount(self, quantity):
+        """Discount rate of the highest tier whose minimum quantity is reached"""
+        i = bisect.bisect_right(self.tier_minimums, quantity) - 1
+        return self.tier_rates[i] if i >= 0 else 0.0
+
+    def ink_cost(self, coverages):
+        """Ink charge per copy for artwork pages of the given mean coverages (percent)"""
+        if not self.ink:
+            return 0.0
+        return sum(max(0.0, c - self.ink['included']) for c in coverages) * self.ink['price']
+
+    def quote(self, quantity=None, pages=None, ink=0.0, **options):
+        """Price one configuration: dict with unit, subtotal, discount_rate, discount and total"""
+        unknown = set(options) - {a.name for a in self.axes}
+        if unknown:
+            raise PricingError(f"Line {self.name} has no option(s) {', '.join(sorted(unknown))}")
+        quantity = _amount('quantity', self.default_quantity if quantity is None else quantity)
+        ink = _amount('ink', ink)
+        unit = 1.0
+        adders = 0.0
+        for a in self.axes:
+            value = options.get(a.name, a.default)
+            if not isinstance(value, str) or value not in a.prices:
+                raise PricingError(f"Axis {a.name}: unknown option {value!r}")
+            if a.kind == 'adder':
+                adders += a.prices[value]
+            else:
+                unit *= a.prices[value]
+        if self.pages:
+            pages = _amount('pages', self.pages['default'] if pages is None else pages)
+            unit += math.ceil(pages / self.pages['step']) * self.pages['price']
+        unit += adders + ink
+        subtotal = unit * quantity
+        rate = self.discount(quantity)
+        return {'unit': unit, 'subtotal': subtotal, 'discount_rate': rate,
+                'discount': subtotal * rate, 'total': subtotal - subtotal * rate}
+
+    def batch(self, quantity=None, pages=None, ink=0.0, **options):
+        """Price many configurations at once; each argument is an array or one value for all
+
+        Options are given by name or as integer codes into Axis.options,
+        ink as the ink cost per copy (see ink_cost()). Returns a dict of float arrays like quote().
+        """
+        require_numpy()
+        unknown = set(options) - {a.name for a in self.axes}
+        if unknown:
+            raise PricingError(f"Line {self.name} has no option(s) {', '.join(sorted(unknown))}")
+        quantity = _amounts('quantity', self.default_quantity if quantity is None else quantity)
+        ink = _amounts('ink', ink)
+        sizes = [np.size(v) for v in options.values() if np.ndim(v)] + [quantity.size, ink.size]
+        if self.pages and pages is not None:
+            sizes.append(np.size(pages))
+        n = max(sizes)
+
+        unit = np.ones(n)
+        adders = np.zeros(n)
+        for a in self.axes:
+            prices = a.array[a.codes(options.get(a.name), n)]
+            if a.kind == 'adder':
+                adders += prices
+            else:
+                unit *= prices
+        if self.pages:
+            pages = _amounts('pages', self.pages['default'] if pages is None else pages)
+            unit += np.ceil(pages / self.pages['step']) * self.pages['price']
+        unit += adders + np.broadcast_to(ink, (n,))
+
+        subtotal = unit * quantity
+        tier = np.searchsorted(np.asarray(self.tier_minimums, dtype=float), quantity, side='right') - 1
+        rates = np.asarray(self.tier_rates + [0.0], dtype=float)[tier]
+        discount = subtotal * rates
+        return {'unit': unit, 'subtotal': subtotal, 'discount_rate': np.broadcast_to(rates, (n,)),
+                'discount': discount, 'total': subtotal - discount}
+
+    def export(self):
+        """The line as the browser calculators read it"""
+        return {key: self.data[key] for key in ('axes', 'pages', 'quantity', 'discounts') if key in self.data}
+
+
+class RateTable:
+    """The product lines of data/pricing.json"""
+
+    def __init__(self, data):
+        if data.get('version') != PRICING_VERSION:
+            raise PricingError(f"{PRICING_PATH}: unsupported version {data.get('version')!r}")
+        self.currency = data.get('currency', 'INR')
+        self.lines = {name: PriceLine(name, entry) for name, entry in data.get('lines', {}).items()}
+
+    def line(self, name):
+        if name not in self.lines:
+            raise PricingError(f"Unknown price line {name!r} (have: {', '.join(self.lines)})")
+        return self.lines[name]
+
+
+def from_text(text):
+    try:
+        return RateTable(json.loads(text))
+    except ValueError as e:
+        raise PricingError(f"{PRICING_PATH}: {e}") from e
+
+
+def load(root='.'):
+    path = Path(root) / PRICING_PATH
+    if not path.exists():
+        raise PricingError(f"{PRICING_PATH} not found")
+    return from_text(path.read_text(encoding='utf-8'))
+
+
+def _literal_end(source, start):
+    """End of the object literal that opens at source[start]"""
+    depth = 0
+    i = start
+    while i < len(source):
+        ch = source[i]
+        if ch in '"\'':
+            i = _JS_STRING.match(source, i).end()
+            continue
+        if ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise PricingError("Unterminated object literal")
+
+
+def export_script(source, target, line):
+    """source with the object literal assigned to target replaced by the line's rates"""
+    m = re.search(re.escape(target) + r'\s*=\s*\{', source)
+    if m is None:
+        raise PricingError(f"No {target} = {{...}} to replace")
+    start = m.end() - 1
+    end = _literal_end(source, start)
+    # Keep the script's own indentation: that of the statement, and one level inside the literal
+    indent = re.match(r'[ \t]*', source[source.rfind('\n', 0, m.start()) + 1:]).group(0)
+    inner = re.match(r'\{[ \t]*\n([ \t]*)', source[start:end])
+    step = len(inner.group(1)) - len(indent) if inner and len(inner.group(1)) > len(indent) else 4
+    return source[:start] + _dump(line.export(), indent, ' ' * step) + source[end:]
+
+
+def _dump(value, indent, step, width=100):
+    """JSON for value, keeping each object or array on one line when it fits"""
+    text = json.dumps(value)
+    if not isinstance(value, (dict, list)) or len(indent) + len(text) <= width:
+        return text
+    inner = indent + step
+    if isinstance(value, dict):
+        items = [f"{json.dumps(key)}: {_dump(item, inner, step, width)}" for key, item in value.items()]
+        return '{\n' + ',\n'.join(inner + item for item in items) + '\n' + indent + '}'
+    return '[\n' + ',\n'.join(inner + _dump(item, inner, step, width) for item in value) + '\n' + indent + ']'
+
+
+def export_scripts(table, read, write):
+    """Copy each exported line into its script; returns the scripts that changed
+
+    read returns the text of a script, or None when there is none.
+    """
+    changed = []
+    for name, (rel, target) in EXPORTS.items():
+        source = read(rel) if name in table.lines else None
+        if source is None:
+            continue
+        updated = export_script(source, target, table.lines[name])
+        if updated != source:
+            write(rel, updated)
+            changed.append(rel)
+    return changed
+
+
+def price_csv(table, name, infile, outfile):
+    """Price every row of a CSV of configurations, writing the rows back with their prices
+
+    Columns are option names, quantity and pages; missing ones take the
+    line's defaults.
+    """
+    line = table.line(name)
+    rows = list(csv.DictReader(infile))
+    start = time.perf_counter()
+    columns = {}
+    for key in rows[0] if rows else ():
+        if key in ('quantity', 'pages'):
+            columns[key] = [float(r[key]) for r in rows]
+        else:
+            line.axis(key)
+            columns[key] = [r[key] for r in rows]
+    prices = line.batch(**columns) if rows else {}
+    elapsed = time.perf_counter() - start
+
+    fields = list(rows[0]) if rows else []
+    writer = csv.writer(outfile)
+    writer.writerow(fields + ['unit', 'subtotal', 'discount', 'total'])
+    for i, row in enumerate(rows):
+        writer.writerow([row[f] for f in fields] + [f"{prices[key][i]:.2f}"
+                                                    for key in ('unit', 'subtotal', 'discount', 'total')])
+    return len(rows), elapsed
@@ -0,0 +1,321 @@
+"""
+Local development server
+
+"python -m sitebuild serve" serves the site as render and refresh would
+leave it, without writing anything. Service pages that have a content file
+are rendered from templates/, and the default transforms run over every
+page, all in memory.
+
+Each page remembers the files it was built from: its source or content
+file, the templates and catalogue, and the sources of the fragments its
+transforms used (index.html, the footer templates). Before a page is
+served those files are checked, and only the pages that depend on a
+changed file are rebuilt. Other files (css/, js/, assets/, data/) are
+served from memory and read again when their size or mtime changes.
+
+Responses carry an ETag and answer If-None-Match with 304. Text is sent
+compressed with brotli or gzip, compressed once per version and kept.
+Range requests get a 206, so large images and video can be seeked.
+"""
+
+import mimetypes
+import posixpath
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from . import compress
+from .build import PUBLIC_DIRS, PUBLIC_FILES, SKIPPED_SUFFIXES
+from .catalogue import CATALOGUE_PATH, from_text
+from .engine import IOStats, Page, apply_transforms, discover_pages
+from .fragments import BuildContext, FragmentMissing
+from .manifest import file_stat, sha256
+from .templates import CONTENT_DIR, TEMPLATE_DIR, TemplateLoader, parse_content, service_context
+from .transforms import resolve_transforms
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json',
+                      'application/manifest+json', 'image/svg+xml')
+CONTENT_ENCODINGS = {'br': 'br', 'gz': 'gzip'}
+
+_RANGE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('image/avif', '.avif')
+mimetypes.add_type('image/svg+xml', '.svg')
+mimetypes.add_type('application/manifest+json', '.webmanifest')
+
+
+class Response:
+    """One version of a file, with its ETag and its compressed forms"""
+
+    def __init__(self, data, content_type, stat=None):
+        self.data = data
+        self.content_type = content_type
+        self.stat = stat
+        self.etag = f'"{sha256(data)[:16]}"'
+        self._encoded = {}
+
+    @property
+    def compressible(self):
+        return self.content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def encoded(self, encoding):
+        if encoding not in self._encoded:
+            self._encoded[encoding] = compress.compress(self.data, encoding, fast=True)
+        return self._encoded[encoding]
+
+
+def content_type(rel):
+    kind = mimetypes.guess_type(rel)[0] or 'application/octet-stream'
+    return kind + '; charset=utf-8' if kind.startswith('text/') else kind
+
+
+class DevSite:
+    """The rendered pages held in memory, rebuilt when their sources change"""
+
+    def __init__(self, root='.', names=None):
+        self.root = Path(root)
+        self.transforms = resolve_transforms(names)
+        self.pages = {}
+        self.deps = {}
+        self.files = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def page_list(self):
+        """Every page the site has, including service pages only in content/"""
+        rels = {path.relative_to(self.root).as_posix() for path in discover_pages(self.root)}
+        rels |= {f"services/{path.stem}.html" for path in (self.root / CONTENT_DIR).glob('*.html')}
+        return sorted(rels)
+
+    def update(self):
+        """Rebuild the pages whose sources changed since they were built"""
+        with self.lock:
+            rels = self.page_list()
+            stats = {}
+
+            def changed(rel):
+                for dep, stat in self.deps[rel].items():
+                    if dep not in stats:
+                        stats[dep] = file_stat(self.root / dep)
+                    if stats[dep] != stat:
+                        return True
+                return False
+
+            stale = [rel for rel in rels if rel not in self.deps or changed(rel)]
+            for rel in self.pages.keys() - set(rels):
+                del self.pages[rel], self.deps[rel]
+            if stale:
+                self._build(stale)
+            return stale
+
+    def _build(self, rels):
+        ctx = BuildContext(self.root, IOStats())
+        active = []
+        skipped = []
+        for t in self.transforms:
+            try:
+                for name in t.fragments:
+                    ctx.get(name)
+                active.append(t)
+            except FragmentMissing as e:
+                skipped.append(t)
+                print(f"⚠ Skipped {t.name}: {e}")
+        loader = TemplateLoader(self.root)
+        templates = [p.relative_to(self.root).as_posix()
+                     for p in sorted((self.root / TEMPLATE_DIR).rglob('*')) if p.is_file()]
+
+        for rel in rels:
+            content_file = f"{CONTENT_DIR}/{rel[len('services/'):]}" if rel.startswith('services/') else None
+            if content_file and (self.root / content_file).exists():
+                sources = [content_file, CATALOGUE_PATH] + templates
+            else:
+                sources = [rel]
+            page = Page(self.root, self.root / rel, b'')
+            applicable = [t for t in active if t.applies_to(page)]
+            # A skipped transform depends on the fragment source it could not
+            # read, so the page is rebuilt once that file appears
+            for t in applicable + [t for t in skipped if t.applies_to(page)]:
+                for name in t.fragments:
+                    sources += sorted(ctx.fragment_sources.get(name, ()))
+            self.deps[rel] = {dep: file_stat(self.root / dep) for dep in sources}
+
+            try:
+                if sources[0] == rel:
+                    data = ctx.read_bytes(rel)
+                else:
+                    catalogue = from_text(ctx.read_bytes(CATALOGUE_PATH).decode('utf-8'))
+                    fields = parse_content(ctx.read_bytes(content_file).decode('utf-8'))
+                    slug = rel[len('services/'):-len('.html')]
+                    data = loader.render('service.html', service_context(slug, fields, catalogue)).encode('utf-8')
+            except Exception as e:
+                message = f"{type(e).__name__}: {e}"
+                print(f"❌ {rel}: {message}")
+                self.pages[rel] = Response(message.encode('utf-8'), 'text/plain; charset=utf-8')
+                self.errors[rel] = message
+                continue
+
+            page = Page(self.root, self.root / rel, data)
+            errors = []
+            apply_transforms(page, applicable, ctx, errors)
+            for _, name, e in errors:
+                print(f"❌ {name} failed on {rel}: {type(e).__name__}: {e}")
+            self.errors.pop(rel, None)
+            self.pages[rel] = Response(page.encoded(), 'text/html; charset=utf-8')
+
+    def public(self, rel):
+        """True for the files a build would publish"""
+        if rel in PUBLIC_FILES:
+            return True
+        parts = rel.split('/')
+        return (parts[0] in PUBLIC_DIRS and not any(p.startswith('.') for p in parts)
+                and not rel.endswith(SKIPPED_SUFFIXES))
+
+    def file(self, rel):
+        """Response for a public file, read again when it changed on disk"""
+        if not self.public(rel):
+            return None
+        stat = file_stat(self.root / rel)
+        if stat is None or not (self.root / rel).is_file():
+            self.files.pop(rel, None)
+            return None
+        cached = self.files.get(rel)
+        if cached is None or cached.stat != stat:
+            cached = self.files[rel] = Response((self.root / rel).read_bytes(), content_type(rel), stat)
+        return cached
+
+
+def request_path(url):
+    """The site path of a request URL, or None when it leaves the root"""
+    path = unquote(urlsplit(url).path)
+    if path.endswith('/'):
+        path += 'index.html'
+    rel = posixpath.normpath(path.lstrip('/'))
+    return None if rel.startswith('..') else rel
+
+
+def accepted_encoding(header):
+    """The best encoding this server can write that the Accept-Encoding header allows"""
+    accepted = set()
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(name.strip().lower())
+    for encoding in ('br', 'gz'):
+        if encoding in compress.encodings() and CONTENT_ENCODINGS[encoding] in accepted:
+            return encoding
+    return None
+
+
+def byte_range(header, size):
+    """(start, end) of a single-range Range header, None to send it all, or False when unsatisfiable"""
+    m = _RANGE.match((header or '').strip())
+    if not m or not (m.group(1) or m.group(2)):
+        return None
+    if m.group(1):
+        start = int(m.group(1))
+        end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+    else:
+        start = max(0, size - int(m.group(2)))
+        end = size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+class DevHandler(BaseHTTPRequestHandler):
+    """Serves one DevSite"""
+
+    site = None
+    server_version = 'sitebuild-dev'
+
+    def do_GET(self):
+        self.respond(body=True)
+
+    def do_HEAD(self):
+        self.respond(body=False)
+
+    def respond(self, body):
+        start = time.perf_counter()
+        rel = request_path(self.path)
+        rebuilt = []
+        response = None
+        if rel is not None:
+            if rel.endswith('.html'):
+                rebuilt = self.site.update()
+            response = self.site.pages.get(rel) or self.site.file(rel)
+
+        if response is None:
+            status = self.send_data(404, b'Not found\n', {'Content-Type': 'text/plain; charset=utf-8'}, body)
+        else:
+            status = self.send_response_for(response, body, error=rel in self.site.errors)
+        elapsed = (time.perf_counter() - start) * 1000
+        extra = f" (rebuilt {len(rebuilt)} page(s))" if rebuilt else ''
+        print(f"{status} {self.command} {self.path} {elapsed:.1f} ms{extra}")
+
+    def send_response_for(self, response, body, error=False):
+        headers = {'Content-Type': response.content_type, 'ETag': response.etag,
+                   'Cache-Control': 'no-cache', 'Accept-Ranges': 'bytes'}
+        if response.compressible:
+            headers['Vary'] = 'Accept-Encoding'
+        if error:
+            return self.send_data(500, response.data, headers, body)
+
+        matches = [tag.strip().removeprefix('W/') for tag in self.headers.get('If-None-Match', '').split(',')]
+        if response.etag in matches or '*' in matches:
+            return self.send_data(304, b'', headers, False)
+
+        size = len(response.data)
+        if_range = self.headers.get('If-Range')
+        span = byte_range(self.headers.get('Range'), size) if if_range in (None, response.etag) else None
+        if span is False:
+            headers['Content-Range'] = f"bytes */{size}"
+            return self.send_data(416, b'', headers, body)
+        if span is not None:
+            start, end = span
+            headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+            return self.send_data(206, response.data[start:end + 1], headers, body)
+
+        encoding = accepted_encoding(self.headers.get('Accept-Encoding')) if response.compressible else None
+        if encoding:
+            headers['Content-Encoding'] = CONTENT_ENCODINGS[encoding]
+            return self.send_data(200, response.encoded(encoding), headers, body)
+        return self.send_data(200, response.data, headers, body)
+
+    def send_data(self, status, data, headers, body):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if body and data:
+            self.wfile.write(data)
+        return status
+
+    def log_request(self, code='-', size='-'):
+        # respond() prints one line per request with its timing instead
+        pass
+
+
+def serve(root='.', host='127.0.0.1', port=8000, names=None):
+    """Serve the rendered site until interrupted"""
+    site = DevSite(root, names)
+    start = time.perf_counter()
+    pages = site.update()
+    print(f"Built {len(pages)} pages in {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({', '.join(t.name for t in site.transforms) or 'no transforms'})")
+
+    handler = type('Handler', (DevHandler,), {'site': site})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Serving {Path(root).resolve()} at http://{host}:{server.server_port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped")
+    finally:
+        server.server_close()
+    return 0
@@ -0,0 +1,319 @@
+"""
+Crash-safe page writes with rollback snapshots
+
+Pages are never overwritten in place. New contents are written to a temp
+file next to the target, fsynced and renamed over it, so a crash leaves
+either the old page or the new one. Before a page is replaced its old
+contents go into a snapshot store under .sitebuild/snapshots/. Versions
+are stored once, zlib-compressed and named by content hash, in a blob
+store shared by all runs, so a page that comes back to the same contents
+run after run is kept only once. The run's journal records which version
+every page had before and after. Rolling back a run restores those
+versions, which replaces the hand-made services/*.html.backup copies.
+Pruning old runs deletes the blobs no remaining journal refers to.
+
+    .sitebuild/snapshots/blobs/<sha256>   compressed page versions
+    .sitebuild/snapshots/<run>.json       journal: pages and their hashes
+
+Runs recorded before the blob store keep their versions in a per-run
+<run>.pack and can still be rolled back.
+"""
+
+import hashlib
+import json
+import os
+import time
+import zlib
+from pathlib import Path
+
+SNAPSHOT_DIR = '.sitebuild/snapshots'
+BLOB_DIR = 'blobs'
+KEEP_RUNS = 20
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _fsync_dir(path):
+    """Make a rename in path durable (a no-op where directories cannot be opened)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def stage(path, data):
+    """Write data to a fsynced temp file beside path and return its path"""
+    path = Path(path)
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    try:
+        mode = path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o666
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return tmp
+
+
+def atomic_write(path, data):
+    """Replace path with data so readers see either the old or the new file"""
+    tmp = stage(path, data)
+    os.replace(tmp, path)
+    _fsync_dir(Path(path).parent)
+
+
+class SnapshotStore:
+    """Runs recorded under .sitebuild/snapshots/ and the page versions they refer to"""
+
+    def __init__(self, root='.'):
+        self.root = Path(root)
+        self.dir = self.root / SNAPSHOT_DIR
+        self.blobs = self.dir / BLOB_DIR
+
+    def journal_path(self, run_id):
+        return self.dir / f'{run_id}.json'
+
+    def pack_path(self, run_id):
+        return self.dir / f'{run_id}.pack'
+
+    def runs(self):
+        """Run ids, oldest first"""
+        if not self.dir.exists():
+            return []
+        return sorted(p.stem for p in self.dir.glob('*.json'))
+
+    def load_run(self, run_id):
+        return json.loads(self.journal_path(run_id).read_text(encoding='utf-8'))
+
+    def save_run(self, run_id, journal):
+        atomic_write(self.journal_path(run_id), json.dumps(journal, indent=1).encode('utf-8'))
+
+    def new_run_id(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        taken = set(self.runs())
+        n = 1
+        while f'{stamp}-{n:03d}' in taken:
+            n += 1
+        return f'{stamp}-{n:03d}'
+
+    def blob_path(self, digest):
+        return self.blobs / digest
+
+    def put_blobs(self, versions):
+        """Store the {digest: data} versions not stored yet; durable once this returns"""
+        added = False
+        for digest, data in versions.items():
+            path = self.blob_path(digest)
+            if path.exists():
+                continue
+            if not added:
+                self.blobs.mkdir(parents=True, exist_ok=True)
+                added = True
+            os.replace(stage(path, zlib.compress(data, 6)), path)
+        if added:
+            _fsync_dir(self.blobs)
+
+    def read_blob(self, digest):
+        return zlib.decompress(self.blob_path(digest).read_bytes())
+
+    def read_pack(self, run_id):
+        """The uncompressed contents of a run's pack (runs from before the blob store)"""
+        path = self.pack_path(run_id)
+        if not path.exists():
+            return b''
+        return zlib.decompressobj().decompress(path.read_bytes())
+
+    def drop(self, run_id):
+        self.journal_path(run_id).unlink()
+        try:
+            self.pack_path(run_id).unlink()
+        except FileNotFoundError:
+            pass
+
+    def rollback(self, run_id=None, force=False, verbose=True):
+        """Restore the pages replaced by a run (default: the latest) and drop the run
+
+        Pages edited since the run are left alone unless force is set.
+        Returns the list of restored paths, or None when there is no run.
+        """
+        runs = self.runs()
+        if not runs:
+            return None
+        run_id = run_id or runs[-1]
+        if run_id not in runs:
+            raise KeyError(f"Unknown snapshot run: {run_id}")
+
+        journal = self.load_run(run_id)
+        pack = self.read_pack(run_id) if 'blobs' in journal else None
+        restored = []
+        skipped = []
+        for rel, entry in journal['files'].items():
+            path = self.root / rel
+            current = sha256(path.read_bytes()) if path.exists() else None
+            if current == entry['before']:
+                continue
+            if current != entry['after'] and not force:
+                skipped.append(rel)
+                continue
+            if entry['before'] is None:
+                path.unlink()
+            elif pack is not None:
+                offset, length = journal['blobs'][entry['before']]
+                atomic_write(path, pack[offset:offset + length])
+            else:
+                atomic_write(path, self.read_blob(entry['before']))
+            restored.append(rel)
+            if verbose:
+                print(f"✅ Restored: {rel}")
+
+        if skipped:
+            for rel in skipped:
+                print(f"⚠ Changed since run {run_id}, not restored: {rel}")
+            print("Re-run with --force to restore these too")
+        else:
+            self.drop(run_id)
+            self.sweep()
+        return restored
+
+    def prune(self, keep=KEEP_RUNS):
+        """Drop all but the newest runs, and the blobs only they referred to"""
+        runs = self.runs()
+        for run_id in runs[:-keep] if keep else runs:
+            self.drop(run_id)
+        self.sweep()
+
+    def sweep(self):
+        """Delete the blobs no run refers to"""
+        if not self.blobs.is_dir():
+            return
+        referenced = set()
+        for run_id in self.runs():
+            referenced.update(entry['before'] for entry in self.load_run(run_id)['files'].values())
+        for path in self.blobs.iterdir():
+            if path.name not in referenced and not path.name.endswith('.tmp'):
+                path.unlink()
+
+    def disk_usage(self):
+        if not self.dir.exists():
+            return 0
+        return sum(p.stat().st_size for p in self.dir.rglob('*') if p.is_file())
+
+
+class Transaction:
+    """A set of page writes that are snapshotted and then applied together
+
+    Writes are staged to temp files; commit() journals the old version of
+    every target and renames the staged files into place. Leaving the with
+    block with an exception deletes the staged files and touches nothing.
+    With autocommit each write is applied immediately, which is how the
+    standalone scripts use it: one run per script invocation, pruned when
+    it starts.
+    """
+
+    def __init__(self, root='.', label='', io=None, autocommit=False):
+        self.root = os.path.abspath(root)
+        self.store = SnapshotStore(self.root)
+        self.label = label
+        self.io = io
+        self.autocommit = autocommit
+        self.run_id = None
+        self.journal = {'label': label, 'files': {}}
+        self._staged = []
+
+    def _rel(self, path):
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        return str(Path(path).resolve()) if rel.startswith('..') else Path(rel).as_posix()
+
+    def write(self, path, data, previous=None):
+        """Stage data for path; previous is the current contents if already read"""
+        path = Path(path)
+        self._staged.append((path, stage(path, data), previous, sha256(data)))
+        if self.io is not None:
+            self.io.count_write(data)
+        if self.autocommit:
+            self.commit()
+
+    def commit(self):
+        if not self._staged:
+            return
+        first = self.run_id is None
+        if first:
+            self.run_id = self.store.new_run_id()
+
+        versions = {}
+        for path, tmp, previous, after in self._staged:
+            rel = self._rel(path)
+            if rel in self.journal['files']:
+                self.journal['files'][rel]['after'] = after
+                continue
+            if previous is None and path.exists():
+                previous = path.read_bytes()
+            before = sha256(previous) if previous is not None else None
+            if before is not None:
+                versions[before] = previous
+            self.journal['files'][rel] = {'before': before, 'after': after}
+        self.store.put_blobs(versions)
+
+        # The journal is durable before any page changes, so a crash part way
+        # through the renames can still be rolled back
+        self.store.save_run(self.run_id, self.journal)
+        for path, tmp, _, _ in self._staged:
+            os.replace(tmp, path)
+        for parent in {path.parent for path, _, _, _ in self._staged}:
+            _fsync_dir(parent)
+        self._staged = []
+        # An autocommit run is never left through __exit__, so it prunes here
+        if first and self.autocommit:
+            self.store.prune()
+
+    def abort(self):
+        for _, tmp, _, _ in self._staged:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+        self._staged = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+            if self.run_id is not None:
+                self.store.prune()
+        else:
+            self.abort()
+        return False
+
+
+_script_transactions = {}
+
+
+def write_text(path, text, label):
+    """Crash-safe replacement for open(path, 'w').write(text) in the rewrite scripts
+
+    Every file a script writes is snapshotted into one run named after the
+    script, so "python -m sitebuild rollback" undoes the whole invocation.
+    Scripts pass label=__file__.
+    """
+    script = Path(label).name
+    key = (os.getcwd(), script)
+    if key not in _script_transactions:
+        _script_transactions[key] = Transaction('.', script, autocommit=True)
+    _script_transactions[key].write(path, text.encode('utf-8'))
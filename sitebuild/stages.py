@@ -0,0 +1,519 @@
+"""
+Build stages run by "python -m sitebuild build"
+
+Each stage takes the in-memory Site and rewrites its pages or adds files to
+it. Stages are registered with @stage and run in registration order.
+"""
+
+import json
+import posixpath
+import re
+
+from . import compress, critical, css, js, pricesheets, pricing
+from .snapshots import sha256
+from .tokenizer import apply_edits, parse_attrs, scan
+
+STAGES = {}
+
+CSS_BUILD_DIR = 'css/build'
+JS_BUILD_DIR = 'js/build'
+JS_TYPES = ('', 'text/javascript', 'application/javascript', 'module')
+
+ASSET_MANIFEST = 'asset-manifest.json'
+ASSET_DIRS = ('css', 'js', 'assets')
+ASSET_SUFFIXES = ('.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.svg', '.ico',
+                  '.woff', '.woff2')
+
+SERVICE_WORKER = 'sw.js'
+# Precached first, with the files they load; service pages follow while the budget lasts
+PRECACHE_PAGES = ('index.html', 'offline.html', 'contact.html', 'categories.html')
+PRECACHE_FILES = ('manifest.json', 'data/products.json')
+PRECACHE_BUDGET = 1024 * 1024
+
+
+class Stage:
+    """A registered build stage"""
+
+    def __init__(self, func, name, default=True):
+        self.func = func
+        self.name = name
+        self.default = default
+        self.description = (func.__doc__ or '').strip().splitlines()[0] if func.__doc__ else ''
+
+    def __call__(self, site):
+        return self.func(site)
+
+
+def stage(name, default=True):
+    """Register a build stage"""
+    def register(func):
+        STAGES[name] = Stage(func, name, default)
+        return func
+    return register
+
+
+def resolve_stages(names=None):
+    if not names:
+        return [s for s in STAGES.values() if s.default]
+    unknown = [n for n in names if n not in STAGES]
+    if unknown:
+        raise KeyError(f"Unknown build stage(s): {', '.join(unknown)}")
+    return [STAGES[n] for n in names]
+
+
+_LINK = re.compile(r'<link\b([^>]*)>', re.IGNORECASE)
+_SCRIPT_TAG = re.compile(r'<script\b([^>]*)>', re.IGNORECASE)
+
+
+def page_scripts(site, rel, page_map):
+    """Text of the page's inline scripts and of the local scripts it loads"""
+    scripts = []
+    content = site.pages[rel]
+    for region in page_map.find('script'):
+        src = site.resolve(rel, region.attrs.get('src'))
+        if src and site.exists(src):
+            scripts.append(site.read_text(src))
+        elif not region.attrs.get('src'):
+            scripts.append(content[region.start:region.end])
+    return scripts
+
+
+def local_stylesheet(site, rel, attrs):
+    """The output path of a <link rel="stylesheet"> to a site CSS file, or None"""
+    if 'stylesheet' not in (attrs.get('rel') or '').lower().split():
+        return None
+    target = site.resolve(rel, attrs.get('href'))
+    if not target or not target.endswith('.css') or not site.exists(target):
+        return None
+    return target
+
+
+@stage('css')
+def minify_css(site):
+    """Minify stylesheets and drop the rules no element on the page can match"""
+    parsed = {}
+    for rel, content in site.pages.items():
+        page_map = scan(content, ('style', 'script'))
+        dom = css.DomIndex(content, page_scripts(site, rel, page_map))
+        before = after = 0
+        sheets = 0
+
+        # Inline <style> blocks already belong to the page: minify only
+        removals = []
+        insertions = []
+        styles = page_map.find('style')
+        for region in styles:
+            open_end = content.index('>', region.start) + 1
+            close_start = content.rindex('<', region.start, region.end)
+            text = content[open_end:close_start]
+            minified = css.minify(text)
+            before += len(text.encode('utf-8'))
+            after += len(minified.encode('utf-8'))
+            removals.append((open_end, close_start))
+            insertions.append((open_end, minified))
+        content = apply_edits(content, removals, insertions)
+
+        def replace_link(m):
+            nonlocal before, after, sheets
+            attrs = parse_attrs(m.group(1))
+            href = attrs.get('href')
+            target = local_stylesheet(site, rel, attrs)
+            if target is None:
+                return m.group(0)
+            if target not in parsed:
+                parsed[target] = css.parse(site.read_text(target))
+            data = css.serialize(css.prune(parsed[target], dom)).encode('utf-8')
+            stem = target.rsplit('/', 1)[-1][:-len('.css')]
+            out = f"{CSS_BUILD_DIR}/{stem}-{sha256(data)[:8]}.min.css"
+            site.files[out] = data
+            before += site.size(target)
+            after += len(data)
+            sheets += 1
+            return m.group(0).replace(f'"{href}"', f'"{site.url(rel, out)}"', 1)
+
+        content = _LINK.sub(replace_link, content)
+        site.pages[rel] = content
+        if before:
+            site.note(rel, f"CSS {before / 1024:.1f} KB -> {after / 1024:.1f} KB "
+                           f"({sheets} stylesheet(s), {len(styles)} inline)")
+
+
+@stage('critical-css')
+def critical_css(site):
+    """Inline the CSS the header and hero need and preload the full stylesheets"""
+    cache = critical.CriticalCache(site.root)
+    parsed = {}
+    computed = 0
+    for rel, content in site.pages.items():
+        links = []
+        for m in _LINK.finditer(content):
+            attrs = parse_attrs(m.group(1))
+            target = local_stylesheet(site, rel, attrs)
+            if target is not None:
+                links.append((m, attrs['href'], target))
+        fold = critical.above_the_fold(content)
+        if not links or not fold:
+            continue
+
+        dom = css.DomIndex(fold, safe=False)
+        texts = [site.read_text(target) for _, _, target in links]
+        key = critical.cache_key(dom, texts)
+        entry = cache.get(key)
+        if entry is None:
+            for (_, _, target), text in zip(links, texts):
+                if target not in parsed:
+                    parsed[target] = css.parse(text)
+            text, truncated = critical.critical_css([parsed[t] for _, _, t in links], dom)
+            entry = {'css': text, 'truncated': truncated}
+            cache.put(key, entry)
+            computed += 1
+
+        removals = []
+        insertions = [(links[0][0].start(), f'<style>{entry["css"]}</style>\n    ')]
+        for m, href, _ in links:
+            removals.append(m.span())
+            insertions.append((m.start(), f'<link rel="preload" href="{href}" as="style" '
+                                          f'onload="this.onload=null;this.rel=\'stylesheet\'">'
+                                          f'<noscript>{m.group(0)}</noscript>'))
+        site.pages[rel] = apply_edits(content, removals, insertions)
+
+        size = len(entry['css'].encode('utf-8'))
+        budget = ' (cut at the budget)' if entry['truncated'] else ''
+        site.note(rel, f"Critical CSS {size / 1024:.1f} KB inlined{budget}, "
+                       f"{len(links)} stylesheet(s) preloaded")
+    cache.save()
+    if cache.hits or computed:
+        site.note('critical-css', f"{computed} computed, {cache.hits} from cache")
+
+
+def _script_body(content, region):
+    return content[content.index('>', region.start) + 1:content.rindex('<', region.start, region.end)]
+
+
+@stage('pricing')
+def export_pricing(site):
+    """Copy the rate table in data/pricing.json into the price calculator scripts"""
+    if not site.exists(pricing.PRICING_PATH):
+        return
+    table = pricing.from_text(site.read_text(pricing.PRICING_PATH))
+
+    def write(rel, text):
+        site.files[rel] = text.encode('utf-8')
+
+    changed = pricing.export_scripts(table, lambda rel: site.read_text(rel) if site.exists(rel) else None, write)
+    for rel in changed:
+        site.note(rel, f"rates updated from {pricing.PRICING_PATH}")
+
+
+@stage('price-sheets')
+def publish_price_sheets(site):
+    """Publish the unit price of every option combination for the calculators to look up"""
+    if not site.exists(pricing.PRICING_PATH):
+        return
+    if pricing.np is None:
+        site.note('price-sheets', "⚠ NumPy is not installed, no price lookups published (pip install numpy)")
+        return
+    table = pricing.from_text(site.read_text(pricing.PRICING_PATH))
+    for line in table.lines.values():
+        rel = f"{pricesheets.LOOKUP_DIR}/{line.name}.json"
+        site.files[rel] = pricesheets.lookup_json(line).encode('utf-8')
+    site.note('price-sheets', f"{len(table.lines)} price lookup(s) in {pricesheets.LOOKUP_DIR}/")
+
+
+@stage('js')
+def bundle_js(site):
+    """Ship each page only the script classes it uses, minified, and share repeated inline scripts"""
+    minified = {}
+
+    def minify(text):
+        if text not in minified:
+            minified[text] = js.minify(text)
+        return minified[text]
+
+    # Inline scripts in the body of several pages move to one cacheable file
+    counts = {}
+    page_maps = {}
+    for rel, content in site.pages.items():
+        page_maps[rel] = page_map = scan(content, ('script',))
+        for region in page_map.find('script'):
+            if _shareable(region, page_map):
+                text = minify(_script_body(content, region))
+                counts[text] = counts.get(text, 0) + 1
+    shared = {}
+    for text, count in counts.items():
+        if count > 1:
+            data = text.encode('utf-8')
+            shared[text] = f"{JS_BUILD_DIR}/inline-{sha256(data)[:8]}.min.js"
+            site.files[shared[text]] = data
+
+    for rel, content in site.pages.items():
+        page_map = page_maps[rel]
+        scripts = page_map.find('script')
+        sources = {}
+        for region in scripts:
+            target = site.resolve(rel, region.attrs.get('src'))
+            if target and target.endswith('.js') and site.exists(target):
+                sources[region.start] = target
+
+        before = after = 0
+        kept_modules = total_modules = 0
+        removals = []
+        insertions = []
+        for region in scripts:
+            target = sources.get(region.start)
+            if target is not None:
+                source = site.read_text(target)
+                others = [site.read_text(t) for s, t in sources.items() if t != target]
+                others += [_script_body(content, r) for r in scripts if r.start not in sources]
+                bundle = js.bundle(source)
+                kept = bundle.shake(css.DomIndex(content, others))
+                data = minify(bundle.render(kept)).encode('utf-8')
+                stem = target.rsplit('/', 1)[-1][:-len('.js')]
+                out = f"{JS_BUILD_DIR}/{stem}-{sha256(data)[:8]}.min.js"
+                site.files[out] = data
+                m = _SCRIPT_TAG.match(content, region.start)
+                href = region.attrs['src']
+                removals.append(m.span())
+                insertions.append((region.start, m.group(0).replace(f'"{href}"', f'"{site.url(rel, out)}"', 1)))
+                before += site.size(target)
+                after += len(data)
+                kept_modules += len(kept)
+                total_modules += len(bundle.modules)
+            elif _shareable(region, page_map):
+                body = _script_body(content, region)
+                text = minify(body)
+                before += len(body.encode('utf-8'))
+                after += len(text.encode('utf-8'))
+                if text in shared:
+                    replacement = f'<script src="{site.url(rel, shared[text])}"></script>'
+                else:
+                    replacement = f'<script>{text}</script>'
+                removals.append((region.start, region.end))
+                insertions.append((region.start, replacement))
+
+        if not removals:
+            continue
+        site.pages[rel] = apply_edits(content, removals, insertions)
+        modules = f", {kept_modules} of {total_modules} modules" if total_modules else ''
+        site.note(rel, f"JS {before / 1024:.1f} KB -> {after / 1024:.1f} KB{modules}")
+
+    if shared:
+        site.note('js', f"{len(shared)} inline script(s) shared by "
+                        f"{sum(counts[t] for t in shared)} pages")
+
+
+def _shareable(region, page_map):
+    """An inline script in the page body (scripts in <head> stay inline to run early)"""
+    if region.attrs.get('src') or region.attrs.get('type', '').lower() not in JS_TYPES:
+        return False
+    return page_map.head_close is None or region.start > page_map.head_close
+
+
+# An href, src, srcset or poster attribute, or a CSS url()
+_URL = re.compile(r'''\b(href|src|srcset|poster)="([^"]*)"|url\(\s*(['"]?)([^'")]*)\3\s*\)''')
+
+
+def fingerprinted_name(rel, data):
+    """rel with a hash of data before its suffix, or rel when its name already has it"""
+    digest = sha256(data)[:8]
+    if digest in posixpath.basename(rel):
+        return rel
+    stem, suffix = posixpath.splitext(rel)
+    return f"{stem}.{digest}{suffix}"
+
+
+def rewrite_urls(content, replace):
+    """Replace every attribute and CSS url() URL in a single pass over content
+
+    replace(url) returns the new URL, or None to keep it.
+    """
+    def swap(url):
+        return replace(url) or url
+
+    def rewrite(m):
+        name, value, quote, url = m.groups()
+        if name is None:
+            return f'url({quote}{swap(url)}{quote})'
+        if name == 'srcset':
+            value = ', '.join(' '.join([swap(part.split()[0])] + part.split()[1:])
+                              for part in value.split(',') if part.strip())
+        else:
+            value = swap(value)
+        return f'{name}="{value}"'
+
+    return _URL.sub(rewrite, content)
+
+
+@stage('fingerprint')
+def fingerprint(site):
+    """Give every stylesheet, script and image a content-hashed name and point the pages at it"""
+    assets = [rel for rel in site.files
+              if rel.split('/', 1)[0] in ASSET_DIRS and rel.lower().endswith(ASSET_SUFFIXES)]
+    renamed = {}
+
+    def replacer(rel):
+        def replace(url):
+            target = site.resolve(rel, url)
+            new = renamed.get(target)
+            if new is None or new == target:
+                return None
+            rest = url[len(url.split('#', 1)[0].split('?', 1)[0]):]
+            path = '/' + new if url.startswith('/') else site.url(rel, new)
+            return path + rest
+        return replace
+
+    # Stylesheets go last: they can refer to images and fonts, so their
+    # hashes must cover the renamed URLs
+    manifest = {}
+    for rel in sorted(assets, key=lambda r: (r.endswith('.css'), r)):
+        data = site.read_bytes(rel)
+        if rel.endswith('.css'):
+            text = data.decode('utf-8')
+            rewritten = rewrite_urls(text, replacer(rel))
+            data = rewritten.encode('utf-8') if rewritten != text else data
+        out = fingerprinted_name(rel, data)
+        renamed[rel] = out
+        if out != rel:
+            if data is site.read_bytes(rel) and site.files[rel] is None:
+                site.copy(rel, out)
+            else:
+                site.files[out] = data
+        manifest[rel] = {'file': out, 'size': len(data), 'sha256': sha256(data)}
+
+    changed = 0
+    for rel, content in site.pages.items():
+        rewritten = rewrite_urls(content, replacer(rel))
+        if rewritten != content:
+            site.pages[rel] = rewritten
+            changed += 1
+
+    text = json.dumps({'version': 1, 'assets': manifest}, indent=1, sort_keys=True)
+    site.files[ASSET_MANIFEST] = (text + '\n').encode('utf-8')
+    site.note('fingerprint', f"{sum(1 for r, o in renamed.items() if o != r)} asset(s) renamed, "
+                             f"{changed} page(s) rewritten, manifest in {ASSET_MANIFEST}")
+
+
+_SW_MANIFEST = re.compile(r'^const PRECACHE_MANIFEST = \[\];$', re.MULTILINE)
+_SW_STATIC_FILES = re.compile(r'^(const STATIC_FILES = \[)(.*?)(^\];)$', re.MULTILINE | re.DOTALL)
+_SW_DEVELOPMENT = re.compile(r'^const DEVELOPMENT_MODE = true;', re.MULTILINE)
+
+
+def _output_bytes(site, rel):
+    return site.pages[rel].encode('utf-8') if rel in site.pages else site.read_bytes(rel)
+
+
+def page_files(site, page):
+    """Output files a page refers to other than pages, in document order"""
+    files = []
+    for m in _URL.finditer(site.pages[page]):
+        name, value, _, url = m.groups()
+        if name == 'srcset':
+            urls = [part.split()[0] for part in value.split(',') if part.strip()]
+        else:
+            urls = [url if name is None else value]
+        for url in urls:
+            target = site.resolve(page, url)
+            if target in site.files and target != SERVICE_WORKER:
+                files.append(target)
+    return files
+
+
+def precache_entries(site, budget=PRECACHE_BUDGET):
+    """(entries, skipped): {url, revision} for the precache, in priority order, within budget"""
+    wanted = []
+    for page in PRECACHE_PAGES:
+        if page in site.pages:
+            wanted += [page] + page_files(site, page)
+    wanted += [rel for rel in PRECACHE_FILES if site.exists(rel)]
+    for page in sorted(rel for rel in site.pages if rel.startswith('services/')):
+        wanted += [page] + page_files(site, page)
+
+    entries = []
+    skipped = []
+    seen = set()
+    size = 0
+    for rel in wanted:
+        if rel in seen:
+            continue
+        seen.add(rel)
+        data = _output_bytes(site, rel)
+        if size + len(data) > budget:
+            skipped.append(rel)
+            continue
+        size += len(data)
+        # A fingerprinted name is its own revision
+        revision = None if fingerprinted_name(rel, data) == rel else sha256(data)[:8]
+        entries.append({'url': '/' + rel, 'revision': revision})
+    return entries, skipped
+
+
+def _external_static_files(m):
+    """The hand-written STATIC_FILES list without the local files the precache covers"""
+    urls = [url for url in re.findall(r"'([^']*)'", m.group(2)) if not url.startswith('/')]
+    return m.group(1) + '\n' + ',\n'.join(f"  '{url}'" for url in urls) + '\n' + m.group(3)
+
+
+@stage('service-worker')
+def service_worker(site):
+    """Generate the service worker's precache manifest from the output tree"""
+    if SERVICE_WORKER not in site.files:
+        return
+    text = site.read_text(SERVICE_WORKER)
+    if not _SW_MANIFEST.search(text):
+        site.note(SERVICE_WORKER, "⚠ no 'const PRECACHE_MANIFEST = [];' line, left as it is")
+        return
+
+    entries, skipped = precache_entries(site)
+    manifest = '[\n' + ',\n'.join(f"  {json.dumps(e)}" for e in entries) + '\n]'
+    text = _SW_MANIFEST.sub(lambda m: f"const PRECACHE_MANIFEST = {manifest};", text)
+    text = _SW_STATIC_FILES.sub(_external_static_files, text)
+    text = _SW_DEVELOPMENT.sub('const DEVELOPMENT_MODE = false;', text)
+    site.files[SERVICE_WORKER] = text.encode('utf-8')
+
+    size = sum(len(_output_bytes(site, e['url'][1:])) for e in entries)
+    left = f", {len(skipped)} left to runtime caching" if skipped else ''
+    site.note(SERVICE_WORKER, f"{len(entries)} file(s) precached ({size / 1024:.1f} KB){left}")
+
+
+@stage('compress')
+def precompress(site):
+    """Write .gz and .br copies of the text files for servers to send as they are"""
+    store = compress.CompressStore(site.root)
+    names = compress.encodings()
+    outputs = [rel for rel in [*site.pages, *site.files] if rel.endswith(compress.SUFFIXES)]
+
+    digests = {}
+    work = {}
+    for rel in outputs:
+        data = _output_bytes(site, rel)
+        digest = sha256(data)
+        digests[rel] = (digest, len(data))
+        missing = [e for e in names if store.size(digest, e) is None]
+        if missing and digest not in work:
+            work[digest] = (digest, data, missing)
+    work = list(work.values())
+    for (digest, _, missing), results in zip(work, compress.compress_all([(d, m) for _, d, m in work])):
+        for encoding, data in zip(missing, results):
+            store.put(digest, encoding, data)
+
+    totals = {}
+    for rel in outputs:
+        digest, size = digests[rel]
+        kind = totals.setdefault(posixpath.splitext(rel)[1][1:], {'': 0})
+        kind[''] += size
+        for encoding in names:
+            compressed = store.size(digest, encoding)
+            # Not worth a copy when compression does not save anything
+            if compressed < size:
+                site.copy(store.rel(digest, encoding), f"{rel}.{encoding}")
+            kind[encoding] = kind.get(encoding, 0) + min(compressed, size)
+    store.prune()
+
+    for kind, sizes in sorted(totals.items()):
+        ratios = ', '.join(f"{e} {sizes[e] / 1024:.1f} KB ({sizes[e] / sizes[''] * 100:.0f}%)"
+                           for e in names if sizes[''])
+        site.note('compress', f"{kind}: {sizes[''] / 1024:.1f} KB -> {ratios}")
+    site.note('compress', f"{len(outputs)} file(s), {len(work)} compressed, "
+                          f"{len(outputs) - len(work)} reused")
+    if 'br' not in names:
+        site.note('compress', "⚠ brotli is not installed, only .gz files written (pip install brotli)")
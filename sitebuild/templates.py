@@ -0,0 +1,394 @@
+"""
+Compiled page templates for the service pages
+
+Service pages are rendered from templates/service.html, which includes the
+shared partials (head assets, header, footer, scripts), plus one small
+content file per service under content/services/; the list of pages and
+the mega menu come from the service catalogue (data/services.json). Each
+template is compiled to a Python code object once; the marshalled bytecode
+is cached under .sitebuild/templates/ keyed by the template's hash, so
+later runs skip compilation entirely.
+
+Template syntax:
+
+    {{ name }}  {{ service.title }}  {{ name|escape }}
+    {% include "partials/header.html" %}
+    {% if name %} ... {% else %} ... {% endif %}
+    {% for item in items %} ... {% endfor %}
+"""
+
+import hashlib
+import html
+import marshal
+import re
+import sys
+import time
+from pathlib import Path
+
+from .catalogue import CATALOGUE_PATH, CatalogueError, from_text
+from .engine import IOStats
+from .snapshots import Transaction, atomic_write
+from .tokenizer import apply_edits, scan
+
+TEMPLATE_DIR = 'templates'
+CONTENT_DIR = 'content/services'
+CACHE_DIR = '.sitebuild/templates'
+COMPILER_VERSION = 2
+
+# A {% %} tag alone on its line takes the whole line with it, so block tags
+# leave no blank lines behind in the output
+_STATEMENT = r'{%\s*((?:[^%]|%(?!}))+?)\s*%}'
+_TAG = re.compile(rf'{{{{\s*(.+?)\s*}}}}|^[ \t]*{_STATEMENT}[ \t]*(?:\n|\Z)|{_STATEMENT}',
+                  re.DOTALL | re.MULTILINE)
+_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$')
+_FILTERS = {'escape': 'html.escape'}
+
+
+class TemplateError(Exception):
+    """Raised for template syntax errors and missing templates"""
+
+
+def _lookup(ctx, dotted):
+    """Resolve a dotted name against the context (dict keys or attributes)"""
+    parts = dotted.split('.')
+    value = ctx.get(parts[0], '')
+    for part in parts[1:]:
+        value = value.get(part, '') if isinstance(value, dict) else getattr(value, part, '')
+    return value
+
+
+def _expression(expr, ctx_var, template_name):
+    name, *filters = [part.strip() for part in expr.split('|')]
+    if not _NAME.match(name):
+        raise TemplateError(f"{template_name}: bad expression {expr!r}")
+    code = f"_lookup({ctx_var}, {name!r})"
+    for f in filters:
+        if f not in _FILTERS:
+            raise TemplateError(f"{template_name}: unknown filter {f!r}")
+        code = f"{_FILTERS[f]}(str({code}))"
+    return code
+
+
+def compile_source(source, name):
+    """Translate template source into the Python source of a render() function"""
+    lines = ['def render(ctx0, loader):', '    _out = []', '    _w = _out.append']
+    indent = 1
+    depth = 0
+    stack = []
+    pos = 0
+
+    def emit(line):
+        lines.append('    ' * indent + line)
+
+    for m in _TAG.finditer(source):
+        if m.start() > pos:
+            emit(f"_w({source[pos:m.start()]!r})")
+        pos = m.end()
+        ctx_var = f"ctx{depth}"
+
+        if m.group(1) is not None:
+            emit(f"_w(str({_expression(m.group(1), ctx_var, name)}))")
+            continue
+
+        statement = m.group(2) or m.group(3)
+        words = statement.split()
+        keyword = words[0]
+        if keyword == 'include' and len(words) == 2:
+            emit(f"_w(loader.render({words[1].strip(chr(34) + chr(39))!r}, {ctx_var}))")
+        elif keyword == 'if' and len(words) == 2:
+            emit(f"if {_expression(words[1], ctx_var, name)}:")
+            stack.append('if')
+            indent += 1
+            emit('pass')
+        elif keyword == 'else' and stack and stack[-1] == 'if':
+            indent -= 1
+            emit('else:')
+            indent += 1
+            emit('pass')
+        elif keyword == 'for' and len(words) == 4 and words[2] == 'in' and _NAME.match(words[1]):
+            emit(f"for _v{depth + 1} in {_expression(words[3], ctx_var, name)}:")
+            stack.append('for')
+            indent += 1
+            depth += 1
+            emit(f"ctx{depth} = dict(ctx{depth - 1}, {words[1]}=_v{depth})")
+        elif keyword in ('endif', 'endfor') and stack and stack[-1] == keyword[3:]:
+            if stack.pop() == 'for':
+                depth -= 1
+            indent -= 1
+        else:
+            raise TemplateError(f"{name}: unexpected tag {{% {statement} %}}")
+
+    if stack:
+        raise TemplateError(f"{name}: unclosed {{% {stack[-1]} %}}")
+    if pos < len(source):
+        emit(f"_w({source[pos:]!r})")
+    emit("return ''.join(_out)")
+    return '\n'.join(lines) + '\n'
+
+
+class Template:
+    """A compiled template"""
+
+    def __init__(self, name, code):
+        self.name = name
+        namespace = {'_lookup': _lookup, 'html': html}
+        exec(code, namespace)
+        self._render = namespace['render']
+
+    def render(self, context, loader):
+        return self._render(context, loader)
+
+
+class TemplateLoader:
+    """Loads templates from templates/, compiling each at most once"""
+
+    def __init__(self, root='.', cache_dir=None):
+        self.root = Path(root)
+        self.template_dir = self.root / TEMPLATE_DIR
+        self.cache_dir = Path(cache_dir) if cache_dir else self.root / CACHE_DIR
+        self.compiled = 0
+        self.cache_hits = 0
+        self._templates = {}
+
+    def _cache_path(self, source):
+        key = f"{COMPILER_VERSION}:{sys.implementation.cache_tag}:{source}"
+        return self.cache_dir / (hashlib.sha256(key.encode('utf-8')).hexdigest()[:32] + '.marshal')
+
+    def get(self, name):
+        if name in self._templates:
+            return self._templates[name]
+
+        path = self.template_dir / name
+        if not path.exists():
+            raise TemplateError(f"Template not found: {name}")
+        source = path.read_text(encoding='utf-8')
+
+        cache_path = self._cache_path(source)
+        code = None
+        if cache_path.exists():
+            try:
+                code = marshal.loads(cache_path.read_bytes())
+                self.cache_hits += 1
+            except (EOFError, ValueError, TypeError):
+                code = None
+        if code is None:
+            code = compile(compile_source(source, name), f"<template {name}>", 'exec')
+            self.compiled += 1
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(cache_path, marshal.dumps(code))
+
+        self._templates[name] = Template(name, code)
+        return self._templates[name]
+
+    def render(self, name, context):
+        return self.get(name).render(context, self)
+
+
+def parse_content(text):
+    """Split a content file into its header fields and named sections
+
+    A content file is a block of "key: value" lines followed by sections
+    that each start with a "--- name" line:
+
+        title: Poster Printing
+        description: Premium posters in every size
+
+        --- head
+        <style>...</style>
+        --- body
+        <section>...</section>
+    """
+    fields = {}
+    lines = text.split('\n')
+    i = 0
+    while i < len(lines) and not lines[i].startswith('--- '):
+        key, sep, value = lines[i].partition(':')
+        if sep:
+            fields[key.strip()] = value.strip()
+        i += 1
+
+    section = None
+    for line in lines[i:]:
+        if line.startswith('--- '):
+            section = line[4:].strip()
+            fields[section] = []
+        elif section:
+            fields[section].append(line)
+
+    for key, value in fields.items():
+        if isinstance(value, list):
+            fields[key] = '\n'.join(value).strip('\n')
+    return fields
+
+
+def service_context(slug, fields, catalogue=None):
+    """Template context for one service page"""
+    context = {'root': '../', 'slug': slug, 'page': f'services/{slug}.html',
+               'title': '', 'description': '', 'body_class': '',
+               'head': '', 'body': '', 'scripts': '',
+               'catalogue': catalogue,
+               'service': catalogue.by_slug.get(slug, {}) if catalogue else {}}
+    context.update(fields)
+    return context
+
+
+# Head markup provided by partials/head.html, dropped when extracting content
+_HEAD_PROVIDED = [
+    r'<meta\s+charset=[^>]*>',
+    r'<meta\s+name="viewport"[^>]*>',
+    r'<meta\s+name="description"[^>]*>',
+    r'<title>.*?</title>',
+    r'<link[^>]*rel="icon"[^>]*>',
+    r'<link[^>]*href="\.\./css/style\.css"[^>]*>',
+    r'<!--\s*Main Site Styles\s*-->',
+]
+_BODY_PROVIDED = [
+    r'<!--\s*Skip to Content \(Accessibility\)\s*-->',
+    r'<a href="#main-content" class="skip-link">.*?</a>',
+    r'<!--\s*(Header|Footer|Main Site Scripts)\s*-->',
+    r'<script[^>]*src="\.\./js/script\.js"[^>]*></script>',
+]
+
+
+def _tidy(markup):
+    """Drop trailing whitespace and collapse runs of blank lines"""
+    markup = re.sub(r'[ \t]+$', '', markup, flags=re.MULTILINE)
+    return re.sub(r'\n{3,}', '\n\n', markup).strip('\n')
+
+
+def extract_service_content(content):
+    """Turn an existing service page into the text of its content file"""
+    page_map = scan(content, tags=('head', 'header', 'nav', 'footer', 'script', 'style'))
+
+    title = re.search(r'<title>(.*?)</title>', content, re.DOTALL)
+    description = re.search(r'<meta\s+name="description"\s+content="([^"]*)"', content)
+    body_tag = re.search(r'<body([^>]*)>', content)
+    body_class = re.search(r'class="([^"]*)"', body_tag.group(1)) if body_tag else None
+
+    heads = page_map.find('head')
+    head_start = heads[0].start + content[heads[0].start:].find('>') + 1 if heads else 0
+    body_end = page_map.body_close if page_map.body_close is not None else len(content)
+    if page_map.head_close is not None:
+        head_end = page_map.head_close
+        body_start = page_map.body_open_end or head_end + len('</head>')
+    else:
+        # Pages mangled by earlier scripts lose </head>; the head then runs
+        # up to the first body-level element
+        starts = [r.start for r in page_map.regions if r.tag in ('header', 'nav', 'footer')]
+        starts += [c.start for c in page_map.comments if c.start > head_start]
+        starts.append(body_tag.start() if body_tag else body_end)
+        head_end = min(starts)
+        body_start = page_map.body_open_end or head_end
+
+    head = content[head_start:head_end]
+    for pattern in _HEAD_PROVIDED:
+        head = re.sub(pattern, '', head, flags=re.DOTALL | re.IGNORECASE)
+
+    in_body = [r for r in page_map.regions if body_start <= r.start < body_end]
+    scripts = [content[r.start:r.end] for r in in_body if r.tag == 'script']
+    removals = [(r.start, r.end) for r in in_body if r.tag in ('header', 'nav', 'footer', 'script')]
+    body = apply_edits(content[:body_end], removals)[body_start:]
+    for pattern in _BODY_PROVIDED:
+        body = re.sub(pattern, '', body, flags=re.DOTALL)
+    scripts = [s for s in scripts if not re.search(r'src="\.\./js/script\.js"', s)]
+
+    fields = [
+        f"title: {' '.join(title.group(1).split()) if title else ''}",
+        f"description: {html.unescape(description.group(1)) if description else ''}",
+        f"body_class: {body_class.group(1) if body_class else ''}",
+        '',
+        '--- head', _tidy(head),
+        '--- body', _tidy(body),
+        '--- scripts', _tidy(''.join(f'    {script}\n' for script in scripts)),
+    ]
+    return '\n'.join(fields) + '\n'
+
+
+def extract_services(root='.', force=False):
+    """Write content/services/<slug>.html for every existing service page"""
+    root = Path(root)
+    target_dir = root / CONTENT_DIR
+    target_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    # Content files replaced with force are snapshotted like pages, so they can be rolled back
+    with Transaction(root, 'extract') as txn:
+        for page in sorted((root / 'services').glob('*.html')):
+            if page.name.startswith(('navbar-template', 'footer-template')):
+                continue
+            target = target_dir / page.name
+            if target.exists() and not force:
+                continue
+            txn.write(target, extract_service_content(page.read_text(encoding='utf-8')).encode('utf-8'))
+            written.append(target)
+    for target in written:
+        print(f"✅ Extracted: {target.relative_to(root)}")
+    return written
+
+
+class RenderReport:
+    """Outcome of rendering the service pages"""
+
+    def __init__(self):
+        self.pages = []
+        self.written = []
+        self.io = IOStats()
+        self.elapsed = 0.0
+        self.loader = None
+        self.run_id = None
+
+    def print_summary(self):
+        print("-" * 60)
+        print(f"Pages: {len(self.pages)} rendered, {len(self.written)} written")
+        print(f"Templates: {self.loader.compiled} compiled, {self.loader.cache_hits} from cache")
+        print(f"I/O: {self.io.summary()}")
+        if self.run_id:
+            print(f"Snapshot: {self.run_id} (undo with: python -m sitebuild rollback)")
+        per_page = self.elapsed / len(self.pages) * 1000 if self.pages else 0
+        print(f"Time: {self.elapsed * 1000:.1f} ms ({per_page:.2f} ms/page)")
+
+
+def render_services(root='.', slugs=None, verbose=True, write=True):
+    """Render services/<slug>.html for every service in data/services.json"""
+    start = time.perf_counter()
+    root = Path(root)
+    report = RenderReport()
+    report.loader = loader = TemplateLoader(root)
+    if not (root / CATALOGUE_PATH).exists():
+        raise CatalogueError(f"{CATALOGUE_PATH} not found")
+    catalogue = from_text(report.io.read_bytes(root / CATALOGUE_PATH).decode('utf-8'))
+    (root / 'services').mkdir(exist_ok=True)
+
+    unknown = set(slugs or ()) - set(catalogue.slugs)
+    if unknown:
+        raise KeyError(f"Not in {CATALOGUE_PATH}: {', '.join(sorted(unknown))}")
+
+    # Pages are replaced together once all of them rendered
+    with Transaction(root, 'render', io=report.io) as txn:
+        for slug in catalogue.slugs:
+            if slugs and slug not in slugs:
+                continue
+            path = root / CONTENT_DIR / f'{slug}.html'
+            if not path.exists():
+                print(f"⚠ No content file for {slug}: {path.relative_to(root)}")
+                continue
+            fields = parse_content(report.io.read_bytes(path).decode('utf-8'))
+            context = service_context(slug, fields, catalogue)
+            data = loader.render('service.html', context).encode('utf-8')
+            report.pages.append(slug)
+            if not write:
+                continue
+
+            target = root / 'services' / f'{slug}.html'
+            previous = report.io.read_bytes(target) if target.exists() else None
+            if previous != data:
+                txn.write(target, data, previous=previous)
+                report.written.append(slug)
+    report.run_id = txn.run_id
+
+    if verbose:
+        for slug in report.written:
+            print(f"✅ Rendered: services/{slug}.html")
+    report.elapsed = time.perf_counter() - start
+    if verbose:
+        report.print_summary()
+    return report
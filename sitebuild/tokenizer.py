@@ -0,0 +1,237 @@
+"""
+Streaming HTML region scanner
+
+Finds header, nav, footer, style and script elements (plus any other
+elements a caller asks for) in a single linear pass over the page and
+reports each one as a (start, end) span into the page text. Tags, comments
+and raw-text script/style bodies are tokenized the way html.parser does,
+but with one compiled pattern instead of a Python-level state machine.
+
+Nested elements of the same tag are matched by depth, so a
+<div class="nav..."> containing further <div>s is captured whole instead
+of being cut at the first </div> the way the old DOTALL regexes did.
+
+Spans are offsets into the decoded page text, which is what the transforms
+work on; use byte_span() for offsets into the UTF-8 bytes.
+"""
+
+import re
+from bisect import bisect_right
+from functools import lru_cache
+
+DEFAULT_TAGS = frozenset({'header', 'nav', 'footer', 'style', 'script'})
+
+
+class Region:
+    """One element or comment found in a page"""
+
+    __slots__ = ('tag', 'start', 'end', 'attrs', 'text')
+
+    def __init__(self, tag, start, end=None, attrs=None, text=None):
+        self.tag = tag
+        self.start = start
+        self.end = end
+        self.attrs = attrs or {}
+        self.text = text
+
+    @property
+    def classes(self):
+        return (self.attrs.get('class') or '').split()
+
+    def byte_span(self, html):
+        """The region's (start, end) as offsets into html.encode('utf-8')"""
+        start = len(html[:self.start].encode('utf-8'))
+        return start, start + len(html[self.start:self.end].encode('utf-8'))
+
+    def __repr__(self):
+        return f"Region({self.tag!r}, {self.start}, {self.end})"
+
+
+class PageMap:
+    """Regions, comments and insertion landmarks found by scan()"""
+
+    def __init__(self):
+        self.regions = []
+        self.comments = []
+        self.head_close = None
+        self.body_open_end = None
+        self.body_close = None
+
+    def find(self, tag):
+        return [r for r in self.regions if r.tag == tag]
+
+
+# Tag names are followed by attribute text that only steps over quoted
+# values (unrolled so each character is visited once); comments are matched
+# lazily up to the first -->. Nothing can backtrack, so the scan is linear.
+_TAG_TAIL = r'(?![a-zA-Z0-9:-])([^>"\']*(?:(?:"[^"]*"|\'[^\']*\')[^>"\']*)*)>'
+_ANY_TAG = r'[a-zA-Z][a-zA-Z0-9:-]*'
+_ATTR = re.compile(r'([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+_RAW_TEXT_END = {
+    'script': re.compile(r'</script\s*>', re.IGNORECASE),
+    'style': re.compile(r'</style\s*>', re.IGNORECASE),
+}
+
+
+@lru_cache(maxsize=None)
+def _token_pattern(names):
+    """Pattern matching comments plus start/end tags of the given names (None: all tags)"""
+    name = _ANY_TAG if names is None else '|'.join(sorted(names, key=len, reverse=True))
+    return re.compile(rf'<!--(.*?)-->|<(/?)({name})' + _TAG_TAIL, re.DOTALL | re.IGNORECASE)
+
+
+def parse_attrs(text):
+    """Attribute dict for the text between a tag name and its closing >"""
+    attrs = {}
+    for m in _ATTR.finditer(text):
+        value = m.group(2) if m.group(2) is not None else m.group(3) if m.group(3) is not None else m.group(4)
+        attrs.setdefault(m.group(1).lower(), value)
+    return attrs
+
+
+def scan(html, tags=DEFAULT_TAGS, predicate=None, predicate_tags=None):
+    """Scan html once and return a PageMap of its regions
+
+    tags lists the elements to capture; predicate(tag, attrs) can select
+    further elements, e.g. every <div> whose class mentions "nav". Passing
+    predicate_tags (the only tags the predicate can accept) lets the scan
+    skip every other tag, which is much faster on large pages.
+    """
+    tags = frozenset(tags)
+    if predicate is not None and predicate_tags is None:
+        names = None
+    else:
+        names = tags | frozenset(predicate_tags or ()) | {'head', 'body'} | set(_RAW_TEXT_END)
+        names = frozenset(re.escape(name) for name in names)
+    search = _token_pattern(names).search
+
+    page = PageMap()
+    open_regions = {}
+    depths = {}
+    pos = 0
+
+    while True:
+        m = search(html, pos)
+        if m is None:
+            break
+        pos = m.end()
+
+        if m.group(1) is not None:
+            page.comments.append(Region('!--', m.start(), pos, text=m.group(1)))
+            continue
+
+        tag = m.group(3).lower()
+        rest = m.group(4)
+
+        if m.group(2):
+            if tag == 'head' and page.head_close is None:
+                page.head_close = m.start()
+            elif tag == 'body':
+                page.body_close = m.start()
+            _close(tag, pos, depths, open_regions)
+            continue
+
+        if rest.endswith('/'):
+            continue
+        if tag == 'body' and page.body_open_end is None:
+            page.body_open_end = pos
+
+        depth = depths.get(tag, 0) + 1
+        depths[tag] = depth
+        attrs = None
+        if tag in tags:
+            attrs = parse_attrs(rest)
+        elif predicate is not None and (predicate_tags is None or tag in predicate_tags):
+            attrs = parse_attrs(rest)
+            if not predicate(tag, attrs):
+                attrs = None
+        if attrs is not None:
+            region = Region(tag, m.start(), attrs=attrs)
+            page.regions.append(region)
+            open_regions.setdefault(tag, []).append((depth, region))
+
+        # Script and style bodies are raw text; jump straight to their end tag
+        raw_end = _RAW_TEXT_END.get(tag)
+        if raw_end is not None:
+            end = raw_end.search(html, pos)
+            if end is None:
+                break
+            pos = end.end()
+            _close(tag, pos, depths, open_regions)
+
+    # Unclosed elements run to the end of the page
+    for stack in open_regions.values():
+        for _, region in stack:
+            region.end = len(html)
+    return page
+
+
+def _close(tag, end, depths, open_regions):
+    """Match an end tag against the innermost open element of the same name"""
+    depth = depths.get(tag, 0)
+    if depth == 0:
+        return
+    depths[tag] = depth - 1
+    stack = open_regions.get(tag)
+    if stack and stack[-1][0] == depth:
+        stack.pop()[1].end = end
+
+
+def comment_pairs(comments, keyword):
+    """Spans running from one comment mentioning keyword to the next one"""
+    matching = [c for c in comments if keyword.lower() in c.text.lower()]
+    return [(a.start, b.end) for a, b in zip(matching[::2], matching[1::2])]
+
+
+def comment_to_next(page, pattern, tag):
+    """Spans from each comment matching pattern to the end of the next tag element"""
+    regex = re.compile(pattern, re.IGNORECASE)
+    starts = [r.start for r in page.regions]
+    spans = []
+    for comment in page.comments:
+        if not regex.search(comment.text):
+            continue
+        i = bisect_right(starts, comment.start)
+        following = next((r for r in page.regions[i:] if r.tag == tag), None)
+        if following is not None:
+            spans.append((comment.start, following.end))
+    return spans
+
+
+def apply_edits(html, removals, insertions=()):
+    """Remove the given spans and insert text at offsets, in one pass
+
+    Overlapping or nested removal spans are merged. insertions is a list of
+    (offset, text) pairs; text inserted inside a removed span is kept and
+    placed where the span was.
+    """
+    merged = []
+    for start, end in sorted(removals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    inserts = sorted(insertions, key=lambda item: item[0])
+    out = []
+    pos = 0
+    k = 0
+    for start, end in merged:
+        while k < len(inserts) and inserts[k][0] <= start:
+            offset, text = inserts[k]
+            out.append(html[pos:offset])
+            out.append(text)
+            pos = offset
+            k += 1
+        out.append(html[pos:start])
+        while k < len(inserts) and inserts[k][0] <= end:
+            out.append(inserts[k][1])
+            k += 1
+        pos = end
+
+    for offset, text in inserts[k:]:
+        out.append(html[pos:offset])
+        out.append(text)
+        pos = offset
+    out.append(html[pos:])
+    return ''.join(out)
@@ -0,0 +1,378 @@
+"""
+Registered page transforms
+
+Each transform is the in-memory equivalent of one of the old rewrite
+scripts: it takes the current page content and returns the new content.
+The engine decides which pages a transform sees and handles all file I/O.
+"""
+
+import posixpath
+import re
+
+from .catalogue import ROOT_NAV_LINKS, SERVICE_NAV_LINKS, from_text, rewrite_links
+from .images import variant_index
+from .tokenizer import apply_edits, comment_pairs, comment_to_next, parse_attrs, scan
+
+TRANSFORMS = {}
+
+# Markup inserted by fix_theme_flash.py
+THEME_FLASH_SCRIPT = '''
+
+    <!-- Prevent theme flash on page load -->
+    <script>
+        // This runs immediately to prevent theme flash
+        (function() {
+            const savedTheme = localStorage.getItem('theme-preference');
+            if (savedTheme) {
+                document.documentElement.setAttribute('data-theme', savedTheme);
+            } else {
+                // Check system preference
+                const systemPrefersDark = window.matchMedia('(prefers-color-scheme: dark)').matches;
+                document.documentElement.setAttribute('data-theme', systemPrefersDark ? 'dark' : 'light');
+            }
+        })();
+    </script>'''
+
+
+class Transform:
+    """A named page rewrite with its scope and fragment dependencies"""
+
+    def __init__(self, name, func, version, applies_to, fragments, script, default):
+        self.name = name
+        self.func = func
+        self.version = version
+        self.applies_to = applies_to
+        self.fragments = tuple(fragments)
+        self.script = script
+        self.default = default
+        self.description = (func.__doc__ or '').strip()
+
+    def __call__(self, content, page, ctx):
+        return self.func(content, page, ctx)
+
+
+def service_pages(page):
+    """Scope: every page under services/"""
+    return page.is_service
+
+
+def all_pages(page):
+    """Scope: root pages and service pages"""
+    return True
+
+
+def all_but_index(page):
+    """Scope: every page except index.html, which the fragments come from"""
+    return page.rel != 'index.html'
+
+
+def transform(name, version=1, applies_to=service_pages, fragments=(), script=None, default=True):
+    """Register a page transform under the given name
+
+    Transforms registered with default=False only run when named explicitly.
+    """
+    def register(func):
+        TRANSFORMS[name] = Transform(name, func, version, applies_to, fragments, script, default)
+        return func
+    return register
+
+
+def resolve_transforms(names=None):
+    """Return Transform objects for the given names, in registry order"""
+    if not names:
+        return [t for t in TRANSFORMS.values() if t.default]
+
+    unknown = [name for name in names if name not in TRANSFORMS]
+    if unknown:
+        raise KeyError(f"Unknown transform(s): {', '.join(unknown)}")
+
+    return [t for name, t in TRANSFORMS.items() if name in names]
+
+
+def _replace_footer(content, footer_template, footer_patterns):
+    """Replace the first matching footer pattern, or append the footer"""
+    for pattern in footer_patterns:
+        if re.search(pattern, content, re.DOTALL | re.IGNORECASE):
+            return re.sub(pattern, lambda m: footer_template, content,
+                          flags=re.DOTALL | re.IGNORECASE)
+
+    if '</body>' in content:
+        return content.replace('</body>', f'{footer_template}\n\n</body>')
+    return content + f'\n\n{footer_template}'
+
+
+@transform('navbar', fragments=['index-navbar'], script='update_navbar.py')
+def navbar(content, page, ctx):
+    """Replace the service page header with the navbar from index.html"""
+    navbar_html = ctx.get('index-navbar')
+
+    content = re.sub(r'<header.*?</header>', '', content, flags=re.DOTALL)
+    content = re.sub(r'<div class="contact-bar">.*?</div>\s*</div>\s*</div>', '', content, flags=re.DOTALL)
+    content = re.sub(r'<nav.*?</nav>', '', content, flags=re.DOTALL)
+
+    # Drop the skip link from a previous run so it is not inserted twice
+    content = re.sub(r'\n    <!-- Skip to Content \(Accessibility\) -->\n'
+                     r'    <a href="#main-content" class="skip-link">Skip to main content</a>\n', '', content)
+
+    body_match = re.search(r'(<body[^>]*>)', content)
+    if not body_match:
+        ctx.warn(page, "Could not find body tag")
+        return content
+
+    # The blank lines left where the old header was are dropped, so a
+    # second run gives the same page
+    body_end = body_match.end()
+    return (
+        content[:body_end] +
+        '\n    <!-- Skip to Content (Accessibility) -->\n' +
+        '    <a href="#main-content" class="skip-link">Skip to main content</a>\n\n' +
+        navbar_html + '\n\n    ' +
+        content[body_end:].lstrip()
+    )
+
+
+@transform('service-footer', fragments=['footer-template'], script='update_service_footers.py')
+def service_footer(content, page, ctx):
+    """Replace the service page footer with services/footer-template.html"""
+    content = _replace_footer(content, ctx.get('footer-template'), [
+        r'<footer class="bg-gray-900 text-white py-16">.*?</footer>',
+        r'<footer class="bg-gradient-to-br.*?</footer>',
+        r'<footer class="main-footer">.*?</footer>',
+        r'<footer class="bg-dark text-white py-16">.*?</footer>',
+        r'<footer[^>]*>.*?</footer>',
+    ])
+
+    # Ensure proper CSS link is present
+    if '../css/style.css' not in content and 'css/style.css' not in content:
+        css_link = '\n    <link rel="stylesheet" href="../css/style.css">'
+        content = re.sub(r'(<head[^>]*>)', lambda m: m.group(1) + css_link, content, flags=re.IGNORECASE)
+
+    return content
+
+
+@transform('slim-footer', fragments=['footer-template-slim'], script='update_slim_footer.py')
+def slim_footer(content, page, ctx):
+    """Replace the service page footer with services/footer-template-slim.html"""
+    return _replace_footer(content, ctx.get('footer-template-slim'), [
+        r'<!-- Enhanced Footer Section -->.*?</footer>',
+        r'<!-- Slim Footer Section -->.*?</footer>',
+        r'<footer class="footer"[^>]*>.*?</footer>',
+        r'<footer[^>]*>.*?</footer>',
+    ])
+
+
+@transform('service-links', script='fix_service_links.py')
+def service_links(content, page, ctx):
+    """Make service page links relative to the services/ directory"""
+    content = content.replace('href="services/', 'href="')
+    content = content.replace('href="#home"', 'href="../index.html#home"')
+    content = content.replace('href="#services"', 'href="../index.html#services"')
+    content = content.replace('href="#products"', 'href="../index.html#products"')
+    content = content.replace('href="#about"', 'href="../index.html#about"')
+    content = content.replace('href="#blog"', 'href="../index.html#blog"')
+    content = content.replace('href="contact.html"', 'href="../contact.html"')
+    content = content.replace('href="#"', 'href="../index.html"')
+    return content
+
+
+def _contact_link_pages(page):
+    """Scope used by update_contact_links.py"""
+    return page.is_service or page.rel in ('index.html', 'categories.html', 'test_navigation.html')
+
+
+@transform('contact-links', applies_to=_contact_link_pages, script='update_contact_links.py')
+def contact_links(content, page, ctx):
+    """Point #contact links at contact.html"""
+    content = content.replace('href="../index.html#contact"', 'href="../contact.html"')
+    content = content.replace('href="index.html#contact"', 'href="contact.html"')
+    content = content.replace('href="#contact"', 'href="contact.html"')
+    return content
+
+
+@transform('navbar-assets', script='add_navbar_assets.py')
+def navbar_assets(content, page, ctx):
+    """Add the main site CSS and JS used by the navbar"""
+    if '../css/style.css' in content:
+        return content
+
+    if not re.search(r'</head>', content) or not re.search(r'</body>', content):
+        ctx.warn(page, "Could not find </head> or </body>")
+        return content
+
+    css_link = '''    <!-- Main Site Styles -->
+    <link rel="stylesheet" href="../css/style.css">'''
+    js_script = '''    <!-- Main Site Scripts -->
+    <script defer src="../js/script.js"></script>'''
+
+    content = content.replace('</head>', f'{css_link}\n</head>')
+    content = content.replace('</body>', f'{js_script}\n</body>')
+    return content
+
+
+@transform('theme-flash', applies_to=all_pages, script='fix_theme_flash.py')
+def theme_flash(content, page, ctx):
+    """Insert the inline script that prevents a theme flash on load"""
+    if 'Prevent theme flash on page load' in content:
+        return content
+
+    content = re.sub(r'<html([^>]*)\s+data-theme="light"([^>]*)>', r'<html\1\2>', content)
+
+    match = re.search(r'(<link[^>]*href="[^"]*css/style\.css"[^>]*>)', content)
+    if not match:
+        match = re.search(r'(<link[^>]*rel="stylesheet"[^>]*>(?!.*<link[^>]*rel="stylesheet"))',
+                          content, re.DOTALL)
+    if not match:
+        ctx.warn(page, "Could not find insertion point for the theme script")
+        return content
+
+    insert_position = match.end()
+    return content[:insert_position] + THEME_FLASH_SCRIPT + content[insert_position:]
+
+
+# An <img>, or a <picture> wrapper written by a previous responsive-images run
+_IMAGE = re.compile(r'<picture>\s*(?:<source\b[^>]*>\s*)*(<img\b[^>]*>)\s*</picture>'
+                    r'|<img\b(?:[^>"\']|"[^"]*"|\'[^\']*\')*>', re.IGNORECASE)
+_GENERATED_ATTR = re.compile(r'\s+(?:srcset|sizes)="[^"]*"')
+_MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+
+def _display_width(attrs):
+    """The width attribute as a number of pixels, if it has one"""
+    match = re.match(r'\s*(\d+)(px)?\s*$', attrs.get('width') or '')
+    return int(match.group(1)) if match else None
+
+
+def _add_attrs(tag, attrs):
+    """Append attributes to a start tag, keeping its original formatting"""
+    text = ''.join(f' {name}="{value}"' for name, value in attrs)
+    end = len(tag) - 2 if tag.endswith('/>') else len(tag) - 1
+    return tag[:end].rstrip() + text + tag[end:]
+
+
+@transform('responsive-images', applies_to=all_pages, fragments=['image-variants'])
+def responsive_images(content, page, ctx):
+    """Add srcset/sizes and width/height from the image variants, and lazy loading"""
+    index = variant_index(ctx.get('image-variants'))
+    base = posixpath.dirname(page.rel) or '.'
+    headers = [(r.start, r.end) for r in scan(content, tags=('header',)).find('header')]
+    hero_seen = False
+    counted = set()
+    totals = [0, 0]
+
+    def rewrite(m):
+        nonlocal hero_seen
+        tag = m.group(1) or m.group(0)
+        attrs = parse_attrs(tag[4:-1])
+        src = attrs.get('src') or ''
+        rel = None if re.match(r'[a-z]+:|//', src) else posixpath.normpath(posixpath.join(base, src))
+        entry = index.get(rel) if rel else None
+        in_header = any(start <= m.start() < end for start, end in headers)
+
+        extra = []
+        width = _display_width(attrs)
+        # A width that is not in pixels (width="100%") is left as it is, without a height
+        if entry and 'height' not in attrs and (width is not None or 'width' not in attrs):
+            natural_width, natural_height = entry['size']
+            if width is None:
+                extra.append(('width', natural_width))
+            extra.append(('height', round((width or natural_width) * natural_height / natural_width)))
+        if not in_header:
+            # The first image after the header is the hero; the rest can wait
+            if 'loading' not in attrs and 'fetchpriority' not in attrs:
+                extra.append(('loading', 'lazy') if hero_seen else ('fetchpriority', 'high'))
+            hero_seen = True
+
+        if not entry:
+            img = _add_attrs(tag, extra) if extra else tag
+            return m.group(0).replace(tag, img) if m.group(1) else img
+
+        sizes = f'(max-width: {width}px) 100vw, {width}px' if width else '100vw'
+        formats = index.formats(rel)
+        srcset = [('srcset', index.srcset(rel, formats[-1], base)), ('sizes', sizes)]
+        img = _add_attrs(_GENERATED_ATTR.sub('', tag), srcset + extra)
+
+        # An image shown several times is only downloaded once
+        if rel not in counted:
+            counted.add(rel)
+            totals[0] += entry['bytes']
+            totals[1] += index.estimated_bytes(rel, width or entry['size'][0])
+        if len(formats) == 1:
+            return img
+        sources = ''.join(f'<source type="{_MIME_TYPES[fmt]}" srcset="{index.srcset(rel, fmt, base)}" '
+                          f'sizes="{sizes}">' for fmt in formats[:-1])
+        return f'<picture>{sources}{img}</picture>'
+
+    content = _IMAGE.sub(rewrite, content)
+    before, after = totals
+    if counted:
+        ctx.note(page, f"{len(counted)} responsive image(s), ~{(before - after) / 1024:.0f} KB saved "
+                       f"({before / 1024:.0f} KB -> {after / 1024:.0f} KB)")
+    return content
+
+
+def _rebuild_page(content, page_map, removals, header, footer, styles, scripts):
+    """Remove the given spans and insert the shared sections in one pass
+
+    The header goes right after <body>, the footer and then the scripts
+    right before </body>, and the styles right before </head>.
+    """
+    insertions = []
+    if page_map.head_close is not None:
+        insertions.append((page_map.head_close, '\n    ' + styles + '\n    '))
+    if page_map.body_open_end is not None:
+        insertions.append((page_map.body_open_end, '\n    ' + header + '\n    '))
+    if page_map.body_close is not None:
+        insertions.append((page_map.body_close, '\n    ' + footer + '\n    '))
+        insertions.append((page_map.body_close, '\n    ' + scripts + '\n    '))
+    return apply_edits(content, removals, insertions)
+
+
+def _update_navigation_links(content, page, ctx):
+    """Make the navigation links copied from index.html relative to the page"""
+    catalogue = from_text(ctx.get('service-catalogue'))
+    return rewrite_links(content, catalogue.link_table(page.is_service))
+
+
+@transform('navbar-footer', version=2, applies_to=all_but_index, default=False,
+           fragments=['index-header', 'index-footer', 'index-navbar-styles', 'index-navbar-script'],
+           script='update_all_pages_navbar_footer.py')
+def navbar_footer(content, page, ctx):
+    """Copy the header, footer, navbar styles and navbar script from index.html"""
+    page_map = scan(content)
+    removals = [(r.start, r.end) for r in page_map.regions if r.tag in ('header', 'nav', 'footer')]
+    removals += comment_pairs(page_map.comments, 'navigation')
+    removals += comment_pairs(page_map.comments, 'footer')
+    removals += comment_to_next(page_map, r'navbar.*styles|hero.*section.*styles', 'style')
+    removals += comment_to_next(page_map, r'navbar.*javascript', 'script')
+
+    content = _rebuild_page(content, page_map, removals,
+                            ctx.get('index-header'), ctx.get('index-footer'),
+                            ctx.get('index-navbar-styles'), ctx.get('index-navbar-script'))
+
+    # Only the basic navigation links; the mega menu keeps its services/ prefix
+    return rewrite_links(content, SERVICE_NAV_LINKS if page.is_service else ROOT_NAV_LINKS)
+
+
+NAV_CONTAINER_TAGS = ('div', 'ul')
+
+
+def _is_nav_container(tag, attrs):
+    """A <div> or <ul> whose class mentions "nav" (navbar-menu, nav-links, ...)"""
+    return tag in NAV_CONTAINER_TAGS and 'nav' in (attrs.get('class') or '')
+
+
+@transform('navbar-footer-complete', version=2, applies_to=all_but_index, default=False,
+           fragments=['index-header', 'index-footer', 'index-styles', 'index-script',
+                      'service-catalogue'],
+           script='update_navbar_footer_correctly.py')
+def navbar_footer_complete(content, page, ctx):
+    """Replace all navigation, footers, styles and scripts with those of index.html"""
+    page_map = scan(content, predicate=_is_nav_container, predicate_tags=NAV_CONTAINER_TAGS)
+    removals = [(r.start, r.end) for r in page_map.regions]
+    removals += comment_pairs(page_map.comments, 'navigation')
+    removals += comment_pairs(page_map.comments, 'footer')
+
+    content = _rebuild_page(content, page_map, removals,
+                            ctx.get('index-header'), ctx.get('index-footer'),
+                            ctx.get('index-styles'), ctx.get('index-script'))
+    return _update_navigation_links(content, page, ctx)
@@ -17,6 +17,14 @@ const STATIC_FILES = [
   'https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap'
 ];
 
+// Install-time precache, generated from the output tree by
+// "python -m sitebuild build": [{ url, revision }], where revision is null
+// for files whose name already carries their content hash. Entries whose
+// revision is unchanged stay cached across service worker updates.
+const PRECACHE = 'shristipress-precache';
+const PRECACHE_MANIFEST = [];
+const PRECACHE_KEYS = new Map(PRECACHE_MANIFEST.map((entry) => [entry.url, precacheKey(entry)]));
+
 // Files to cache on demand
 const CACHE_STRATEGIES = {
   images: 'cache-first',
@@ -34,6 +42,7 @@ self.addEventListener('install', (event) => {
         console.log('Service Worker: Caching static files');
         return cache.addAll(STATIC_FILES);
       })
+      .then(() => precache())
       .then(() => {
         console.log('Service Worker: Installation complete');
         return self.skipWaiting();
@@ -52,13 +61,13 @@ self.addEventListener('activate', (event) => {
     caches.keys().then((cacheNames) => {
       return Promise.all(
         cacheNames.map((cacheName) => {
-          if (cacheName !== STATIC_CACHE && cacheName !== DYNAMIC_CACHE) {
+          if (cacheName !== STATIC_CACHE && cacheName !== DYNAMIC_CACHE && cacheName !== PRECACHE) {
             console.log('Service Worker: Deleting old cache', cacheName);
             return caches.delete(cacheName);
           }
         })
       );
-    }).then(() => {
+    }).then(() => cleanupPrecache()).then(() => {
       console.log('Service Worker: Activation complete');
       return self.clients.claim();
     })
@@ -93,6 +102,11 @@ self.addEventListener('fetch', (event) => {
 async function handleFetchRequest(request) {
   const url = new URL(request.url);
 
+  const precached = await matchPrecache(url);
+  if (precached) {
+    return precached;
+  }
+
   // Handle different types of requests
   if (isImageRequest(request)) {
     return handleImageRequest(request);
@@ -321,7 +335,7 @@ self.addEventListener('message', (event) => {
 
 // ===== CACHE MANAGEMENT =====
 async function cleanupCaches() {
-  const cacheWhitelist = [STATIC_CACHE, DYNAMIC_CACHE];
+  const cacheWhitelist = [STATIC_CACHE, DYNAMIC_CACHE, PRECACHE];
   const cacheNames = await caches.keys();
 
   return Promise.all(
@@ -333,6 +347,52 @@ async function cleanupCaches() {
   );
 }
 
+// ===== PRECACHE =====
+function precacheKey(entry) {
+  return entry.revision ? `${entry.url}?__revision=${entry.revision}` : entry.url;
+}
+
+async function precache() {
+  const cache = await caches.open(PRECACHE);
+  await Promise.all(PRECACHE_MANIFEST.map(async (entry) => {
+    const key = precacheKey(entry);
+    // Unchanged since the previous service worker: nothing to download
+    if (await cache.match(key)) {
+      return;
+    }
+    const response = await fetch(entry.url, { cache: 'reload' });
+    if (!response.ok) {
+      throw new Error(`Precache of ${entry.url} failed: ${response.status}`);
+    }
+    await cache.put(key, response);
+  }));
+}
+
+async function cleanupPrecache() {
+  const cache = await caches.open(PRECACHE);
+  const current = new Set([...PRECACHE_KEYS.values()].map((key) => new URL(key, self.location).href));
+  const requests = await cache.keys();
+
+  return Promise.all(
+    requests
+      .filter((request) => !current.has(request.url))
+      .map((request) => cache.delete(request))
+  );
+}
+
+async function matchPrecache(url) {
+  if (url.origin !== self.location.origin) {
+    return null;
+  }
+  const path = url.pathname.endsWith('/') ? `${url.pathname}index.html` : url.pathname;
+  const key = PRECACHE_KEYS.get(path);
+  if (!key) {
+    return null;
+  }
+  const cache = await caches.open(PRECACHE);
+  return cache.match(key);
+}
+
 // ===== HELPER FUNCTIONS FOR DATA PERSISTENCE =====
 async function getStoredSignups() {
   // This would typically use IndexedDB
@@ -0,0 +1,63 @@
+"""Rewrite engine and the navbar/footer scripts that run through it"""
+
+import runpy
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+from sitebuild import refresh
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS = {
+    'update_all_pages_navbar_footer.py': 'navbar-footer',
+    'update_navbar_footer_correctly.py': 'navbar-footer-complete',
+}
+
+
+def copy_site(target):
+    """The pages and data of the repository, copied to target"""
+    target.mkdir()
+    for path in ROOT.glob('*.html'):
+        shutil.copy(path, target)
+    shutil.copytree(ROOT / 'services', target / 'services')
+    shutil.copytree(ROOT / 'data', target / 'data')
+    return target
+
+
+def pages(site):
+    return {path.relative_to(site).as_posix(): path.read_bytes() for path in sorted(site.rglob('*.html'))}
+
+
+def run_script(monkeypatch, site, script, *args):
+    monkeypatch.chdir(site)
+    monkeypatch.setattr(sys, 'argv', [script, *args])
+    runpy.run_path(str(ROOT / script), run_name='__main__')
+
+
+@pytest.mark.parametrize('script', sorted(SCRIPTS))
+def test_jobs_do_not_change_the_output(tmp_path, monkeypatch, script):
+    serial = copy_site(tmp_path / 'serial')
+    pooled = copy_site(tmp_path / 'pooled')
+    original = pages(serial)
+    run_script(monkeypatch, serial, script)
+    run_script(monkeypatch, pooled, script, '--jobs', '2')
+    assert pages(serial) == pages(pooled)
+    assert pages(serial) != original
+
+
+@pytest.mark.parametrize('script', sorted(SCRIPTS))
+def test_dry_run_previews_the_bytes_that_are_written(tmp_path, monkeypatch, script):
+    site = copy_site(tmp_path / 'site')
+    original = pages(site)
+    preview = refresh(site, [SCRIPTS[script]], verbose=False, dry_run=True)
+    assert pages(site) == original
+    run_script(monkeypatch, site, script, '--dry-run')
+    assert pages(site) == original
+
+    run_script(monkeypatch, site, script)
+    written = pages(site)
+    assert sorted(d.rel for d in preview.diffs) == sorted(rel for rel in written if written[rel] != original[rel])
+    for page in preview.pages:
+        assert page.encoded() == written[page.rel]
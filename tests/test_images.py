@@ -0,0 +1,24 @@
+"""Image cache: entries and variants of images that are gone are removed"""
+
+from sitebuild.images import ImageCache, variant_path
+
+
+def entry(outputs):
+    return {'key': 'k', 'hash': 'h', 'stat': None, 'bytes': 1, 'size': [960, 480],
+            'outputs': [[out, 480, 'webp', 1] for out in outputs]}
+
+
+def test_prune_deletes_the_variants_of_removed_images(tmp_path):
+    kept = variant_path('assets/images/kept.jpg', 480, 'webp')
+    gone = variant_path('assets/images/book-types/gone.jpg', 480, 'webp')
+    for out in (kept, gone):
+        (tmp_path / out).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / out).write_bytes(b'x')
+    cache = ImageCache(tmp_path)
+    cache.data = {'assets/images/kept.jpg': entry([kept]),
+                  'assets/images/book-types/gone.jpg': entry([gone, 'assets/images/optimized/missing.webp'])}
+
+    assert cache.prune(['assets/images/kept.jpg']) == ['assets/images/book-types/gone.jpg']
+    assert list(cache.data) == ['assets/images/kept.jpg']
+    assert (tmp_path / kept).exists()
+    assert not (tmp_path / gone).exists()
@@ -0,0 +1,116 @@
+"""Intake server: quote validation and the HTTP responses to bad requests"""
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from sitebuild import intake, pricing
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope='module')
+def table():
+    return pricing.load(ROOT)
+
+
+def test_validate_quote_reprices_the_configuration(table):
+    payload = {'line': 'childrens-book', 'quantity': 250, 'pages': 24, 'total': 1,
+               'options': {'type': 'hardcover', 'size': '8.5x11'}, 'email': 'a@example.com'}
+    row = intake.validate_quote(table, payload)
+    expected = table.line('childrens-book').quote(250, 24, type='hardcover', size='8.5x11')
+    assert row[0] == 'childrens-book'
+    assert json.loads(row[1])['cover'] == 'digital'
+    assert row[4] == pytest.approx(expected['unit'])
+    assert row[5] == pytest.approx(expected['total'])
+
+
+@pytest.mark.parametrize('payload', [
+    {'line': ['print']},
+    {'line': 'stickers'},
+    {'options': ['product']},
+    {'options': {'product': 3}},
+    {'options': {'product': 'mugs'}},
+    {'options': {'pages': '24'}},
+    {'options': {'quantity': '5'}},
+    {'options': {'ink': 'x'}},
+    {'quantity': True},
+    {'quantity': 'lots'},
+    {'quantity': 2.5},
+    {'quantity': 0},
+    {'quantity': intake.MAX_QUANTITY + 1},
+    {'line': 'childrens-book', 'pages': True},
+    {'line': 'childrens-book', 'pages': -4},
+    {'email': 'not an email'},
+    {'name': 'x' * 10000},
+])
+def test_validate_quote_rejects(table, payload):
+    with pytest.raises(intake.Invalid):
+        intake.validate_quote(table, payload)
+
+
+@pytest.mark.parametrize('payload', [
+    {'topic': 'contact', 'email': 'a@example.com'},
+    {'email': 'a@example.com', 'message': ['hi']},
+    {'topic': 'newsletter'},
+])
+def test_validate_contact_rejects(payload):
+    with pytest.raises(intake.Invalid):
+        intake.validate_contact(payload)
+
+
+def exchange(tmp_path, requests, patch=None):
+    """[(status, body)] for raw requests sent to a server, one connection each"""
+    async def run():
+        server = intake.IntakeServer(ROOT, db=tmp_path / 'intake.sqlite3')
+        if patch:
+            patch(server)
+        port = await server.start('127.0.0.1', 0)
+        results = []
+        try:
+            for request in requests:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(request)
+                status, body = await asyncio.wait_for(intake.read_response(reader), 10)
+                writer.close()
+                results.append((status, json.loads(body) if body else None))
+        finally:
+            await server.close()
+        return results
+    return asyncio.run(run())
+
+
+def post(path, body):
+    data = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+    return (f"POST {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(data)}\r\n"
+            f"Connection: close\r\n\r\n").encode('latin-1') + data
+
+
+def test_every_request_gets_a_response(tmp_path):
+    results = exchange(tmp_path, [
+        post('/api/quotes', {'quantity': 100}),
+        post('/api/quotes', {'options': {'pages': '4'}}),
+        post('/api/quotes', {'line': ['x']}),
+        post('/api/quotes', b'{"quantity": '),
+        post('/api/quotes', [1, 2]),
+        post('/api/nowhere', {}),
+        b"GET /api/quotes HTTP/1.1\r\nConnection: close\r\n\r\n",
+        b"POST /api/quotes HTTP/1.1\r\nContent-Length: -3\r\n\r\n",
+        b"NONSENSE\r\n\r\n",
+    ])
+    assert [status for status, _ in results] == [201, 422, 422, 400, 422, 404, 405, 400, 400]
+    assert results[0][1]['total'] == pytest.approx(15.0)
+
+
+def test_unexpected_errors_answer_500(tmp_path):
+    async def broken(*args):
+        raise RuntimeError("bug")
+
+    def patch(server):
+        server.dispatch = broken
+
+    [(status, body)] = exchange(tmp_path, [post('/api/quotes', {})], patch)
+    assert status == 500
+    assert body['ok'] is False
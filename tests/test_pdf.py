@@ -0,0 +1,94 @@
+"""PDF reader and preflight: damaged files are reported, never raised"""
+
+import time
+
+import pytest
+
+from sitebuild import preflight
+from sitebuild.pdf import PdfDocument, PdfError
+
+CATALOG = '<< /Type /Catalog /Pages 2 0 R >>'
+PAGES = '<< /Type /Pages /Kids [3 0 R] /Count 1 >>'
+PAGE = '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 441 666] /Resources << /Font << /F1 4 0 R >> >> >>'
+
+
+def build(objects, trailer='<< /Size {size} /Root 1 0 R >>'):
+    """A PDF with a classic xref table from {num: body} objects"""
+    out = bytearray(b'%PDF-1.7\n')
+    offsets = {}
+    for num, body in objects.items():
+        offsets[num] = len(out)
+        out += f'{num} 0 obj\n{body}\nendobj\n'.encode('latin-1')
+    size = max(objects) + 1
+    xref = len(out)
+    out += f'xref\n0 {size}\n0000000000 65535 f \n'.encode('latin-1')
+    for num in range(1, size):
+        out += (f'{offsets[num]:010d} 00000 n \n' if num in offsets else '0000000000 65535 f \n').encode('latin-1')
+    out += f'trailer\n{trailer.format(size=size)}\nstartxref\n{xref}\n%%EOF\n'.encode('latin-1')
+    return bytes(out)
+
+
+DAMAGED = {
+    'trailer-not-a-dict': build({1: CATALOG, 2: PAGES, 3: PAGE}, trailer='7'),
+    'root-not-a-dict': build({1: '5'}),
+    'kids-not-a-list': build({1: CATALOG, 2: '<< /Type /Pages /Kids 7 /Count 1 >>'}),
+    'mediabox-not-a-list': build({1: CATALOG, 2: PAGES, 3: '<< /Type /Page /MediaBox (x) /Resources 9 >>'}),
+    'descendants-not-a-list': build({1: CATALOG, 2: PAGES, 3: PAGE,
+                                     4: '<< /Type /Font /Subtype /Type0 /DescendantFonts << /A 1 >> >>'}),
+    'truncated': build({1: CATALOG, 2: PAGES, 3: PAGE})[:60],
+    'not-a-pdf': b'GIF89a' + b'\0' * 100,
+}
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / f'{name}.pdf'
+    path.write_bytes(data)
+    return path
+
+
+def test_reads_a_valid_document(tmp_path):
+    path = write(tmp_path, 'ok', build({1: CATALOG, 2: PAGES, 3: PAGE,
+                                        4: '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'}))
+    doc = PdfDocument(path)
+    try:
+        assert doc.page_count() == 1
+        [page] = list(doc.pages())
+        assert page['MediaBox'] == [0, 0, 441, 666]
+    finally:
+        doc.close()
+
+
+@pytest.mark.parametrize('data', [b'', b'GIF89a', DAMAGED['trailer-not-a-dict']],
+                         ids=['empty', 'no-header', 'trailer-not-a-dict'])
+def test_unreadable_files_raise_pdf_error(tmp_path, data):
+    with pytest.raises(PdfError):
+        PdfDocument(write(tmp_path, 'bad', data))
+
+
+def test_bad_page_tree_raises_pdf_error(tmp_path):
+    doc = PdfDocument(write(tmp_path, 'kids', DAMAGED['kids-not-a-list']))
+    try:
+        with pytest.raises(PdfError):
+            list(doc.pages())
+    finally:
+        doc.close()
+
+
+@pytest.mark.parametrize('name', sorted(DAMAGED))
+def test_checks_report_damaged_files(tmp_path, name):
+    path = str(write(tmp_path, name, DAMAGED[name]))
+    levels = []
+    for check in (c for c, spec in preflight.CHECKS.items() if 'pdf' in spec.kinds):
+        findings, complete, _ = preflight.run_check(check, path, 'pdf', {}, time.time() + 5)
+        assert complete
+        levels += [level for level, _ in findings]
+    assert 'error' in levels
+
+
+def test_preflight_fails_damaged_files(tmp_path):
+    with preflight.Preflight(jobs=1, budget=5) as runner:
+        report = runner.run(write(tmp_path, 'kids', DAMAGED['kids-not-a-list']))
+        missing = runner.run(tmp_path / 'missing.pdf')
+    assert report.status == 'fail'
+    assert any(message.startswith("Could not read the file") for _, _, message in report.findings)
+    assert missing.findings == [('type', 'error', "File not found")]
@@ -0,0 +1,98 @@
+"""Rate table pricing: quote() against batch() and argument checks"""
+
+import random
+from pathlib import Path
+
+import pytest
+
+from sitebuild import pricing
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope='module')
+def table():
+    return pricing.load(ROOT)
+
+
+def test_quote_follows_the_formula(table):
+    line = table.line('childrens-book')
+    price = line.quote(250, 24, type='hardcover', size='8.5x11')
+    # 25 * 1.2 + ceil(24 / 4) * 0.8, less 5% from 250 copies
+    assert price['unit'] == pytest.approx(34.8)
+    assert price['total'] == pytest.approx(34.8 * 250 * 0.95)
+
+
+@pytest.mark.parametrize('name', ['childrens-book', 'print'])
+def test_batch_matches_quote(table, name):
+    pytest.importorskip('numpy')
+    line = table.line(name)
+    rng = random.Random(name)
+    configs = []
+    for _ in range(200):
+        options = {axis.name: rng.choice(axis.options) for axis in line.axes}
+        quantity = rng.choice([1, 99, 100, 250, 999, 1000, 5000, 12345])
+        pages = rng.randrange(1, 200) if line.pages else None
+        configs.append((options, quantity, pages, rng.choice([0.0, 0.25, 1.5])))
+
+    prices = line.batch(quantity=[q for _, q, _, _ in configs],
+                        pages=[p for _, _, p, _ in configs] if line.pages else None,
+                        ink=[i for _, _, _, i in configs],
+                        **{axis.name: [o[axis.name] for o, _, _, _ in configs] for axis in line.axes})
+    for i, (options, quantity, pages, ink) in enumerate(configs):
+        expected = line.quote(quantity, pages, ink=ink, **options)
+        for key in ('unit', 'subtotal', 'discount', 'total'):
+            assert prices[key][i] == pytest.approx(expected[key])
+
+
+def test_ink_cost_charges_coverage_over_the_included(table):
+    line = table.line('childrens-book')
+    included, price = line.ink['included'], line.ink['price']
+    assert line.ink_cost([included - 10, included + 10, included + 30]) == pytest.approx(40 * price)
+    assert line.quote(100, ink=2)['unit'] == pytest.approx(line.quote(100)['unit'] + 2)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'quantity': True},
+    {'quantity': '100'},
+    {'quantity': -1},
+    {'quantity': float('nan')},
+    {'pages': None, 'quantity': float('inf')},
+    {'pages': [24]},
+    {'ink': 'x'},
+    {'ink': -0.5},
+    {'size': ['6x9']},
+    {'size': 'A0'},
+    {'colour': 'red'},
+])
+def test_quote_rejects_bad_arguments(table, kwargs):
+    with pytest.raises(pricing.PricingError):
+        table.line('childrens-book').quote(**kwargs)
+
+
+def test_batch_rejects_bad_arguments(table):
+    pytest.importorskip('numpy')
+    line = table.line('childrens-book')
+    with pytest.raises(pricing.PricingError):
+        line.batch(quantity=['many'])
+    with pytest.raises(pricing.PricingError):
+        line.batch(quantity=[100, -5])
+    with pytest.raises(pricing.PricingError):
+        line.batch(size=['6x9', 'A0'])
+
+
+def test_batch_broadcasts_ink(table):
+    pytest.importorskip('numpy')
+    line = table.line('childrens-book')
+    prices = line.batch(quantity=100, ink=[0.0, 1.0, 2.0])
+    assert list(prices['unit']) == pytest.approx([line.quote(100, ink=ink)['unit'] for ink in (0, 1, 2)])
+    assert prices['total'].shape == (3,)
+
+
+def test_export_script_skips_braces_in_strings(table):
+    line = table.line('print')
+    source = "x = 1;\n    this.rates = {\n        note: '}{', \"a\": \"\\\"}\"\n    };\n    done('}');\n"
+    exported = pricing.export_script(source, 'this.rates', line)
+    assert exported.startswith("x = 1;\n    this.rates = {")
+    assert exported.endswith(";\n    done('}');\n")
+    assert '}{' not in exported
@@ -0,0 +1,18 @@
+"""Dev server: pages are rebuilt when the files they depend on change"""
+
+from sitebuild.serve import DevSite
+
+PAGE = '<html><head></head><body><main>x</main><footer class="main-footer">old</footer></body></html>'
+
+
+def test_missing_fragment_source_is_a_dependency(tmp_path):
+    (tmp_path / 'services').mkdir()
+    (tmp_path / 'services/poster.html').write_text(PAGE, encoding='utf-8')
+    site = DevSite(tmp_path, ['service-footer'])
+    assert site.update() == ['services/poster.html']
+    assert b'old' in site.pages['services/poster.html'].data
+    assert site.update() == []
+
+    (tmp_path / 'services/footer-template.html').write_text('<footer>new</footer>', encoding='utf-8')
+    assert site.update() == ['services/poster.html']
+    assert b'<footer>new</footer>' in site.pages['services/poster.html'].data
@@ -0,0 +1,26 @@
+"""Snapshot store: script writes are journalled under the script's name and roll back"""
+
+from sitebuild import snapshots
+
+
+def test_write_text_records_one_run_per_script(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(snapshots, '_script_transactions', {})
+    (tmp_path / 'a.html').write_text('old a', encoding='utf-8')
+    (tmp_path / 'b.html').write_text('old b', encoding='utf-8')
+
+    def helper(path, text):
+        snapshots.write_text(path, text, label='/repo/update_navbar.py')
+
+    helper('a.html', 'new a')
+    helper('b.html', 'new b')
+    store = snapshots.SnapshotStore(tmp_path)
+    [run_id] = store.runs()
+    journal = store.load_run(run_id)
+    assert journal['label'] == 'update_navbar.py'
+    assert sorted(journal['files']) == ['a.html', 'b.html']
+
+    assert sorted(store.rollback(verbose=False)) == ['a.html', 'b.html']
+    assert (tmp_path / 'a.html').read_text(encoding='utf-8') == 'old a'
+    assert store.runs() == []
+    assert list(store.blobs.iterdir()) == []
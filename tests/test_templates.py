@@ -0,0 +1,23 @@
+"""Service page templates: the committed pages are the render output"""
+
+import shutil
+from pathlib import Path
+
+from sitebuild import templates
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_render_reproduces_the_committed_pages(tmp_path):
+    for name in ('templates', 'content', 'data', 'services'):
+        shutil.copytree(ROOT / name, tmp_path / name)
+    report = templates.render_services(tmp_path, verbose=False)
+    assert len(report.pages) == len(list((ROOT / templates.CONTENT_DIR).glob('*.html')))
+    assert report.written == []
+
+
+def test_parse_content_splits_fields_and_sections():
+    fields = templates.parse_content("title: Poster\ndescription: Big\n\n--- head\n<style></style>\n"
+                                     "--- body\n\n<section>x</section>\n\n")
+    assert fields == {'title': 'Poster', 'description': 'Big', 'head': '<style></style>',
+                      'body': '<section>x</section>'}
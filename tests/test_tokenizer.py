@@ -0,0 +1,55 @@
+"""Region tokenizer: spans found by scan() and removed by apply_edits()"""
+
+from pathlib import Path
+
+from sitebuild import tokenizer
+from sitebuild.transforms import NAV_CONTAINER_TAGS, _is_nav_container
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def strip_navigation(html):
+    """The removals of the navbar-footer transform, without the insertions"""
+    page_map = tokenizer.scan(html)
+    removals = [(r.start, r.end) for r in page_map.regions if r.tag in ('header', 'nav', 'footer')]
+    removals += tokenizer.comment_pairs(page_map.comments, 'navigation')
+    removals += tokenizer.comment_pairs(page_map.comments, 'footer')
+    return tokenizer.apply_edits(html, removals)
+
+
+def test_footer_comments_only_pair_with_each_other():
+    # The old <!--.*?Footer.*?-->.*?<!--.*?Footer.*?--> pattern ran from the
+    # first comment in <head> to the footer, taking 700 lines of the page with it
+    html = (ROOT / 'services/comic-book-printing.html').read_text(encoding='utf-8')
+    page_map = tokenizer.scan(html)
+    spans = tokenizer.comment_pairs(page_map.comments, 'footer')
+    assert spans
+    for start, end in spans:
+        assert start > page_map.head_close
+        assert html.startswith('<!--', start) and 'footer' in html[start:html.index('-->', start)].lower()
+
+    stripped = strip_navigation(html)
+    for kept in ('<!-- Preconnect for performance -->', '<!-- Tailwind CSS -->', '</head>',
+                 '<!-- Hero Section -->', '<!-- Instant Quote Section -->', '<!-- Trust Section -->',
+                 '</body>'):
+        assert kept in stripped
+    for removed in ('<header', '<nav', '<footer', '<!-- Footer -->'):
+        assert removed not in stripped
+    assert len(stripped.splitlines()) > 700
+
+
+def test_nested_nav_containers_are_removed_whole():
+    html = ('<body><div class="navbar-menu"><div><a href="#">A</a></div><div>B</div></div>'
+            '<p>kept</p><ul class="nav-links"><li><ul><li>C</li></ul></li></ul></body>')
+    page_map = tokenizer.scan(html, predicate=_is_nav_container, predicate_tags=NAV_CONTAINER_TAGS)
+    assert [r.tag for r in page_map.regions] == ['div', 'ul']
+    stripped = tokenizer.apply_edits(html, [(r.start, r.end) for r in page_map.regions])
+    assert stripped == '<body><p>kept</p></body>'
+
+
+def test_apply_edits_merges_overlaps_and_keeps_insertions():
+    html = '<head></head><body>abcdef</body>'
+    page_map = tokenizer.scan(html)
+    edited = tokenizer.apply_edits(html, [(19, 22), (20, 24)],
+                                   [(page_map.head_close, 'S'), (page_map.body_open_end, 'H'), (21, 'X')])
+    assert edited == '<head>S</head><body>HXf</body>'
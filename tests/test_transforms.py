@@ -0,0 +1,39 @@
+"""Page transforms run directly on page text"""
+
+import json
+
+import pytest
+
+from sitebuild.engine import IOStats, Page
+from sitebuild.fragments import BuildContext
+from sitebuild.images import EXTENSIONS, PIPELINE_VERSION
+from sitebuild.transforms import TRANSFORMS
+
+HERO = 'assets/images/hero.jpg'
+VARIANTS = {'version': PIPELINE_VERSION, 'images': {HERO: {
+    'size': [2000, 1000], 'bytes': 400000,
+    'outputs': [[f'assets/images/optimized/hero-{w}{EXTENSIONS[fmt]}', w, fmt, w * (50 if fmt == 'jpeg' else 30)]
+                for w in (480, 960, 1440) for fmt in ('webp', 'jpeg')],
+}}}
+
+
+def responsive(tmp_path, body):
+    ctx = BuildContext(tmp_path, IOStats())
+    ctx.preload({'image-variants': json.dumps(VARIANTS)})
+    html = f'<html><body>{body}</body></html>'
+    page = Page(tmp_path, tmp_path / 'index.html', html.encode('utf-8'))
+    return TRANSFORMS['responsive-images'](page.content, page, ctx)
+
+
+@pytest.mark.parametrize('attrs, expected', [
+    ('', ' width="2000" height="1000"'),
+    (' width="600"', ' height="300"'),
+    (' width="100%"', ' width="100%" srcset='),
+    (' width="600" height="100"', ' width="600" height="100" srcset='),
+])
+def test_responsive_images_keeps_one_width(tmp_path, attrs, expected):
+    out = responsive(tmp_path, f'<img src="{HERO}"{attrs}>')
+    assert out.count(' width=') == 1
+    assert out.count(' height=') == (0 if '%' in attrs else 1)
+    assert expected in out
+    assert 'srcset="assets/images/optimized/hero-480.jpg 480w' in out
@@ -6,6 +6,8 @@ Script to update all contact links from #contact to contact.html
 import os
 import glob
 
+from sitebuild.snapshots import write_text
+
 def update_contact_links():
     """Update all contact links in HTML files"""
     
@@ -39,8 +41,7 @@ def update_contact_links():
                 
                 # Only write if content changed
                 if content != original_content:
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.write(content)
+                    write_text(file_path, content, label=__file__)
                     updated_files.append(file_path)
                     print(f"Updated: {file_path}")
                 
@@ -8,6 +8,8 @@ import os
 import re
 from pathlib import Path
 
+from sitebuild.snapshots import write_text
+
 def extract_navbar_from_index():
     """Extract the navbar structure from index.html"""
     with open('index.html', 'r', encoding='utf-8') as f:
@@ -80,8 +82,7 @@ def update_service_file(filepath, navbar_html):
     )
     
     # Write updated content back to file
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(new_content)
+    write_text(filepath, new_content, label=__file__)
     
     print(f"✓ Updated {filepath}")
 
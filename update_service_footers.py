@@ -7,6 +7,8 @@ import os
 import re
 from pathlib import Path
 
+from sitebuild.snapshots import write_text
+
 def read_footer_template():
     """Read the footer template"""
     with open('services/footer-template.html', 'r', encoding='utf-8') as f:
@@ -56,8 +58,7 @@ def update_service_footer(file_path, footer_template):
                 content = re.sub(head_pattern, r'\1' + css_link, content, flags=re.IGNORECASE)
         
         # Write updated content
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        write_text(file_path, content, label=__file__)
         
         print(f"✅ Updated: {file_path}")
         return True
@@ -6,6 +6,8 @@ Script to update all service pages with consistent navbar
 import os
 import re
 
+from sitebuild.snapshots import write_text
+
 # The consistent navbar HTML to replace the individual headers
 CONSISTENT_NAVBAR = '''    <!-- Scroll Progress Bar -->
     <div class="scroll-progress" id="scrollProgress" aria-hidden="true"></div>
@@ -193,8 +195,7 @@ def update_service_page(file_path):
         )
         
         # Write the updated content back to the file
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(new_content)
+        write_text(file_path, new_content, label=__file__)
         
         print(f"✓ Updated {os.path.basename(file_path)}")
         return True
@@ -7,6 +7,8 @@ import os
 import re
 from pathlib import Path
 
+from sitebuild.snapshots import write_text
+
 def read_slim_footer_template():
     """Read the slim footer template"""
     with open('services/footer-template-slim.html', 'r', encoding='utf-8') as f:
@@ -46,8 +48,7 @@ def update_service_footer_slim(file_path, footer_template):
                 content += f'\n\n{footer_template}'
         
         # Write updated content
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        write_text(file_path, content, label=__file__)
         
         print(f"✅ Updated: {file_path}")
         return True
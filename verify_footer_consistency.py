@@ -3,61 +3,39 @@
 Script to verify footer consistency across all service pages
 """
 
-import os
 import re
+import sys
 from pathlib import Path
 
+from sitebuild import lint
+
 def check_footer_consistency():
     """Check footer consistency across service pages"""
-    services_dir = Path('services')
-    html_files = [f for f in services_dir.glob('*.html') if f.name != 'navbar-template.html']
+    # The footer rules of python -m sitebuild lint, run over one DOM per page
+    report = lint.lint('.', ['footer'], verbose=False)
+    service_files = [rel for rel in report.pages if rel.startswith('services/')]
     
-    print(f"Checking footer consistency across {len(html_files)} service pages...")
+    print(f"Checking footer consistency across {len(service_files)} service pages...")
     print("=" * 60)
     
     consistent_count = 0
     issues = []
     
-    for html_file in html_files:
-        try:
-            with open(html_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Check for standardized footer
-            has_footer_class = 'class="footer"' in content
-            has_footer_content = 'footer-content' in content
-            has_footer_sections = content.count('footer-section') >= 4
-            has_proper_links = '../css/style.css' in content
-            has_logo_link = '../assets/images/logo.svg' in content
-            
+    for rel in service_files:
+        name = Path(rel).name
+        file_issues = [f"{rule}: {message}" for rule, message, _ in report.pages[rel]]
+        
+        if file_issues:
+            status = "❌ ISSUES"
+            issues.append(f"{name}: {', '.join(file_issues)}")
+        else:
             status = "✅ CONSISTENT"
-            file_issues = []
-            
-            if not has_footer_class:
-                file_issues.append("Missing footer class")
-            if not has_footer_content:
-                file_issues.append("Missing footer-content structure")
-            if not has_footer_sections:
-                file_issues.append("Insufficient footer sections")
-            if not has_proper_links:
-                file_issues.append("Missing CSS link")
-            if not has_logo_link:
-                file_issues.append("Missing logo link")
-            
-            if file_issues:
-                status = "❌ ISSUES"
-                issues.append(f"{html_file.name}: {', '.join(file_issues)}")
-            else:
-                consistent_count += 1
-            
-            print(f"{status} - {html_file.name}")
-            
-        except Exception as e:
-            print(f"❌ ERROR - {html_file.name}: {str(e)}")
-            issues.append(f"{html_file.name}: Read error")
+            consistent_count += 1
+        
+        print(f"{status} - {name}")
     
     print("=" * 60)
-    print(f"✅ Consistent pages: {consistent_count}/{len(html_files)}")
+    print(f"✅ Consistent pages: {consistent_count}/{len(service_files)}")
     
     if issues:
         print(f"\n❌ Issues found in {len(issues)} pages:")
@@ -68,11 +46,11 @@ def check_footer_consistency():
     
     return len(issues) == 0
 
-def check_css_footer_styles():
+def check_css_footer_styles(css_file='css/style.css'):
     """Check if footer CSS styles are properly defined"""
-    css_file = Path('css/style.css')
+    css_file = Path(css_file)
     
-    print("\nChecking footer CSS styles...")
+    print(f"\nChecking footer CSS styles in {css_file}...")
     print("-" * 40)
     
     try:
@@ -94,7 +72,9 @@ def check_css_footer_styles():
         
         missing_styles = []
         for style in required_styles:
-            if style not in css_content:
+            # Minified build output has no space before the brace
+            selector = re.escape(style[:-2])
+            if not re.search(selector + r'\s*\{', css_content):
                 missing_styles.append(style)
         
         if missing_styles:
@@ -116,7 +96,7 @@ def main():
     print("=" * 60)
     
     footer_consistent = check_footer_consistency()
-    css_styles_ok = check_css_footer_styles()
+    css_styles_ok = all([check_css_footer_styles(path) for path in sys.argv[1:] or ['css/style.css']])
     
     print("\n" + "=" * 60)
     if footer_consistent and css_styles_ok: